@@ -0,0 +1,736 @@
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from compiled_graph import CompiledGraph
+from connection_scan import ConnectionScan
+from connectivity import NoRoute
+from contraction_hierarchy import ContractionHierarchy
+from departure_board import DepartureBoard
+from enhanced_transit_planner import EnhancedTransitPlanner
+from fares import calculate_fare
+from isochrone import reachable_counts
+from k_shortest_paths import KShortestPaths
+from landmarks import LandmarkIndex
+from load_generator import request_paths, run_load
+from name_index import NameIndex
+from planning_service import PlanningService
+from raptor_router import RaptorRouter
+from realtime_feed import RealtimeIngestor
+from spatial_index import SpatialIndex, haversine_km
+from stop_time_store import StopTimeStore
+from timetable import Timetable, format_time
+from traffic_model import TrafficModel
+from transit_network import TransitNetwork
+from travel_time_matrix import POOL_MIN_ORIGINS, pool_processes
+from vehicle_positions import VehicleTracker
+
+
+def build_network(directory="."):
+    """Build the full routes.csv network the same way test_planner.py does"""
+    network = TransitNetwork.from_csv(directory, with_timetable=False)
+    return network.build_graph(), network.station_coords()
+
+
+def build_network_rowwise(routes_path="routes.csv", stops_path="stops.csv"):
+    """The original row-by-row build (iterrows + add_edge), kept as the loader baseline"""
+    routes = pd.read_csv(routes_path)
+    stops = pd.read_csv(stops_path, index_col=False)
+
+    station_coords = {}
+    for _, row in stops.iterrows():
+        if pd.notna(row['stop_lat']) and pd.notna(row['stop_lon']):
+            station_coords[row['stop_name']] = (float(row['stop_lat']), float(row['stop_lon']))
+
+    G = nx.MultiDiGraph()
+    route_speeds = {'Standard': 20, 'Express': 30, 'Premium': 25}  # km/h (hypothetical)
+    for _, row in routes.iterrows():
+        nodes = row['route_long_name'].split(' - ')
+        for i in range(len(nodes)-1):
+            G.add_edge(nodes[i].strip(), nodes[i+1].strip(),
+                       route_id=row['route_id'],
+                       type=row['route_type'],
+                       speed=route_speeds.get(row['route_short_name'][:2], 20),
+                       time=60 * (1/route_speeds.get(row['route_short_name'][:2], 20)))
+
+    return G, station_coords
+
+
+def sample_od_pairs(G, n, seed=42):
+    """Sample reachable origin/destination pairs (unreachable ones only exercise the fallbacks)"""
+    rng = random.Random(seed)
+    nodes = list(G.nodes())
+    pairs = []
+    while len(pairs) < n:
+        origin, destination = rng.sample(nodes, 2)
+        if nx.has_path(G, origin, destination):
+            pairs.append((origin, destination))
+    return pairs
+
+
+def timed(func, repeat=1):
+    """Run func `repeat` times and return (last result, seconds per run)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def benchmark_compiled_graph(G, station_coords, n_pairs=500, n_planner_pairs=20):
+    """Compare networkx and CSR Dijkstra, both raw and through calculate_path"""
+    print("== Compiled CSR graph vs networkx MultiDiGraph ==")
+    compiled, build_time = timed(lambda: CompiledGraph(G))
+    print(f"CSR build: {build_time*1000:.1f} ms for {compiled.num_nodes} stops, "
+          f"{compiled.num_edges} collapsed edges ({G.number_of_edges()} route edges)")
+
+    pairs = sample_od_pairs(G, n_pairs)
+
+    nx_paths, nx_time = timed(lambda: [nx.shortest_path(G, o, d, weight='time') for o, d in pairs])
+    csr_paths, csr_time = timed(lambda: [compiled.shortest_path(o, d) for o, d in pairs])
+    print(f"shortest_path x{len(pairs)}: networkx {nx_time*1000:.1f} ms, "
+          f"compiled {csr_time*1000:.1f} ms ({nx_time/csr_time:.1f}x), "
+          f"identical paths: {nx_paths == csr_paths}")
+
+    # Full calculate_path, including the transfer fallback for unreachable pairs
+    rng = random.Random(7)
+    nodes = list(G.nodes())
+    queries = pairs[:n_planner_pairs] + [tuple(rng.sample(nodes, 2)) for _ in range(n_planner_pairs)]
+    for backend in ('networkx', 'compiled'):
+        # Seed so both backends get the same simulated traffic and random-node fallback samples
+        random.seed(0)
+        planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, backend=backend, traffic_seed=0)
+        results, elapsed = timed(lambda: [planner.calculate_path(o, d, consider_traffic=False)
+                                          for o, d in queries])
+        if backend == 'networkx':
+            reference, reference_time = results, elapsed
+        print(f"calculate_path x{len(queries)} [{backend}]: {elapsed*1000:.1f} ms")
+    print(f"calculate_path speedup: {reference_time/elapsed:.1f}x, identical results: {reference == results}")
+
+
+def benchmark_raptor(G, station_coords, n_queries=200):
+    """Time RAPTOR timetable queries against the hub-based fallback of calculate_path"""
+    print("== RAPTOR timetable router ==")
+    timetable, load_time = timed(Timetable.from_csv)
+    router, build_time = timed(lambda: RaptorRouter(timetable))
+    print(f"Timetable load: {load_time*1000:.1f} ms, RAPTOR build: {build_time*1000:.1f} ms "
+          f"({timetable.num_trips} trips, {router.num_patterns} route patterns)")
+
+    rng = random.Random(3)
+    queries = [(rng.randrange(timetable.num_stops), rng.randrange(timetable.num_stops),
+                rng.randrange(5 * 3600, 22 * 3600)) for _ in range(n_queries)]
+    _, raptor_time = timed(lambda: [router.earliest_arrival([o], [d], t) for o, d, t in queries])
+    print(f"earliest_arrival x{n_queries}: {raptor_time*1000:.1f} ms "
+          f"({raptor_time/n_queries*1e6:.0f} us/query)")
+
+    # The static planner's worst case: an unreachable pair runs the whole hub fallback
+    planner = EnhancedTransitPlanner(G, station_coords, calculate_fare)
+    nodes = list(G.nodes())
+    misses = [(o, d) for o, d in (rng.sample(nodes, 2) for _ in range(200))
+              if not nx.has_path(G, o, d)][:10]
+    _, fallback_time = timed(lambda: [planner.calculate_path(o, d, consider_traffic=False) for o, d in misses])
+    print(f"hub fallback x{len(misses)}: {fallback_time*1000:.1f} ms "
+          f"({fallback_time/len(misses)*1e3:.1f} ms/query)")
+
+
+def benchmark_connection_scan(n_queries=50):
+    """Time 8:00-10:00 profile queries against one RAPTOR query per candidate departure"""
+    print("== Connection Scan profile queries ==")
+    timetable = Timetable.from_csv()
+    csa, build_time = timed(lambda: ConnectionScan(timetable))
+    router = RaptorRouter(timetable)
+    print(f"CSA build: {build_time*1000:.1f} ms ({csa.num_connections} connections)")
+
+    rng = random.Random(5)
+    pairs = [(rng.randrange(timetable.num_stops), rng.randrange(timetable.num_stops)) for _ in range(n_queries)]
+    window = (8 * 3600, 10 * 3600)
+    _, profile_time = timed(lambda: [csa.profile([o], [d], *window) for o, d in pairs])
+    departures = range(window[0], window[1] + 1, 300)
+    _, repeated_time = timed(lambda: [router.earliest_arrival([o], [d], t) for o, d in pairs for t in departures])
+    print(f"profile x{n_queries}: {profile_time*1000:.1f} ms, "
+          f"RAPTOR every 5 min x{n_queries}: {repeated_time*1000:.1f} ms")
+
+
+def benchmark_landmarks(G, station_coords, n_pairs=300):
+    """Settled nodes and query time of ALT (hub and farthest-point landmarks) versus plain Dijkstra"""
+    print("== ALT landmark A* ==")
+    compiled = CompiledGraph(G)
+    planner = EnhancedTransitPlanner(G, station_coords, calculate_fare)
+    pairs = [(compiled.node_index[o], compiled.node_index[d]) for o, d in sample_od_pairs(G, n_pairs)]
+
+    _, dijkstra_time = timed(lambda: [compiled.dijkstra(o, d) for o, d in pairs])
+    dijkstra_settled = sum(LandmarkIndex(compiled, []).astar(o, d, heuristic=False)[1] for o, d in pairs)
+    print(f"dijkstra: {dijkstra_settled/len(pairs):.0f} settled/query, {dijkstra_time*1000:.1f} ms")
+
+    for name, build in (('hubs', lambda: LandmarkIndex.from_hubs(compiled, planner.major_hubs)),
+                        ('farthest', lambda: LandmarkIndex.farthest(compiled, start=planner.major_hubs[0][0]))):
+        index, build_time = timed(build)
+        results, alt_time = timed(lambda: [index.astar(o, d) for o, d in pairs])
+        settled = sum(r[1] for r in results)
+        print(f"alt[{name}]: {settled/len(pairs):.0f} settled/query "
+              f"({dijkstra_settled/settled:.1f}x fewer), {alt_time*1000:.1f} ms, "
+              f"precompute {build_time*1000:.1f} ms")
+
+
+def benchmark_contraction_hierarchy(G, n_pairs=2000, path="network.ch.npz"):
+    """Preprocessing cost, serialised size and query time of the contraction hierarchy"""
+    print("== Contraction hierarchy (static times) ==")
+    compiled = CompiledGraph(G)
+    hierarchy, build_time = timed(lambda: ContractionHierarchy.build(compiled))
+    hierarchy.save(path)
+    _, load_time = timed(lambda: ContractionHierarchy.load(path, compiled))
+    print(f"build: {build_time*1000:.0f} ms, {hierarchy.num_shortcuts} shortcuts, "
+          f"load: {load_time*1000:.1f} ms ({os.path.getsize(path)/1024:.0f} KiB)")
+
+    pairs = [(compiled.node_index[o], compiled.node_index[d]) for o, d in sample_od_pairs(G, n_pairs)]
+    ch_paths, ch_time = timed(lambda: [hierarchy.query(o, d) for o, d in pairs])
+    _, dijkstra_time = timed(lambda: [compiled.bidirectional_dijkstra(o, d) for o, d in pairs])
+    print(f"query x{len(pairs)}: ch {ch_time/len(pairs)*1e6:.0f} us/query, "
+          f"bidirectional dijkstra {dijkstra_time/len(pairs)*1e6:.0f} us/query")
+    os.remove(path)
+
+
+def benchmark_travel_time_matrix(G, station_coords, size=300):
+    """Many-to-many matrix versus looping calculate_path pair by pair"""
+    print("== Travel-time matrix ==")
+    planner = EnhancedTransitPlanner(G, station_coords, calculate_fare)
+    stops = random.Random(11).sample(list(G.nodes()), size)
+
+    for processes in (1, max(2, os.cpu_count() or 1)):
+        matrix, elapsed = timed(lambda: planner.travel_time_matrix(stops, stops, consider_traffic=False,
+                                                                   processes=processes))
+        print(f"{size}x{size} matrix [processes={processes}, ran with {pool_processes(processes, size)}]: "
+              f"{elapsed*1000:.0f} ms, "
+              f"{np.isfinite(matrix).sum()} reachable pairs")
+
+    sample = [(o, d) for o in stops[:10] for d in stops[:10]]
+    _, loop_time = timed(lambda: [planner.calculate_path(o, d, consider_traffic=False) for o, d in sample])
+    print(f"calculate_path loop: {loop_time/len(sample)*1e3:.2f} ms/pair "
+          f"(~{loop_time/len(sample)*size*size:.0f} s for the full matrix)")
+
+
+def benchmark_route_cache(G, station_coords, n_queries=2000, n_distinct=100):
+    """Repeated popular queries with and without the route cache"""
+    print("== Route cache ==")
+    rng = random.Random(5)
+    popular = sample_od_pairs(G, n_distinct, seed=5)
+    # Skewed workload: a few pairs account for most requests
+    weights = [1.0 / (rank + 1) for rank in range(len(popular))]
+    queries = rng.choices(popular, weights=weights, k=n_queries)
+
+    results = {}
+    for cache_size in (0, 1024):
+        random.seed(0)
+        planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, cache_size=cache_size,
+                                         traffic_seed=0)
+        _, elapsed = timed(lambda: [planner.calculate_path(o, d) for o, d in queries])
+        results[cache_size] = elapsed
+        stats = planner.cache_stats()
+        print(f"cache_size={cache_size}: {elapsed/n_queries*1e3:.3f} ms/query, "
+              f"hit rate {stats['hit_rate']:.1%}, {stats['evictions']} evictions")
+    print(f"Speedup: {results[0] / results[1024]:.1f}x")
+
+
+def benchmark_traffic_refresh(n_edges=50000, repeat=20):
+    """Vectorised traffic refresh versus the per-edge dict loop it replaced"""
+    print("== Traffic refresh ==")
+    model = TrafficModel(n_edges, seed=0, hour=9)
+    _, vector_time = timed(lambda: model.refresh(hour=9), repeat)
+
+    conditions = {(i, i + 1): float(m) for i, m in enumerate(model.multipliers)}
+
+    def dict_refresh():
+        for edge_key in conditions:
+            new_multiplier = conditions[edge_key] * 0.7 + random.uniform(1.2, 1.8) * 0.3
+            conditions[edge_key] = new_multiplier * random.uniform(0.95, 1.05)
+    _, dict_time = timed(dict_refresh, repeat)
+    print(f"{n_edges} edges: array {vector_time*1e3:.2f} ms, dict loop {dict_time*1e3:.1f} ms "
+          f"({dict_time / vector_time:.0f}x)")
+
+
+def benchmark_traffic_aware_search(G, station_coords, n_pairs=300):
+    """Routes searched on live traffic times versus static routes re-timed under traffic"""
+    print("== Traffic-aware search ==")
+    pairs = sample_od_pairs(G, n_pairs, seed=3)
+    for backend in ('compiled', 'alt', 'networkx'):
+        planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, backend=backend,
+                                         cache_size=0, traffic_seed=0)
+        static, static_time = timed(lambda: [planner._process_path(planner._shortest_path(o, d), True)
+                                             for o, d in pairs])
+        live, live_time = timed(lambda: [planner._process_path(planner._shortest_path(o, d, True), True)
+                                         for o, d in pairs])
+        faster = sum(1 for a, b in zip(static, live) if b['time'] < a['time'] - 1e-9)
+        saved = sum(a['time'] - b['time'] for a, b in zip(static, live))
+        print(f"[{backend}] {faster}/{n_pairs} routes faster under traffic ({saved:.0f} min saved); "
+              f"static {static_time*1e3:.0f} ms, live {live_time*1e3:.0f} ms")
+
+
+def shared_corridor_network(n_corridors=20, length=12, n_short=4, seed=3):
+    """Corridors where one slower route runs end to end and faster short routes overlap parts of it
+
+    Returns (graph, station_coords, end-to-end pairs): picking the fastest route per hop
+    hops between the short routes, while staying on the through route avoids every transfer.
+    """
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph()
+    station_coords = {}
+    for c in range(n_corridors):
+        stops = [f"Corridor {c} Stop {i}" for i in range(length)]
+        for i, stop in enumerate(stops):
+            station_coords[stop] = (12.9 + 0.01 * c, 77.5 + 0.01 * i)
+        runs = [(f"C{c}-through", 0, length - 1, 3.0)]
+        for k in range(n_short):
+            start = rng.randrange(length - 2)
+            runs.append((f"C{c}-short{k}", start, rng.randrange(start + 2, length), 2.4))
+        for route_id, start, end, time in runs:
+            for i in range(start, end):
+                G.add_edge(stops[i], stops[i + 1], route_id=route_id, type='3', time=time)
+                G.add_edge(stops[i + 1], stops[i], route_id=route_id, type='3', time=time)
+    pairs = [(f"Corridor {c} Stop 0", f"Corridor {c} Stop {length - 1}") for c in range(n_corridors)]
+    return G, station_coords, pairs
+
+
+def benchmark_transfer_search(G, station_coords, n_pairs=300):
+    """(stop, route) transfer-aware search versus min-time search with the penalty added afterwards"""
+    print("== Transfer-aware search ==")
+    corridors, corridor_coords, corridor_pairs = shared_corridor_network()
+    for network, coords, pairs in ((G, station_coords, sample_od_pairs(G, n_pairs, seed=8)),
+                                   (corridors, corridor_coords, corridor_pairs)):
+        name = 'bundled' if network is G else 'shared corridors'
+        for transfer_aware in (False, True):
+            planner = EnhancedTransitPlanner(network, coords, calculate_fare, cache_size=0,
+                                             traffic_seed=0, transfer_aware=transfer_aware)
+            results, elapsed = timed(lambda: [planner.calculate_path(o, d) for o, d in pairs])
+            found = [r for r in results if r]
+            transfers = sum(r['transfers'] for r in found) / max(1, len(found))
+            total = sum(r['time'] for r in found) / max(1, len(found))
+            label = 'transfer-aware' if transfer_aware else 'min-time'
+            print(f"[{name}, {label}] {elapsed/len(pairs)*1e3:.2f} ms/query, {len(found)} routes, "
+                  f"{transfers:.2f} transfers and {total:.1f} min on average")
+        print(f"Route-expanded edges: {planner.transfer_search.num_route_edges} "
+              f"(over {planner.compiled.num_edges} stop-to-stop edges)")
+
+
+def benchmark_name_index(G, n_queries=1000):
+    """Indexed station-name resolution on substrings, extra words and typos"""
+    print("== Station-name index ==")
+    rng = random.Random(1)
+    nodes = list(G.nodes())
+    queries = []
+    for _ in range(n_queries // 3):
+        name = rng.choice(nodes)
+        start = rng.randrange(len(name))
+        queries.append(name[start:start + rng.randint(3, 12)])   # partial name
+        queries.append(rng.choice(name.split()) + " stop")        # one word plus noise
+        chars = list(name)
+        chars[rng.randrange(len(chars))] = 'q'
+        queries.append(''.join(chars))                           # typo
+
+    index, build_time = timed(lambda: NameIndex(nodes))
+    resolved, elapsed = timed(lambda: [index.resolve(q) for q in queries])
+    print(f"index build {build_time*1e3:.1f} ms for {len(index)} stops; "
+          f"{elapsed/len(queries)*1e6:.0f} us/query, {sum(r is not None for r in resolved)}/{len(queries)} resolved")
+
+
+def benchmark_spatial_index(G, station_coords, n_queries=500):
+    """Grid nearest-stop lookups versus a scan of every stop, and planning from coordinates"""
+    print("== Spatial index ==")
+    rng = random.Random(4)
+    points = [(rng.uniform(12.85, 13.10), rng.uniform(77.45, 77.75)) for _ in range(n_queries)]
+    index, build_time = timed(lambda: SpatialIndex(station_coords))
+    nearest, grid_time = timed(lambda: [index.nearest(lat, lon, 5) for lat, lon in points])
+
+    names = list(station_coords)
+    lats = np.array([station_coords[name][0] for name in names])
+    lons = np.array([station_coords[name][1] for name in names])
+    scanned, scan_time = timed(lambda: [np.sort(haversine_km(lat, lon, lats, lons))[:5] for lat, lon in points])
+    same = all(np.allclose([d for _, d in a], b) for a, b in zip(nearest, scanned))
+    print(f"build {build_time*1e3:.1f} ms for {len(index)} stops; 5-nearest: grid {grid_time/n_queries*1e6:.0f} us, "
+          f"full scan {scan_time/n_queries*1e6:.0f} us, identical: {same}")
+
+    planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, traffic_seed=0)
+    trips = list(zip(points[::2], points[1::2]))
+    results, elapsed = timed(lambda: [planner.calculate_path_from_coordinates(*a, *b) for a, b in trips])
+    print(f"calculate_path_from_coordinates: {elapsed/len(trips)*1e3:.2f} ms/query, "
+          f"{sum(1 for r in results if r)}/{len(trips)} routed")
+
+
+def benchmark_process_path(G, station_coords, n_pairs=500):
+    """Result building (distance, fare, steps) from precomputed per-edge arrays"""
+    print("== _process_path ==")
+    planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, traffic_seed=0)
+    paths = [planner._shortest_path(o, d) for o, d in sample_od_pairs(G, n_pairs, seed=9)]
+    edges = sum(len(path) - 1 for path in paths)
+    _, elapsed = timed(lambda: [planner._process_path(path) for path in paths], repeat=5)
+    scalar = lambda: [planner.haversine_distance(*station_coords.get(u, (12.9716, 77.5946)),
+                                                 *station_coords.get(v, (12.9716, 77.5946)))
+                      for path in paths for u, v in zip(path[:-1], path[1:])]
+    _, haversine_time = timed(scalar, repeat=5)
+    print(f"{len(paths)} paths / {edges} edges: {elapsed/len(paths)*1e6:.0f} us/path "
+          f"(per-edge scalar haversine alone took {haversine_time/len(paths)*1e6:.0f} us/path)")
+
+
+def benchmark_lazy_results(G, station_coords, n_pairs=150):
+    """Numeric candidate scoring versus building a full result for every fallback candidate"""
+    print("== Lazy result materialisation ==")
+    planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, traffic_seed=0)
+    paths = [planner._shortest_path(o, d) for o, d in sample_od_pairs(G, 500, seed=9)]
+    _, score_time = timed(lambda: [planner._score_path(path) for path in paths], repeat=5)
+    _, result_time = timed(lambda: [planner._process_path(path) for path in paths], repeat=5)
+    _, full_time = timed(lambda: [dict(planner._process_path(path)) for path in paths], repeat=5)
+    print(f"per candidate: score {score_time/len(paths)*1e6:.1f} us, lazy result {result_time/len(paths)*1e6:.1f} us, "
+          f"materialised result {full_time/len(paths)*1e6:.1f} us")
+
+    pairs = sample_od_pairs(G, n_pairs, seed=12)
+    random.seed(1)
+    _, fallback_time = timed(lambda: [planner._calculate_path_with_transfers(o, d) for o, d in pairs])
+    print(f"transfer fallback: {fallback_time/n_pairs*1e3:.2f} ms/query")
+
+
+def benchmark_network_loading(path="benchmark.snapshot.npz", repeat=5):
+    """Cold start: row-by-row CSV build versus vectorised parsing versus the .npz snapshot"""
+    print("== Network loading ==")
+    (G, station_coords), rowwise_time = timed(build_network_rowwise, repeat=repeat)
+    _, timetable_time = timed(Timetable.from_csv, repeat=repeat)
+    network, parse_time = timed(TransitNetwork.from_csv, repeat=repeat)
+    _, graph_time = timed(network.build_graph, repeat=repeat)
+    if os.path.exists(path):
+        os.remove(path)
+    _, first_time = timed(lambda: TransitNetwork.load_or_build(path=path))
+    loaded, load_time = timed(lambda: TransitNetwork.load_or_build(path=path), repeat=repeat)
+    same = (list(loaded.build_graph().edges(keys=True, data=True)) == list(G.edges(keys=True, data=True))
+            and loaded.station_coords() == station_coords)
+    print(f"row-by-row graph + timetable: {(rowwise_time + timetable_time)*1000:.0f} ms, "
+          f"vectorised: {parse_time*1000:.0f} ms, first run (parse + save): {first_time*1000:.0f} ms")
+    print(f"snapshot load (hash check included): {load_time*1000:.1f} ms "
+          f"({os.path.getsize(path)/1024:.0f} KiB), build_graph: {graph_time*1000:.1f} ms, identical graph: {same}")
+    os.remove(path)
+
+
+def benchmark_stop_time_store(path="benchmark.store", n_queries=2000):
+    """Memory-mapped columnar stop_times versus the string DataFrame, and its two accessors"""
+    print("== Stop time store ==")
+    frame = pd.read_csv("stop_times.csv", dtype={'trip_id': str, 'stop_id': str})
+    store, build_time = timed(lambda: StopTimeStore.build(Timetable.from_csv(), path))
+    _, open_time = timed(lambda: StopTimeStore.open(path), repeat=20)
+    on_disk = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    print(f"DataFrame: {frame.memory_usage(deep=True).sum()/1024:.0f} KiB, store: {on_disk/1024:.0f} KiB on disk "
+          f"(build {build_time*1000:.0f} ms, open {open_time*1000:.2f} ms)")
+
+    rng = random.Random(13)
+    trip_ids = [rng.choice(store.trip_ids).item() for _ in range(n_queries)]
+    stop_ids = [rng.choice(store.stop_ids).item() for _ in range(n_queries)]
+    times = [rng.randrange(5 * 3600, 23 * 3600) for _ in range(n_queries)]
+    _, trip_time = timed(lambda: [store.trip_stop_times_by_id(trip_id) for trip_id in trip_ids])
+    _, stop_time = timed(lambda: [store.departures_by_id(stop_id, t, limit=5) for stop_id, t in zip(stop_ids, times)])
+    _, frame_time = timed(lambda: [frame[frame['trip_id'] == trip_id] for trip_id in trip_ids[:100]])
+    print(f"stop times of trip: {trip_time/n_queries*1e6:.1f} us (DataFrame filter {frame_time/100*1e6:.0f} us), "
+          f"next 5 departures at stop: {stop_time/n_queries*1e6:.1f} us")
+    del store
+    shutil.rmtree(path)
+
+
+def benchmark_departure_board(n_queries=2000, screens=200):
+    """Next-N departures per stop, one at a time and batched for a wall of display screens"""
+    print("== Departure board ==")
+    timetable = Timetable.from_csv()
+    board, build_time = timed(lambda: DepartureBoard(timetable))
+    rng = random.Random(14)
+    stops = [rng.randrange(timetable.num_stops) for _ in range(n_queries)]
+    times = [rng.randrange(0, 24 * 3600) for _ in range(n_queries)]
+    _, single_time = timed(lambda: [board.next_departures(stop, t, 5) for stop, t in zip(stops, times)])
+
+    def scan(stop, t):
+        # Baseline: filter and sort the stop's rows on every request (no rollover)
+        rows = np.flatnonzero(timetable.st_stop == stop)
+        rows = rows[timetable.st_departure[rows] >= t]
+        return rows[np.argsort(timetable.st_departure[rows], kind='stable')][:5]
+    _, scan_time = timed(lambda: [scan(stop, t) for stop, t in zip(stops[:200], times[:200])])
+    _, batch_time = timed(lambda: board.next_departures_batch(stops[:screens], 8 * 3600, 5), repeat=20)
+    print(f"build: {build_time*1000:.1f} ms for {len(board)} departures, next 5: {single_time/n_queries*1e6:.1f} us "
+          f"(array scan {scan_time/200*1e6:.0f} us), batch of {screens} stops: {batch_time*1000:.2f} ms")
+
+
+def benchmark_vehicle_positions(G, repeat=50):
+    """Full-fleet position snapshots, with and without traffic multipliers"""
+    print("== Vehicle positions ==")
+    timetable = Timetable.from_csv()
+    compiled = CompiledGraph(G)
+    tracker, build_time = timed(lambda: VehicleTracker(timetable, compiled))
+    multipliers = TrafficModel(compiled.num_edges, seed=0, hour=9).multipliers
+    for label, now in (("09:00", 9 * 3600), ("18:30", 18 * 3600 + 1800)):
+        fleet, plain_time = timed(lambda: tracker.snapshot(now), repeat=repeat)
+        _, traffic_time = timed(lambda: tracker.snapshot(now, multipliers), repeat=repeat)
+        print(f"{label}: {len(fleet.trips)} running trips, snapshot {plain_time*1000:.2f} ms "
+              f"({traffic_time*1000:.2f} ms with traffic)")
+    print(f"build: {build_time*1000:.0f} ms for {timetable.num_trips} trips")
+
+
+def line_timetable(G, station_coords, n_lines=300, trips_per_line=24, headway=1800, seed=0):
+    """Timetable of multi-stop trips running along shortest paths of the graph
+
+    Every bundled trip has a single stop time, so it has no hops for a feed to delay.
+    Each line here follows the fastest path between two random stops (at least four
+    stops long), with hop times from the graph and a trip every headway seconds from 06:00.
+    """
+    compiled = CompiledGraph(G)
+    rng = random.Random(seed)
+    stops, stop_times, trips = set(), [], []
+    while len(trips) < n_lines * trips_per_line:
+        origin, destination = rng.sample(range(compiled.num_nodes), 2)
+        dist, pred = compiled.dijkstra(origin, destination)
+        if dist[destination] == float('inf'):
+            continue
+        path = compiled.path_to(pred, origin, destination)
+        if len(path) < 4:
+            continue
+        line = f"L{len(trips) // trips_per_line}"
+        names = [compiled.nodes[v] for v in path]
+        stops.update(names)
+        for k in range(trips_per_line):
+            trip_id = f"{line}-{k}"
+            trips.append((trip_id, line))
+            t = 6 * 3600 + k * headway
+            for sequence, (u, v) in enumerate(zip([None] + path[:-1], path), start=1):
+                if u is not None:
+                    t += round(60 * compiled._weights[compiled.edge_id(u, v)])
+                stop_times.append((trip_id, compiled.nodes[v], sequence, format_time(t), format_time(t)))
+    stops = sorted(stops)
+    coords = [station_coords.get(name, (np.nan, np.nan)) for name in stops]
+    return Timetable(
+        pd.DataFrame({'stop_id': stops, 'stop_name': stops,
+                      'stop_lat': [c[0] for c in coords], 'stop_lon': [c[1] for c in coords]}),
+        pd.DataFrame(trips, columns=['trip_id', 'route_id']),
+        pd.DataFrame(stop_times, columns=['trip_id', 'stop_id', 'stop_sequence', 'arrival_time', 'departure_time']))
+
+
+def benchmark_realtime_ingestion(G, station_coords, n_updates=50000, n_pairs=100):
+    """Realtime feed throughput from a JSON-lines file, with planning queries running alongside
+
+    Runs on the bundled timetable (one stop per trip: delays, no hops) and on line_timetable,
+    whose multi-stop trips turn delays into traffic observations for the planner.
+    """
+    print("== Realtime ingestion ==")
+    for name, timetable in (('bundled', Timetable.from_csv()), ('lines', line_timetable(G, station_coords))):
+        planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, timetable=timetable, traffic_seed=0)
+        lengths = np.diff(timetable.trip_offsets).tolist()
+        rng = random.Random(15)
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as feed:
+            for i in range(n_updates):
+                trip = rng.randrange(timetable.num_trips)
+                trip_id = timetable.trip_ids[trip]
+                kind = rng.random()
+                if kind < 0.6:
+                    entity = {'id': str(i), 'trip_update': {'trip': {'trip_id': trip_id}, 'stop_time_update': [
+                        {'stop_sequence': rng.randint(1, lengths[trip]),
+                         'arrival': {'delay': rng.randrange(-60, 900)}}]}}
+                elif kind < 0.95:
+                    entity = {'id': str(i), 'vehicle': {'trip': {'trip_id': trip_id}, 'timestamp': i,
+                                                        'position': {'latitude': 12.97, 'longitude': 77.59}}}
+                else:
+                    entity = {'id': str(i), 'trip_update': {'trip': {'trip_id': trip_id,
+                                                                     'schedule_relationship': 'CANCELED'}}}
+                feed.write(json.dumps(entity) + "\n")
+
+        ingestor = RealtimeIngestor(planner)
+        pairs = sample_od_pairs(G, n_pairs, seed=16)
+        answered = []
+
+        def query_loop():
+            while ingestor.processed < n_updates:
+                for o, d in pairs:
+                    planner.calculate_path(o, d)
+                    answered.append(1)
+
+        worker = threading.Thread(target=query_loop)
+        start = time.perf_counter()
+        worker.start()
+        ingestor.run(feed.name)
+        elapsed = time.perf_counter() - start
+        worker.join()
+        os.remove(feed.name)
+        state = ingestor.state.snapshot
+        print(f"[{name}] {n_updates} updates in {elapsed*1000:.0f} ms ({n_updates/elapsed:,.0f} updates/s) "
+              f"with {len(answered)} queries answered meanwhile; "
+              f"{int(state.cancelled.to_numpy().sum())} trips cancelled, snapshot v{state.version}, "
+              f"traffic epoch {planner.snapshot.epoch}")
+
+    # The feed reaches the queries: delayed departures and journeys, no cancelled trips
+    busiest = int(np.bincount(timetable.st_stop).argmax())
+    live = planner.departure_board.next_departures(busiest, 8 * 3600, 10, state)
+    scheduled = planner.departure_board.next_departures(busiest, 8 * 3600, 10)
+    print(f"[{name}] next 10 departures at {timetable.stop_names[busiest]} from 08:00: "
+          f"{sum(d.delay != 0 for d in live)} delayed, "
+          f"{sum(state.cancelled[timetable.trip_index[d.trip_id]] for d in scheduled)} scheduled ones cancelled, "
+          f"{len(planner.vehicle_positions('08:40').trips)} vehicles running at 08:40 "
+          f"({len(planner.vehicle_tracker.snapshot(8 * 3600 + 2400).trips)} scheduled)")
+
+
+def benchmark_snapshot_serving(G, station_coords, n_pairs=300, workers=8, refresh_interval=0.005):
+    """One shared planner under a thread pool while a background refresher keeps publishing traffic"""
+    print("== Concurrent serving over traffic snapshots ==")
+    planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, traffic_seed=0, cache_size=0)
+    pairs = sample_od_pairs(G, n_pairs, seed=17)
+
+    def query(pair):
+        with planner.pinned_snapshot() as snapshot:
+            result = planner.calculate_path(*pair)
+            # The reported time must match the pinned snapshot's weights along the returned path
+            consistent = isinstance(result, NoRoute) or \
+                abs(planner._score_path(list(result['path']))[0] - result['time']) < 1e-9
+        return snapshot.epoch, consistent
+
+    _, serial_time = timed(lambda: [query(pair) for pair in pairs])
+    planner.start_traffic_refresher(refresh_interval)
+    with ThreadPoolExecutor(workers) as pool:
+        outcomes, pooled_time = timed(lambda: list(pool.map(query, pairs)))
+    planner.stop_traffic_refresher()
+    epochs = {epoch for epoch, _ in outcomes}
+    print(f"serial: {serial_time/n_pairs*1e3:.2f} ms/query, {workers} threads with refresher: "
+          f"{pooled_time/n_pairs*1e3:.2f} ms/query over {len(epochs)} traffic epochs, "
+          f"consistent results: {sum(ok for _, ok in outcomes)}/{n_pairs}")
+
+
+def benchmark_service_load(G, station_coords, concurrency=32, duration=5.0, workers=4):
+    """Closed-loop HTTP load against an in-process PlanningService, with and without coalescing"""
+    print("== Planning service under load ==")
+    planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, traffic_seed=0,
+                                     timetable=TransitNetwork.load_or_build().timetable)
+    paths = request_paths(sorted(G.nodes()), station_coords, hot_pairs=200)
+
+    async def drive(max_pending):
+        service = PlanningService(planner, workers=workers, max_pending=max_pending)
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await run_load('127.0.0.1', port, paths, concurrency, duration), service.stats
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.close()
+
+    for max_pending in (64, concurrency // 4):
+        report, stats = asyncio.run(drive(max_pending))
+        print(f"max_pending={max_pending}: {report['throughput']:.0f} req/s, p50 {report['p50_ms']:.1f} ms, "
+              f"p99 {report['p99_ms']:.1f} ms, coalesced {stats['coalesced']}/{stats['requests']}, "
+              f"statuses {report['statuses']}")
+
+
+def benchmark_alternative_routes(G, station_coords, n_pairs=100, k=10):
+    """Yen's k shortest simple paths with a shared reverse tree vs networkx, and planner alternatives"""
+    print("== Alternative routes ==")
+    compiled = CompiledGraph(G)
+    simple = nx.DiGraph()
+    for u in range(compiled.num_nodes):
+        for e in range(compiled.offsets[u], compiled.offsets[u + 1]):
+            simple.add_edge(u, int(compiled.targets[e]), time=compiled.weights[e])
+    pairs = [(compiled.node_index[o], compiled.node_index[d]) for o, d in sample_od_pairs(G, n_pairs, seed=23)]
+
+    def reference(source, target):
+        try:
+            return [nx.path_weight(simple, path, 'time')
+                    for path in islice(nx.shortest_simple_paths(simple, source, target, weight='time'), k)]
+        except nx.NetworkXNoPath:
+            return []
+
+    expected, nx_time = timed(lambda: [reference(s, t) for s, t in pairs])
+    found, ksp_time = timed(lambda: [[cost for _, cost in islice(KShortestPaths(compiled, s, t), k)]
+                                     for s, t in pairs])
+    agree = sum(np.allclose(a, b) if len(a) == len(b) else False for a, b in zip(expected, found))
+    print(f"{k} shortest paths: networkx {nx_time/n_pairs*1e3:.2f} ms/pair, "
+          f"KShortestPaths {ksp_time/n_pairs*1e3:.2f} ms/pair, same times: {agree}/{n_pairs}")
+
+    planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, traffic_seed=0, cache_size=0)
+    names = [(compiled.nodes[s], compiled.nodes[t]) for s, t in pairs]
+    first = []
+    for origin, destination in names:
+        start = time.perf_counter()
+        routes = planner.alternative_routes(origin, destination)
+        next(routes, None)
+        next(routes, None)
+        first.append(time.perf_counter() - start)
+    suggested, suggest_time = timed(lambda: [planner.suggest_alternatives(o, d, 3) for o, d in names])
+    print(f"suggest_alternatives(3): {suggest_time/n_pairs*1e3:.2f} ms/query, first alternative after "
+          f"{np.mean(first)*1e3:.2f} ms, routes found: {sum(map(len, suggested))}/{3 * n_pairs}")
+
+
+def benchmark_accessibility(G, station_coords, max_time=60, n_guide_origins=2, n_observed_edges=5):
+    """Bounded isochrones vs one calculate_path per destination, and citywide recomputes after traffic updates"""
+    print("== Accessibility ==")
+    planner = EnhancedTransitPlanner(G, station_coords, calculate_fare, traffic_seed=0, cache_size=0)
+    origins = [hub for hub, _ in planner.major_hubs[:n_guide_origins]]
+
+    def per_destination(origin):
+        # The guide's analyze_accessibility: a full path search towards every stop
+        reached = 0
+        for destination in G.nodes():
+            if destination != origin:
+                result = planner.calculate_path(origin, destination)
+                reached += bool(result) and result['time'] <= max_time
+        return reached
+
+    expected, guide_time = timed(lambda: [per_destination(origin) for origin in origins])
+    found, iso_time = timed(lambda: [len(planner.analyze_accessibility(origin, max_time)) for origin in origins],
+                            repeat=20)
+    print(f"one origin: per-destination paths {guide_time/len(origins)*1e3:.0f} ms, "
+          f"bounded isochrone {iso_time/len(origins)*1e3:.2f} ms (stops reached {found} vs {expected} "
+          f"with transfer penalties)")
+
+    serial, serial_time = timed(lambda: planner.accessibility(max_time_minutes=max_time, processes=1))
+    workers = pool_processes(None, len(serial.origins))
+    _, pool_time = timed(lambda: planner.accessibility(max_time_minutes=max_time))
+    raster, raster_time = timed(lambda: planner.accessibility_raster(serial.origins, reachable_counts(serial)))
+    print(f"citywide ({len(serial.origins)} origins, {len(serial.stops)} reachable pairs): "
+          f"{serial_time:.2f} s in-process, {pool_time:.2f} s with {workers} process(es) "
+          f"(pool from {POOL_MIN_ORIGINS} origins on more than one CPU); "
+          f"raster {raster.grid.shape} in {raster_time*1e3:.1f} ms")
+
+    rng = np.random.default_rng(0)
+    edges = rng.choice(planner.compiled.num_edges, n_observed_edges, replace=False)
+    planner.apply_traffic_observations(edges, rng.uniform(0.5, 2.0, n_observed_edges))
+    updated, update_time = timed(lambda: planner.accessibility(previous=serial, processes=1))
+    fresh = planner.accessibility(max_time_minutes=max_time, processes=1)
+    same = np.array_equal(updated.stops, fresh.stops) and np.array_equal(updated.times, fresh.times)
+    planner.realtime_traffic = False
+    planner.refresh_traffic()
+    _, refresh_time = timed(lambda: planner.accessibility(previous=updated, processes=1))
+    print(f"after a realtime batch on {n_observed_edges} edges: {update_time:.2f} s incremental "
+          f"(matches full recompute: {same}); after a full traffic refresh: {refresh_time:.2f} s")
+
+
+if __name__ == "__main__":
+    G, station_coords = build_network()
+    print(f"Graph has {len(G.nodes())} nodes and {len(G.edges())} edges")
+    benchmark_compiled_graph(G, station_coords)
+    benchmark_raptor(G, station_coords)
+    benchmark_connection_scan()
+    benchmark_landmarks(G, station_coords)
+    benchmark_contraction_hierarchy(G)
+    benchmark_travel_time_matrix(G, station_coords)
+    benchmark_route_cache(G, station_coords)
+    benchmark_traffic_refresh()
+    benchmark_traffic_aware_search(G, station_coords)
+    benchmark_transfer_search(G, station_coords)
+    benchmark_name_index(G)
+    benchmark_spatial_index(G, station_coords)
+    benchmark_process_path(G, station_coords)
+    benchmark_lazy_results(G, station_coords)
+    benchmark_network_loading()
+    benchmark_stop_time_store()
+    benchmark_departure_board()
+    benchmark_vehicle_positions(G)
+    benchmark_realtime_ingestion(G, station_coords)
+    benchmark_snapshot_serving(G, station_coords)
+    benchmark_service_load(G, station_coords)
+    benchmark_alternative_routes(G, station_coords)
+    benchmark_accessibility(G, station_coords)
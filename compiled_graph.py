@@ -0,0 +1,330 @@
+import heapq
+from itertools import count
+
+import numpy as np
+import networkx as nx
+
+
+class CompiledGraph:
+    """Array-backed (CSR) snapshot of a transit MultiDiGraph for fast shortest-path queries"""
+
+    def __init__(self, graph, weight='time'):
+        # Intern stop names as integer IDs (graph insertion order)
+        self.nodes = list(graph.nodes())
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+
+        # Route table shared by all edges, so each edge only stores an integer route ID
+        self.route_ids = []
+        self.route_types = []
+        route_lookup = {}
+
+        offsets = [0]
+        targets = []
+        weights = []
+        edge_routes = []
+
+        for u in self.nodes:
+            # Keep the adjacency order networkx uses so ties resolve to the same paths
+            for v, edge_dict in graph.succ[u].items():
+                # Collapse parallel edges to the min-time route (first one wins ties, like _process_path)
+                best = None
+                for data in edge_dict.values():
+                    if best is None or data[weight] < best[weight]:
+                        best = data
+
+                route_key = (best['route_id'], best.get('type', '3'))
+                if route_key not in route_lookup:
+                    route_lookup[route_key] = len(self.route_ids)
+                    self.route_ids.append(route_key[0])
+                    self.route_types.append(route_key[1])
+
+                targets.append(self.node_index[v])
+                weights.append(float(best[weight]))
+                edge_routes.append(route_lookup[route_key])
+            offsets.append(len(targets))
+
+        # Reverse CSR (incoming edges per stop, in networkx predecessor order) for backward searches
+        edge_lookup = {}
+        for u in range(len(self.nodes)):
+            for e in range(offsets[u], offsets[u + 1]):
+                edge_lookup[(u, targets[e])] = e
+        rev_offsets = [0]
+        rev_sources = []
+        rev_edges = []
+        for v, node in enumerate(self.nodes):
+            for u in graph.pred[node]:
+                e = edge_lookup[(self.node_index[u], v)]
+                rev_sources.append(self.node_index[u])
+                rev_edges.append(e)
+            rev_offsets.append(len(rev_sources))
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.targets = np.array(targets, dtype=np.int32)
+        self.sources = np.repeat(np.arange(len(self.nodes), dtype=np.int32), np.diff(self.offsets))
+        self.weights = np.array(weights, dtype=np.float64)
+        self.edge_routes = np.array(edge_routes, dtype=np.int32)
+        self.rev_offsets = np.array(rev_offsets, dtype=np.int64)
+        self.rev_sources = np.array(rev_sources, dtype=np.int32)
+        self.rev_edges = np.array(rev_edges, dtype=np.int32)
+        # Position of each CSR edge in the reverse adjacency (inverse of rev_edges)
+        self.rev_positions = np.empty(len(rev_edges), dtype=np.int32)
+        self.rev_positions[self.rev_edges] = np.arange(len(rev_edges), dtype=np.int32)
+        self.edge_index = edge_lookup  # (u, v) stop IDs -> CSR edge
+
+        # Plain-list mirrors for the Python search loop (indexing numpy scalars one by one is slow)
+        self._offsets = offsets
+        self._targets = targets
+        self._weights = weights
+        self._edge_routes = edge_routes
+        self._rev_offsets = rev_offsets
+        self._rev_sources = rev_sources
+        self._rev_weights = [weights[e] for e in rev_edges]
+        self._rev_positions = self.rev_positions.tolist()
+
+    @property
+    def num_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def num_edges(self):
+        return len(self._targets)
+
+    def edge_id(self, u, v):
+        """Return the CSR index of the collapsed edge u -> v (stop IDs), or -1 if there is none"""
+        return self.edge_index.get((u, v), -1)
+
+    def edge_route(self, e):
+        """Return (route_id, route_type) of the min-time route on edge e"""
+        r = self.edge_routes[e]
+        return self.route_ids[r], self.route_types[r]
+
+    def reverse_weights(self, weights):
+        """Reorder per-edge weights (CSR order) to match the reverse adjacency"""
+        return [weights[e] for e in self.rev_edges.tolist()]
+
+    def dijkstra(self, source, target=-1, reverse=False, weights=None, rev_weights=None):
+        """Heap-based Dijkstra from stop ID source; returns (dist, pred) lists with inf / -1 when unreached
+
+        With reverse=True the search follows edges backwards, so dist[v] is the time from v
+        to source and pred[v] is the next stop after v on the way there. weights optionally
+        replaces the base edge times (one value per CSR edge, e.g. traffic-adjusted);
+        rev_weights is the same data from reverse_weights, to skip reordering per query.
+        """
+        if reverse:
+            offsets, targets = self._rev_offsets, self._rev_sources
+            if weights is None:
+                weights = self._rev_weights
+            else:
+                weights = self.reverse_weights(weights) if rev_weights is None else rev_weights
+        else:
+            offsets, targets = self._offsets, self._targets
+            weights = self._weights if weights is None else weights
+
+        n = len(self.nodes)
+        dist = [float('inf')] * n
+        seen = [float('inf')] * n
+        pred = [-1] * n
+        settled = [False] * n
+
+        # Counter breaks ties in insertion order, matching networkx's Dijkstra
+        c = count()
+        seen[source] = 0.0
+        fringe = [(0.0, next(c), source)]
+        while fringe:
+            d, _, v = heapq.heappop(fringe)
+            if settled[v]:
+                continue
+            settled[v] = True
+            dist[v] = d
+            if v == target:
+                break
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                if settled[u]:
+                    continue
+                vu_dist = d + weights[e]
+                if vu_dist < seen[u]:
+                    seen[u] = vu_dist
+                    pred[u] = v
+                    heapq.heappush(fringe, (vu_dist, next(c), u))
+
+        return dist, pred
+
+    def multi_source_path(self, sources, targets, weights=None):
+        """Cheapest path from any stop in sources to any stop in targets
+
+        sources and targets map stop IDs to an extra cost at that end (e.g. minutes of
+        walking to board or after alighting). Returns (stop-ID path, total cost), or None
+        when no target is reachable.
+        """
+        offsets, neighbours = self._offsets, self._targets
+        weights = self._weights if weights is None else weights
+        n = len(self.nodes)
+        inf = float('inf')
+        seen = [inf] * n
+        pred = [-1] * n
+        settled = [False] * n
+
+        c = count()
+        fringe = []
+        for source, cost in sources.items():
+            if cost < seen[source]:
+                seen[source] = cost
+                heapq.heappush(fringe, (cost, next(c), source))
+
+        best, best_target = inf, -1
+        while fringe:
+            d, _, v = heapq.heappop(fringe)
+            if d >= best:
+                break
+            if settled[v]:
+                continue
+            settled[v] = True
+            if v in targets and d + targets[v] < best:
+                best, best_target = d + targets[v], v
+            for e in range(offsets[v], offsets[v + 1]):
+                u = neighbours[e]
+                if settled[u]:
+                    continue
+                vu_dist = d + weights[e]
+                if vu_dist < seen[u]:
+                    seen[u] = vu_dist
+                    pred[u] = v
+                    heapq.heappush(fringe, (vu_dist, next(c), u))
+
+        if best_target < 0:
+            return None
+        path = [best_target]
+        while pred[path[-1]] >= 0:
+            path.append(pred[path[-1]])
+        path.reverse()
+        return path, best
+
+    def shortest_path_tree(self, root, reverse=False, weights=None, rev_weights=None):
+        """Shortest-path tree from stop name root (or towards it with reverse=True)"""
+        if root not in self.node_index:
+            raise nx.NodeNotFound(f"Node {root} is not in G")
+        dist, pred = self.dijkstra(self.node_index[root], reverse=reverse, weights=weights, rev_weights=rev_weights)
+        return ShortestPathTree(self, self.node_index[root], dist, pred, reverse)
+
+    def path_to(self, pred, source, target):
+        """Rebuild the stop-ID path from source to target out of a predecessor list"""
+        path = [target]
+        while path[-1] != source:
+            path.append(pred[path[-1]])
+        path.reverse()
+        return path
+
+    def bidirectional_dijkstra(self, source, target, weights=None, rev_weights=None):
+        """Bidirectional Dijkstra between stop IDs; returns the stop-ID path or None when unreachable"""
+        # Expansion order and tie-breaking mirror nx.bidirectional_dijkstra, which
+        # nx.shortest_path uses, so equal-time alternatives resolve to the same path
+        n = len(self.nodes)
+        inf = float('inf')
+        if weights is None:
+            weights, rev_weights = self._weights, self._rev_weights
+        elif rev_weights is None:
+            rev_weights = self.reverse_weights(weights)
+        adjacency = [
+            (self._offsets, self._targets, weights),
+            (self._rev_offsets, self._rev_sources, rev_weights),
+        ]
+        settled = [[False] * n, [False] * n]
+        seen = [[inf] * n, [inf] * n]
+        preds = [[-1] * n, [-1] * n]
+        seen[0][source] = 0.0
+        seen[1][target] = 0.0
+
+        c = count()
+        fringe = [[(0.0, next(c), source)], [(0.0, next(c), target)]]
+        finaldist = None
+        meetnode = -1
+        direction = 1
+        while fringe[0] and fringe[1]:
+            direction = 1 - direction
+            dist, _, v = heapq.heappop(fringe[direction])
+            if settled[direction][v]:
+                continue
+            settled[direction][v] = True
+            if settled[1 - direction][v]:
+                # Scanned from both sides: the best meeting point found so far is optimal
+                path = [meetnode]
+                while path[-1] != source:
+                    path.append(preds[0][path[-1]])
+                path.reverse()
+                node = meetnode
+                while node != target:
+                    node = preds[1][node]
+                    path.append(node)
+                return path
+
+            offsets, neighbours, weights = adjacency[direction]
+            dir_seen = seen[direction]
+            other_seen = seen[1 - direction]
+            for e in range(offsets[v], offsets[v + 1]):
+                w = neighbours[e]
+                if settled[direction][w]:
+                    continue
+                vw_length = dist + weights[e]
+                if vw_length < dir_seen[w]:
+                    dir_seen[w] = vw_length
+                    heapq.heappush(fringe[direction], (vw_length, next(c), w))
+                    preds[direction][w] = v
+                    if other_seen[w] < inf:
+                        finaldist_w = vw_length + other_seen[w]
+                        if finaldist is None or finaldist > finaldist_w:
+                            finaldist, meetnode = finaldist_w, w
+        return None
+
+    def shortest_path(self, origin, destination, weights=None, rev_weights=None):
+        """Drop-in replacement for nx.shortest_path(G, origin, destination, weight='time')
+
+        weights/rev_weights optionally replace the base edge times, as in dijkstra.
+        """
+        if origin not in self.node_index:
+            raise nx.NodeNotFound(f"Source {origin} is not in G")
+        if destination not in self.node_index:
+            raise nx.NodeNotFound(f"Target {destination} is not in G")
+
+        source = self.node_index[origin]
+        target = self.node_index[destination]
+        if source == target:
+            return [origin]
+
+        path = self.bidirectional_dijkstra(source, target, weights, rev_weights)
+        if path is None:
+            raise nx.NetworkXNoPath(f"No path between {origin} and {destination}.")
+
+        return [self.nodes[i] for i in path]
+
+
+class ShortestPathTree:
+    """Paths from (or, reversed, to) one root stop, read lazily out of a Dijkstra predecessor list"""
+
+    def __init__(self, graph, root, dist, pred, reverse=False):
+        self.graph = graph
+        self.root = root
+        self.dist = dist
+        self.pred = pred
+        self.reverse = reverse
+
+    def __contains__(self, node):
+        i = self.graph.node_index.get(node)
+        return i is not None and self.dist[i] < float('inf')
+
+    def __getitem__(self, node):
+        """Stop-name path root -> node (or node -> root for a reverse tree)"""
+        if node not in self:
+            raise KeyError(node)
+        path = self.graph.path_to(self.pred, self.root, self.graph.node_index[node])
+        if self.reverse:
+            path.reverse()
+        return [self.graph.nodes[i] for i in path]
+
+    def get(self, node, default=None):
+        return self[node] if node in self else default
+
+    def distance(self, node):
+        """Travel time between the root and node (inf when unreachable)"""
+        i = self.graph.node_index.get(node)
+        return float('inf') if i is None else self.dist[i]
@@ -0,0 +1,176 @@
+from bisect import bisect_right
+
+import numpy as np
+
+INF = float('inf')
+
+
+class ConnectionScan:
+    """Connection Scan Algorithm over every elementary connection of a Timetable"""
+
+    def __init__(self, timetable, transfer_time=120):
+        self.timetable = timetable
+        self.transfer_time = transfer_time  # seconds to walk between stops sharing a name
+        self.footpaths = timetable.footpaths(transfer_time)
+
+        # One connection per pair of consecutive stop times of the same trip
+        same_trip = timetable.st_trip[:-1] == timetable.st_trip[1:]
+        dep_stop = timetable.st_stop[:-1][same_trip]
+        arr_stop = timetable.st_stop[1:][same_trip]
+        dep_time = timetable.st_departure[:-1][same_trip]
+        arr_time = timetable.st_arrival[1:][same_trip]
+        trip = timetable.st_trip[:-1][same_trip]
+        position = np.nonzero(same_trip)[0]  # index of the departure stop time
+
+        # Single contiguous array sorted by departure (then arrival) time
+        order = np.lexsort((arr_time, dep_time))
+        self.dep_stop = dep_stop[order]
+        self.arr_stop = arr_stop[order]
+        self.dep_time = dep_time[order]
+        self.arr_time = arr_time[order]
+        self.trip = trip[order]
+        self.position = position[order]
+
+    @property
+    def num_connections(self):
+        return len(self.dep_time)
+
+    def profile(self, sources, targets, window_start, window_end):
+        """Pareto set of (departure, arrival) journeys leaving a source stop within the window, as lists of legs"""
+        targets = set(targets)
+
+        # Per-stop profiles (created on first use), appended in decreasing departure order with
+        # strictly decreasing arrival. Departures are stored negated so they stay ascending for bisect.
+        profile_deps = {}
+        profile_arrs = {}
+        profile_conns = {}
+        trip_arrival = {}  # best arrival at the target when staying on the trip
+        trip_exit = {}     # connection where that best continuation leaves the trip
+        conn_exit = {}     # trip_exit as it was when each connection was scanned
+
+        dep_stop = self.dep_stop.tolist()
+        arr_stop = self.arr_stop.tolist()
+        dep_time = self.dep_time.tolist()
+        arr_time = self.arr_time.tolist()
+        trips = self.trip.tolist()
+
+        # One backward scan over every connection departing at or after the window start
+        first = int(np.searchsorted(self.dep_time, window_start, side='left'))
+        for c in range(len(dep_time) - 1, first - 1, -1):
+            arrival = arr_time[c]
+            stop = arr_stop[c]
+            trip = trips[c]
+
+            # Get off here: at the target, or transfer onto the best onward journey
+            best = self._arrive_or_transfer(stop, arrival, targets, profile_deps, profile_arrs)
+            exit_conn = c
+            # Stay seated on the trip (preferred on ties, it saves a transfer)
+            seated = trip_arrival.get(trip, INF)
+            if seated <= best and seated < INF:
+                best = seated
+                exit_conn = trip_exit[trip]
+            if best == INF:
+                continue
+            trip_arrival[trip] = best
+            trip_exit[trip] = exit_conn
+            conn_exit[c] = exit_conn
+
+            # Add (departure, arrival) at the boarding stop unless it is dominated
+            boarding = dep_stop[c]
+            if boarding not in profile_deps:
+                profile_deps[boarding] = []
+                profile_arrs[boarding] = []
+                profile_conns[boarding] = []
+            deps = profile_deps[boarding]
+            arrs = profile_arrs[boarding]
+            conns = profile_conns[boarding]
+            if arrs and best >= arrs[-1]:
+                continue
+            if deps and deps[-1] == -dep_time[c]:
+                deps.pop()
+                arrs.pop()
+                conns.pop()
+            deps.append(-dep_time[c])
+            arrs.append(best)
+            conns.append(c)
+
+        # Merge the source profiles into one Pareto front inside the window
+        candidates = []
+        for s in sources:
+            if s not in profile_deps:
+                continue
+            for neg_dep, arrival, c in zip(profile_deps[s], profile_arrs[s], profile_conns[s]):
+                if window_start <= -neg_dep <= window_end:
+                    candidates.append((-neg_dep, arrival, c))
+        candidates.sort(key=lambda x: (-x[0], x[1]))
+        front = []
+        for departure, arrival, c in candidates:
+            if not front or arrival < front[-1][1]:
+                front.append((departure, arrival, c))
+        front.reverse()
+
+        return [self._reconstruct(c, targets, profile_deps, profile_arrs, profile_conns, conn_exit)
+                for _, _, c in front]
+
+    def _arrive_or_transfer(self, stop, arrival, targets, profile_deps, profile_arrs):
+        """Best target arrival after reaching stop at `arrival` and getting off there"""
+        best = arrival if stop in targets else INF
+        options = [(stop, 0)] + self.footpaths[stop]
+        for other, walk in options:
+            ready = arrival + walk
+            if walk and other in targets:
+                best = min(best, ready)
+            if other not in profile_deps:
+                continue
+            # Entry with the smallest departure >= ready has the best arrival
+            i = bisect_right(profile_deps[other], -ready) - 1
+            if i >= 0:
+                best = min(best, profile_arrs[other][i])
+        return best
+
+    def _reconstruct(self, c, targets, profile_deps, profile_arrs, profile_conns, conn_exit):
+        """Follow trip exits and profile entries from connection c into a list of legs"""
+        tt = self.timetable
+        legs = []
+        while True:
+            trip = int(self.trip[c])
+            exit_conn = conn_exit[c]
+            board = int(self.position[c])
+            alight = int(self.position[exit_conn]) + 1
+            legs.append({
+                'route_id': tt.trip_route[trip],
+                'trip_id': tt.trip_ids[trip],
+                'stops': tt.st_stop[board:alight + 1].tolist(),
+                'departure': int(self.dep_time[c]),
+                'arrival': int(self.arr_time[exit_conn]),
+            })
+
+            stop = int(self.arr_stop[exit_conn])
+            arrival = int(self.arr_time[exit_conn])
+            if stop in targets:
+                return legs
+
+            # Continue with whichever transfer option produced the recorded arrival
+            next_conn = None
+            next_arrival = INF
+            for other, walk in [(stop, 0)] + self.footpaths[stop]:
+                ready = arrival + walk
+                if walk and other in targets and ready < next_arrival:
+                    next_conn, next_arrival = ('walk', other, walk), ready
+                if other not in profile_deps:
+                    continue
+                i = bisect_right(profile_deps[other], -ready) - 1
+                if i >= 0 and profile_arrs[other][i] < next_arrival:
+                    next_conn, next_arrival = (other, walk, profile_conns[other][i]), profile_arrs[other][i]
+            if next_conn is None:
+                return legs
+
+            if next_conn[0] == 'walk':
+                _, other, walk = next_conn
+                legs.append({'route_id': None, 'trip_id': None, 'stops': [stop, other],
+                             'departure': arrival, 'arrival': arrival + walk})
+                return legs
+            other, walk, c = next_conn
+            if walk:
+                legs.append({'route_id': None, 'trip_id': None, 'stops': [stop, other],
+                             'departure': arrival, 'arrival': arrival + walk})
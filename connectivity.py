@@ -0,0 +1,196 @@
+import numpy as np
+
+# Reasons reported by NoRoute
+UNKNOWN_ORIGIN = 'unknown_origin'
+UNKNOWN_DESTINATION = 'unknown_destination'
+DISCONNECTED = 'disconnected'            # origin and destination are in different weakly connected components
+NO_DIRECTED_PATH = 'no_directed_path'    # same component, but the route directions never lead there
+NO_PATH_FOUND = 'no_path_found'          # reachable, but no search strategy produced a path
+NO_JOURNEY = 'no_journey'                # no timetable journey from the departure time within max_transfers
+
+
+class NoRoute:
+    """Falsy result returned by calculate_path when there is no route, carrying a structured reason
+
+    Immutable, like the frozen RouteResults, since cached instances are shared between callers.
+    """
+
+    __slots__ = ('origin', 'destination', 'reason', 'message')
+
+    def __init__(self, origin, destination, reason, message):
+        object.__setattr__(self, 'origin', origin)
+        object.__setattr__(self, 'destination', destination)
+        object.__setattr__(self, 'reason', reason)
+        object.__setattr__(self, 'message', message)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NoRoute is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("NoRoute is immutable")
+
+    def __reduce__(self):
+        # Rebuild through __init__ (process-pool workers send NoRoutes back pickled)
+        return NoRoute, (self.origin, self.destination, self.reason, self.message)
+
+    def __bool__(self):
+        return False
+
+    def __eq__(self, other):
+        return isinstance(other, NoRoute) and self.to_dict() == other.to_dict()
+
+    def __hash__(self):
+        return hash((self.origin, self.destination, self.reason, self.message))
+
+    def __repr__(self):
+        return f"NoRoute({self.origin!r}, {self.destination!r}, reason={self.reason!r})"
+
+    def to_dict(self):
+        return {
+            'origin': self.origin,
+            'destination': self.destination,
+            'reason': self.reason,
+            'message': self.message
+        }
+
+
+class ConnectivityIndex:
+    """Strongly/weakly connected component labels and condensed reachability for a CompiledGraph"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.scc = self._strongly_connected_components()
+        self.wcc = self._weakly_connected_components()
+        self._build_reachability()
+
+    def _strongly_connected_components(self):
+        """Iterative Tarjan over the CSR arrays; returns the SCC label of every stop ID"""
+        offsets = self.graph._offsets
+        targets = self.graph._targets
+        n = self.graph.num_nodes
+
+        index = [-1] * n
+        lowlink = [0] * n
+        on_stack = [False] * n
+        labels = [-1] * n
+        stack = []
+        counter = 0
+        num_components = 0
+
+        for root in range(n):
+            if index[root] >= 0:
+                continue
+            # Each frame is (node, next edge to look at)
+            work = [(root, offsets[root])]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            while work:
+                v, e = work[-1]
+                if e < offsets[v + 1]:
+                    work[-1] = (v, e + 1)
+                    w = targets[e]
+                    if index[w] < 0:
+                        index[w] = lowlink[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append((w, offsets[w]))
+                    elif on_stack[w]:
+                        lowlink[v] = min(lowlink[v], index[w])
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[v])
+                if lowlink[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        labels[w] = num_components
+                        if w == v:
+                            break
+                    num_components += 1
+
+        # Tarjan emits components in reverse topological order of the condensation
+        self.num_scc = num_components
+        return np.array(labels, dtype=np.int32)
+
+    def _weakly_connected_components(self):
+        """Union-find over all edges ignoring direction; returns the WCC label of every stop ID"""
+        n = self.graph.num_nodes
+        parent = list(range(n))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        offsets = self.graph._offsets
+        targets = self.graph._targets
+        for u in range(n):
+            for e in range(offsets[u], offsets[u + 1]):
+                ru, rv = find(u), find(targets[e])
+                if ru != rv:
+                    parent[rv] = ru
+
+        roots = [find(u) for u in range(n)]
+        _, labels = np.unique(np.array(roots, dtype=np.int32), return_inverse=True)
+        self.num_wcc = int(labels.max()) + 1 if n else 0
+        return labels.astype(np.int32)
+
+    def _build_reachability(self):
+        """Transitive closure of the condensation DAG as one bitset (Python int) per SCC"""
+        offsets = self.graph._offsets
+        targets = self.graph._targets
+        scc = self.scc.tolist()
+
+        successors = [set() for _ in range(self.num_scc)]
+        for u in range(self.graph.num_nodes):
+            for e in range(offsets[u], offsets[u + 1]):
+                cu, cv = scc[u], scc[targets[e]]
+                if cu != cv:
+                    successors[cu].add(cv)
+
+        # Tarjan labels are reverse-topological: every successor has a smaller label
+        reach = [0] * self.num_scc
+        for c in range(self.num_scc):
+            bits = 1 << c
+            for d in successors[c]:
+                bits |= reach[d]
+            reach[c] = bits
+        self._reach = reach
+        self._scc_list = scc
+
+    def reachable(self, u, v):
+        """True if stop ID v can be reached from stop ID u (O(1))"""
+        return (self._reach[self._scc_list[u]] >> self._scc_list[v]) & 1 == 1
+
+    def check(self, origin, destination):
+        """Return a NoRoute if the stop names are unknown or provably unreachable, else None"""
+        node_index = self.graph.node_index
+        if origin not in node_index:
+            return NoRoute(origin, destination, UNKNOWN_ORIGIN, f"Origin {origin} is not a known stop")
+        if destination not in node_index:
+            return NoRoute(origin, destination, UNKNOWN_DESTINATION, f"Destination {destination} is not a known stop")
+
+        u, v = node_index[origin], node_index[destination]
+        if self.wcc[u] != self.wcc[v]:
+            return NoRoute(origin, destination, DISCONNECTED,
+                           f"{origin} and {destination} are on separate parts of the network")
+        if not self.reachable(u, v):
+            return NoRoute(origin, destination, NO_DIRECTED_PATH,
+                           f"No route runs from {origin} towards {destination}")
+        return None
+
+    def via_candidates(self, origin, destination):
+        """Stop names that are reachable from origin and can reach destination"""
+        node_index = self.graph.node_index
+        u, v = node_index[origin], node_index[destination]
+        from_origin = self._reach[self._scc_list[u]]
+        scc = self._scc_list
+        return [name for w, name in enumerate(self.graph.nodes)
+                if (from_origin >> scc[w]) & 1 and (self._reach[scc[w]] >> scc[v]) & 1]
@@ -0,0 +1,298 @@
+import hashlib
+import heapq
+import os
+
+import numpy as np
+import networkx as nx
+
+CH_FORMAT_VERSION = 1
+
+
+def graph_signature(graph):
+    """Hash of a CompiledGraph's stops, edges and weights, used to validate saved hierarchies"""
+    digest = hashlib.sha1()
+    digest.update('\n'.join(map(str, graph.nodes)).encode('utf-8'))
+    digest.update(graph.offsets.tobytes())
+    digest.update(graph.targets.tobytes())
+    digest.update(graph.weights.tobytes())
+    return digest.hexdigest()
+
+
+def npz_path(path):
+    """path with the .npz suffix np.savez_compressed would give it"""
+    path = os.fspath(path)
+    return path if path.endswith('.npz') else path + '.npz'
+
+
+class ContractionHierarchy:
+    """Contraction hierarchy over the static (no-traffic) travel times of a CompiledGraph"""
+
+    def __init__(self, graph, rank, up_offsets, up_targets, up_weights, up_middle,
+                 down_offsets, down_sources, down_weights, down_middle):
+        self.graph = graph
+        self.rank = rank
+        # Upward edges v -> w (rank[w] > rank[v]) for the forward search
+        self.up_offsets = up_offsets
+        self.up_targets = up_targets
+        self.up_weights = up_weights
+        self.up_middle = up_middle
+        # Upward edges w -> v stored at v (rank[w] > rank[v]) for the backward search
+        self.down_offsets = down_offsets
+        self.down_sources = down_sources
+        self.down_weights = down_weights
+        self.down_middle = down_middle
+        self._prepare_query_structures()
+
+    def _prepare_query_structures(self):
+        """Plain lists for the search loops and an (u, v) -> middle map for shortcut unpacking"""
+        self._up = (self.up_offsets.tolist(), self.up_targets.tolist(), self.up_weights.tolist())
+        self._down = (self.down_offsets.tolist(), self.down_sources.tolist(), self.down_weights.tolist())
+        self._middle = {}
+        offsets, targets, _ = self._up
+        middle = self.up_middle.tolist()
+        for v in range(len(offsets) - 1):
+            for e in range(offsets[v], offsets[v + 1]):
+                self._middle[(v, targets[e])] = middle[e]
+        offsets, sources, _ = self._down
+        middle = self.down_middle.tolist()
+        for v in range(len(offsets) - 1):
+            for e in range(offsets[v], offsets[v + 1]):
+                self._middle[(sources[e], v)] = middle[e]
+
+    @property
+    def num_shortcuts(self):
+        return int((self.up_middle >= 0).sum() + (self.down_middle >= 0).sum())
+
+    @classmethod
+    def build(cls, graph, witness_limit=60):
+        """Contract every stop in edge-difference order, adding shortcuts where no witness path exists"""
+        n = graph.num_nodes
+        offsets, targets, weights = graph._offsets, graph._targets, graph._weights
+
+        # Remaining (uncontracted) graph: out_edges[v][w] = (weight, middle)
+        out_edges = [{} for _ in range(n)]
+        in_edges = [{} for _ in range(n)]
+        for v in range(n):
+            for e in range(offsets[v], offsets[v + 1]):
+                w = targets[e]
+                if w != v:
+                    out_edges[v][w] = (weights[e], -1)
+                    in_edges[w][v] = (weights[e], -1)
+
+        contracted = [False] * n
+        deleted_neighbours = [0] * n
+
+        def witness_distance(source, avoid, limit, wanted):
+            """Bounded local Dijkstra in the remaining graph that skips the node being contracted"""
+            dist = {source: 0.0}
+            fringe = [(0.0, source)]
+            settled = 0
+            found = {}
+            while fringe and settled < witness_limit:
+                d, u = heapq.heappop(fringe)
+                if d > dist.get(u, float('inf')) or d > limit:
+                    continue
+                settled += 1
+                if u in wanted:
+                    found[u] = d
+                    if len(found) == len(wanted):
+                        break
+                for w, (weight, _) in out_edges[u].items():
+                    if w == avoid or contracted[w]:
+                        continue
+                    nd = d + weight
+                    if nd < dist.get(w, float('inf')):
+                        dist[w] = nd
+                        heapq.heappush(fringe, (nd, w))
+            return {w: dist.get(w, float('inf')) for w in wanted}
+
+        def shortcuts_for(v):
+            """Shortcuts (u, w, weight) needed to remove v without changing any shortest distance"""
+            shortcuts = []
+            outs = out_edges[v]
+            for u, (w_uv, _) in in_edges[v].items():
+                wanted = {w: w_uv + w_vw for w, (w_vw, _) in outs.items() if w != u}
+                if not wanted:
+                    continue
+                witness = witness_distance(u, v, max(wanted.values()), set(wanted))
+                for w, via in wanted.items():
+                    if witness[w] > via:
+                        shortcuts.append((u, w, via))
+            return shortcuts
+
+        def priority(v):
+            return (len(shortcuts_for(v)) - len(in_edges[v]) - len(out_edges[v])
+                    + deleted_neighbours[v])
+
+        queue = [(priority(v), v) for v in range(n)]
+        heapq.heapify(queue)
+        rank = np.zeros(n, dtype=np.int32)
+        up = [[] for _ in range(n)]    # (w, weight, middle) with w contracted later
+        down = [[] for _ in range(n)]  # (u, weight, middle) with u contracted later
+        next_rank = 0
+
+        while queue:
+            _, v = heapq.heappop(queue)
+            if contracted[v]:
+                continue
+            # Lazy update: recompute and put back if no longer the cheapest to contract
+            current = priority(v)
+            if queue and current > queue[0][0]:
+                heapq.heappush(queue, (current, v))
+                continue
+
+            for u, w, via in shortcuts_for(v):
+                if via < out_edges[u].get(w, (float('inf'), -1))[0]:
+                    out_edges[u][w] = (via, v)
+                    in_edges[w][u] = (via, v)
+
+            # All remaining edges of v lead to higher-ranked stops
+            for w, (weight, middle) in out_edges[v].items():
+                up[v].append((w, weight, middle))
+                del in_edges[w][v]
+                deleted_neighbours[w] += 1
+            for u, (weight, middle) in in_edges[v].items():
+                down[v].append((u, weight, middle))
+                del out_edges[u][v]
+                deleted_neighbours[u] += 1
+            out_edges[v] = {}
+            in_edges[v] = {}
+            contracted[v] = True
+            rank[v] = next_rank
+            next_rank += 1
+
+        def to_csr(lists):
+            csr_offsets = np.zeros(n + 1, dtype=np.int64)
+            csr_offsets[1:] = np.cumsum([len(items) for items in lists])
+            flat = [item for items in lists for item in items]
+            return (csr_offsets,
+                    np.array([item[0] for item in flat], dtype=np.int32),
+                    np.array([item[1] for item in flat], dtype=np.float64),
+                    np.array([item[2] for item in flat], dtype=np.int32))
+
+        return cls(graph, rank, *to_csr(up), *to_csr(down))
+
+    def save(self, path):
+        """Serialise the hierarchy (and the signature of the graph it was built for) to an .npz file
+
+        As with np.savez_compressed, .npz is appended to a path without it.
+        """
+        np.savez_compressed(
+            npz_path(path),
+            version=np.array(CH_FORMAT_VERSION),
+            signature=np.array(graph_signature(self.graph)),
+            rank=self.rank,
+            up_offsets=self.up_offsets, up_targets=self.up_targets,
+            up_weights=self.up_weights, up_middle=self.up_middle,
+            down_offsets=self.down_offsets, down_sources=self.down_sources,
+            down_weights=self.down_weights, down_middle=self.down_middle,
+        )
+
+    @classmethod
+    def load(cls, path, graph):
+        """Load a saved hierarchy; raises ValueError if it was built for a different graph or format"""
+        path = npz_path(path)
+        with np.load(path) as data:
+            if int(data['version']) != CH_FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported contraction hierarchy format {int(data['version'])}")
+            if str(data['signature']) != graph_signature(graph):
+                raise ValueError(f"{path}: contraction hierarchy was built for a different network")
+            return cls(graph, data['rank'],
+                       data['up_offsets'], data['up_targets'], data['up_weights'], data['up_middle'],
+                       data['down_offsets'], data['down_sources'], data['down_weights'], data['down_middle'])
+
+    @classmethod
+    def load_or_build(cls, graph, path):
+        """Reuse the hierarchy saved at path when it matches the graph, otherwise rebuild and save it"""
+        path = npz_path(path)
+        if os.path.exists(path):
+            try:
+                return cls.load(path, graph)
+            except (ValueError, KeyError, OSError):
+                pass
+        hierarchy = cls.build(graph)
+        hierarchy.save(path)
+        return hierarchy
+
+    def query(self, source, target):
+        """Bidirectional upward search between stop IDs; returns the unpacked stop-ID path or None"""
+        if source == target:
+            return [source]
+        inf = float('inf')
+        dist = [{source: 0.0}, {target: 0.0}]
+        pred = [{source: -1}, {target: -1}]
+        settled = [set(), set()]
+        fringe = [[(0.0, source)], [(0.0, target)]]
+        adjacency = [self._up, self._down]
+        best = inf
+        meet = -1
+
+        direction = 1
+        while fringe[0] or fringe[1]:
+            # Alternate directions, skipping one that is exhausted or can no longer improve
+            direction = 1 - direction
+            if not fringe[direction] or fringe[direction][0][0] >= best:
+                direction = 1 - direction
+                if not fringe[direction] or fringe[direction][0][0] >= best:
+                    break
+            d, v = heapq.heappop(fringe[direction])
+            if v in settled[direction] or d > dist[direction][v]:
+                continue
+            settled[direction].add(v)
+            other = dist[1 - direction].get(v)
+            if other is not None and d + other < best:
+                best = d + other
+                meet = v
+
+            offsets, neighbours, weights = adjacency[direction]
+            for e in range(offsets[v], offsets[v + 1]):
+                w = neighbours[e]
+                nd = d + weights[e]
+                if nd < dist[direction].get(w, inf):
+                    dist[direction][w] = nd
+                    pred[direction][w] = v
+                    heapq.heappush(fringe[direction], (nd, w))
+
+        if meet < 0:
+            return None
+
+        # Hierarchy-level path: source .. meet (forward preds), meet .. target (backward preds)
+        up_path = [meet]
+        while pred[0][up_path[-1]] >= 0:
+            up_path.append(pred[0][up_path[-1]])
+        up_path.reverse()
+        node = meet
+        while pred[1][node] >= 0:
+            node = pred[1][node]
+            up_path.append(node)
+
+        path = [up_path[0]]
+        for u, v in zip(up_path[:-1], up_path[1:]):
+            self._unpack(u, v, path)
+        return path
+
+    def _unpack(self, u, v, path):
+        """Append the original stops of edge u -> v (after u) to path, expanding shortcuts"""
+        stack = [(u, v)]
+        while stack:
+            a, b = stack.pop()
+            middle = self._middle[(a, b)]
+            if middle < 0:
+                path.append(b)
+            else:
+                # Expand the second half after the first
+                stack.append((middle, b))
+                stack.append((a, middle))
+
+    def shortest_path(self, origin, destination):
+        """Drop-in replacement for nx.shortest_path(G, origin, destination, weight='time') on static times"""
+        node_index = self.graph.node_index
+        if origin not in node_index:
+            raise nx.NodeNotFound(f"Source {origin} is not in G")
+        if destination not in node_index:
+            raise nx.NodeNotFound(f"Target {destination} is not in G")
+
+        path = self.query(node_index[origin], node_index[destination])
+        if path is None:
+            raise nx.NetworkXNoPath(f"No path between {origin} and {destination}.")
+        return [self.graph.nodes[i] for i in path]
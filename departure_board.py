@@ -0,0 +1,150 @@
+import operator
+from bisect import bisect_left
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 24 * 3600
+
+# time is seconds since midnight of the query day (>= 24:00 for tomorrow's trips), including
+# delay seconds reported by a realtime feed; day is the service day the trip runs on
+# relative to the query day (-1, 0 or +1)
+Departure = namedtuple('Departure', ['time', 'stop', 'trip_id', 'route_id', 'day', 'delay'], defaults=(0,))
+
+
+class DepartureBoard:
+    """Per-stop departure index answering "what's coming next at this stop"
+
+    Stop times are sorted by (stop, departure, trip) into parallel time/trip/route arrays,
+    so a stop's departures are one sorted slice found with a binary search. Every trip is
+    assumed to run every day: GTFS times past 24:00 belong to the previous service day,
+    so a query shortly after midnight also sees yesterday's late trips, and a query late
+    in the evening continues into tomorrow's first departures. Given a RealtimeSnapshot,
+    cancelled trips are left out and departures move by their reported delays.
+    """
+
+    def __init__(self, timetable):
+        stops = np.asarray(timetable.st_stop)
+        order = np.lexsort((timetable.st_trip, timetable.st_departure, stops))
+        self.times = np.asarray(timetable.st_departure, dtype=np.int32)[order]
+        self.trips = np.asarray(timetable.st_trip, dtype=np.int32)[order]
+        self.rows = order  # stop time row of each entry, for realtime delays
+
+        # Route of each row, interned through the trip -> route table
+        route_codes, route_ids = pd.factorize(pd.Series(timetable.trip_route, dtype=object))
+        self.route_ids = route_ids.tolist()
+        self.routes = route_codes.astype(np.int32)[self.trips]
+
+        self.offsets = np.zeros(timetable.num_stops + 1, dtype=np.int64)
+        np.cumsum(np.bincount(stops, minlength=timetable.num_stops), out=self.offsets[1:])
+        self.trip_ids = timetable.trip_ids
+        self.stop_index = timetable.stop_index
+
+        # One sorted (stop, time) key per row, for vectorised batch lookups
+        self.keys = (stops[order].astype(np.int64) << 32) + self.times
+
+        # Plain-list mirrors for the per-stop merge
+        self._times = self.times.tolist()
+        self._trips = self.trips.tolist()
+        self._routes = self.routes.tolist()
+        self._offsets = self.offsets.tolist()
+        self._rows = self.rows.tolist()
+
+    def __len__(self):
+        return len(self._times)
+
+    def _collect(self, stop, late, today, n):
+        """Merge yesterday's late trips (from row late), today's (from row today) and tomorrow's"""
+        start, end = self._offsets[stop], self._offsets[stop + 1]
+        times = self._times
+        positions = [late, today, start]
+        departures = []
+        while len(departures) < n:
+            best = None
+            for day, i in enumerate(positions):
+                if i < end:
+                    t = times[i] + (day - 1) * SECONDS_PER_DAY
+                    if best is None or t < best[0]:
+                        best = (t, day)
+            if best is None:
+                break
+            t, day = best
+            i = positions[day]
+            positions[day] += 1
+            departures.append(Departure(t, stop, self.trip_ids[self._trips[i]],
+                                        self.route_ids[self._routes[i]], day - 1))
+        return departures
+
+    def _collect_realtime(self, stop, late, today, n, after, realtime):
+        """_collect with realtime delays and cancellations applied
+
+        Scheduled times are merged in order from realtime.late seconds before `after`; the
+        scan stops once even the earliest-running remaining trip (realtime.early seconds
+        ahead) cannot beat the n-th departure found.
+        """
+        start, end = self._offsets[stop], self._offsets[stop + 1]
+        times = self._times
+        positions = [late, today, start]
+        found = []  # (time, scheduled order, Departure)
+        while True:
+            best = None
+            for day, i in enumerate(positions):
+                if i < end:
+                    t = times[i] + (day - 1) * SECONDS_PER_DAY
+                    if best is None or t < best[0]:
+                        best = (t, day)
+            if best is None:
+                break
+            t, day = best
+            if len(found) >= n and t - realtime.early > found[n - 1][0]:
+                break
+            i = positions[day]
+            positions[day] += 1
+            trip = self._trips[i]
+            if realtime.cancelled[trip]:
+                continue
+            delay = realtime.delays[self._rows[i]]
+            if t + delay < after:
+                continue
+            found.append((t + delay, len(found), Departure(t + delay, stop, self.trip_ids[trip],
+                                                           self.route_ids[self._routes[i]], day - 1, delay)))
+            found.sort()
+        return [departure for _, _, departure in found[:n]]
+
+    def next_departures(self, stop, after, n=5, realtime=None):
+        """The next n departures at a stop (interned index) at or after `after` seconds
+
+        realtime optionally applies a RealtimeSnapshot's delays and cancellations.
+        """
+        stop = operator.index(stop)
+        after %= SECONDS_PER_DAY
+        # Trips running late can still be ahead of `after` although scheduled before it
+        shift = realtime.late if realtime is not None else 0
+        start, end = self._offsets[stop], self._offsets[stop + 1]
+        late = bisect_left(self._times, after + SECONDS_PER_DAY - shift, start, end)
+        today = bisect_left(self._times, after - shift, start, end)
+        if realtime is not None:
+            return self._collect_realtime(stop, late, today, n, after, realtime)
+        return self._collect(stop, late, today, n)
+
+    def next_departures_by_id(self, stop_id, after, n=5, realtime=None):
+        """next_departures for a GTFS stop_id (numeric IDs are IDs here, never indices)"""
+        return self.next_departures(self.stop_index[str(stop_id)], after, n, realtime)
+
+    def next_departures_batch(self, stops, after, n=5, realtime=None):
+        """next_departures for many stops (interned indices) at once; after is one time or one time per stop
+
+        The binary searches for all stops run as two vectorised searchsorted calls.
+        """
+        stops = np.array([operator.index(stop) for stop in stops], dtype=np.int64)
+        after = np.broadcast_to(np.asarray(after, dtype=np.int64) % SECONDS_PER_DAY, stops.shape)
+        shift = realtime.late if realtime is not None else 0
+        base = stops << 32
+        # Clamped at the stop's first entry, so a wide shift never reaches the previous stop's keys
+        late = np.searchsorted(self.keys, base + np.maximum(after + SECONDS_PER_DAY - shift, 0), side='left').tolist()
+        today = np.searchsorted(self.keys, base + np.maximum(after - shift, 0), side='left').tolist()
+        if realtime is not None:
+            return [self._collect_realtime(stop, i, j, n, a, realtime)
+                    for stop, i, j, a in zip(stops.tolist(), late, today, after.tolist())]
+        return [self._collect(stop, i, j, n) for stop, i, j in zip(stops.tolist(), late, today)]
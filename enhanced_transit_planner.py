@@ -1,19 +1,86 @@
+import datetime
+import heapq
+from itertools import islice
+
 import networkx as nx
+import numpy as np
 import random
+import threading
 import time
-import datetime
+from contextlib import contextmanager
 from math import radians, sin, cos, sqrt, atan2
 
+from compiled_graph import CompiledGraph
+from connection_scan import ConnectionScan
+from contraction_hierarchy import ContractionHierarchy
+from departure_board import DepartureBoard
+from connectivity import (ConnectivityIndex, NoRoute, NO_JOURNEY, NO_PATH_FOUND, UNKNOWN_DESTINATION,
+                          UNKNOWN_ORIGIN)
+from isochrone import accessibility, isochrone, rasterize, update_accessibility
+from k_shortest_paths import KShortestPaths
+from landmarks import LandmarkIndex
+from name_index import NameIndex
+from planner_snapshot import SnapshotRefresher, build_snapshot, patch_snapshot
+from raptor_router import RaptorRouter
+from route_cache import RouteCache, MISS, freeze
+from route_result import RouteResult
+from spatial_index import SpatialIndex, haversine_km
+from timetable import parse_time, format_time
+from traffic_model import TrafficModel
+from transfer_search import TransferSearch
+from travel_time_matrix import travel_time_matrix
+from vehicle_positions import VehicleTracker
+
+# Stand-in position for stops without coordinates
+BENGALURU_CENTER = (12.9716, 77.5946)
+
 class EnhancedTransitPlanner:
-    def __init__(self, graph, station_coords, calculate_fare_func):
+    def __init__(self, graph, station_coords, calculate_fare_func, backend='compiled', timetable=None,
+                 ch_path=None, cache_size=1024, cache_ttl=None, traffic_seed=None,
+                 transfer_aware=False, transfer_cap=None):
         self.G = graph
+        self.backend = backend  # 'compiled' (CSR arrays), 'alt' (landmark A*) or 'networkx'
+        self.compiled = CompiledGraph(graph)
+        self.name_index = NameIndex(self.compiled.nodes)  # Fuzzy stop-name lookup
+        self.connectivity = ConnectivityIndex(self.compiled)  # SCC/WCC labels per stop ID
+        # Contraction hierarchy for static (consider_traffic=False) queries, cached in ch_path
+        self.contraction_hierarchy = (ContractionHierarchy.load_or_build(self.compiled, ch_path)
+                                      if ch_path is not None else None)
+        self.timetable = timetable  # Optional Timetable (stop_times.csv/trips.csv) for departure-time queries
+        self.raptor = RaptorRouter(timetable) if timetable is not None else None
+        self.connection_scan = ConnectionScan(timetable) if timetable is not None else None
+        self.departure_board = DepartureBoard(timetable) if timetable is not None else None
+        self.vehicle_tracker = VehicleTracker(timetable, self.compiled) if timetable is not None else None
+        self.max_transfers = 3
         self.transfer_penalty = 10  # minutes
+        # Optional (stop, route) search that charges transfer_penalty while choosing the path
+        self.transfer_search = TransferSearch(graph, self.compiled, self.transfer_penalty) if transfer_aware else None
+        self.transfer_cap = transfer_cap  # max transfers for the transfer-aware search (None = no cap)
         self.station_coords = station_coords
+        # Grid over the coordinates of graph stops, for planning from GPS fixes and map clicks
+        self.spatial_index = SpatialIndex({name: station_coords[name] for name in self.compiled.nodes
+                                           if name in station_coords})
+        self.walking_speed = 5  # km/h
+        self.edge_distances = self._compute_edge_distances()
+        self._edge_distances = self.edge_distances.tolist()  # plain list for per-path gathers
         self.calculate_fare = calculate_fare_func
         self.major_hubs = self._identify_major_hubs()
-        self.traffic_conditions = self._initialize_traffic_conditions()
+        self._hub_trees = {}  # Static-time hub trees; traffic-aware ones live in the traffic snapshot
+        # Landmark distance arrays for the ALT backend, using the major hubs as landmarks
+        self.landmarks = LandmarkIndex.from_hubs(self.compiled, self.major_hubs) if backend == 'alt' else None
+        # Per-edge multipliers aligned with the compiled graph's edge IDs
+        self.traffic = TrafficModel(self.compiled.num_edges, traffic_seed)
+        # Immutable TrafficSnapshot that queries pin at their start; updates publish a new one.
+        # Its epoch is bumped on every traffic update so cached routes never go stale.
+        self.snapshot = build_snapshot(self.compiled, self.traffic.multipliers, 0)
+        self._traffic_lock = threading.Lock()  # Serialises traffic updates (queries never take it)
+        self._pinned = threading.local()
+        self._refresher = None
         self.last_traffic_update = time.time()
         self.update_interval = 300  # Update traffic every 5 minutes
+        self.realtime_traffic = False  # Set once a realtime feed supplies the multipliers
+        self.realtime = None  # RealtimeState attached by a RealtimeIngestor (delays, cancellations)
+        self.route_cache = RouteCache(cache_size, cache_ttl)
         
     def _identify_major_hubs(self, top_n=20):
         """Identify the major transit hubs based on degree centrality"""
@@ -22,79 +89,224 @@ class EnhancedTransitPlanner:
         # Sort nodes by degree and take top N
         return sorted(degree_dict.items(), key=lambda x: x[1], reverse=True)[:top_n]
     
-    def _initialize_traffic_conditions(self):
-        """Initialize traffic conditions for all edges in the graph"""
-        traffic = {}
-        
-        # Get current hour to simulate time-based traffic patterns
-        current_hour = datetime.datetime.now().hour
-        
-        # Define peak hours (8-10 AM and 5-7 PM)
-        is_peak_hour = (8 <= current_hour <= 10) or (17 <= current_hour <= 19)
-        
-        # Assign traffic multipliers to each edge
-        for u, v, data in self.G.edges(data=True):
-            edge_key = (u, v)
-            
-            # Base multiplier (1.0 = normal traffic)
-            if is_peak_hour:
-                # Higher traffic during peak hours
-                base_multiplier = random.uniform(1.2, 1.8)
-            else:
-                # Normal to light traffic during off-peak
-                base_multiplier = random.uniform(0.8, 1.2)
-            
-            # Add some randomness for each edge
-            traffic[edge_key] = base_multiplier * random.uniform(0.9, 1.1)
-        
-        return traffic
+    def _shortest_path(self, source, target, consider_traffic=False):
+        """Shortest path by travel time using the configured search backend
+        
+        With consider_traffic the search itself runs on the live (traffic-adjusted) times.
+        """
+        snapshot = self._traffic()
+        weights, rev_weights, scale = ((snapshot.weights, snapshot.rev_weights, snapshot.scale)
+                                       if consider_traffic else (None, None, 1.0))
+        if self.backend == 'networkx':
+            return nx.shortest_path(self.G, source, target, weight=self._networkx_weight(weights))
+        if self.backend == 'alt':
+            return self.landmarks.shortest_path(source, target, weights, scale)
+        return self.compiled.shortest_path(source, target, weights, rev_weights)
+    
+    def _shortest_path_tree(self, root, reverse=False, consider_traffic=False):
+        """Shortest paths from root to every node (or from every node to root with reverse=True)"""
+        snapshot = self._traffic()
+        weights, rev_weights = (snapshot.weights, snapshot.rev_weights) if consider_traffic else (None, None)
+        if self.backend == 'networkx':
+            if not reverse:
+                return nx.single_source_dijkstra_path(self.G, root, weight=self._networkx_weight(weights))
+            paths = nx.single_source_dijkstra_path(self.G.reverse(copy=False), root,
+                                                   weight=self._networkx_weight(weights, reverse=True))
+            return {node: path[::-1] for node, path in paths.items()}
+        return self.compiled.shortest_path_tree(root, reverse, weights, rev_weights)
+    
+    def _networkx_weight(self, weights, reverse=False):
+        """'time', or a networkx weight function reading per-edge live times from weights"""
+        if weights is None:
+            return 'time'
+        node_index = self.compiled.node_index
+        edge_id = self.compiled.edge_id
+        
+        def live_time(u, v, _):
+            # On the reversed view networkx reports the original edge v -> u as u -> v
+            if reverse:
+                u, v = v, u
+            return weights[edge_id(node_index[u], node_index[v])]
+        return live_time
+    
+    def _hub_tree(self, hub, consider_traffic=False):
+        """Cached shortest-path tree from a major hub, shared by all two-hub queries"""
+        # Traffic-aware trees belong to the pinned snapshot and are dropped along with it
+        trees = self._traffic().hub_trees if consider_traffic else self._hub_trees
+        if hub not in trees:
+            trees[hub] = self._shortest_path_tree(hub, consider_traffic=consider_traffic)
+        return trees[hub]
+    
+    @property
+    def traffic_epoch(self):
+        """Epoch of the current traffic snapshot"""
+        return self.snapshot.epoch
+    
+    @property
+    def live_weights(self):
+        """(forward weights, reverse-CSR weights, smallest multiplier) of the current traffic snapshot"""
+        snapshot = self.snapshot
+        return snapshot.weights, snapshot.rev_weights, snapshot.scale
+    
+    def _traffic(self):
+        """The traffic snapshot pinned by the running query on this thread, else the current one"""
+        return getattr(self._pinned, 'snapshot', None) or self.snapshot
+    
+    @contextmanager
+    def pinned_snapshot(self, snapshot=None):
+        """Pin the current traffic snapshot for everything this thread runs inside the block
+        
+        Traffic updates published meanwhile only affect queries that start later. Nested
+        blocks keep the outer pin. snapshot pins an earlier one instead (e.g. the one a
+        generator started with).
+        """
+        if getattr(self._pinned, 'snapshot', None) is not None:
+            yield self._pinned.snapshot
+            return
+        self._pinned.snapshot = snapshot or self.snapshot
+        try:
+            yield self._pinned.snapshot
+        finally:
+            self._pinned.snapshot = None
     
     def update_traffic_conditions(self):
         """Update traffic conditions based on time of day and simulated real-time data"""
-        current_time = time.time()
-        
-        # Only update if enough time has passed since last update
-        if current_time - self.last_traffic_update < self.update_interval:
+        # Only update if enough time has passed since last update; a realtime feed replaces the simulation
+        if self.realtime_traffic or time.time() - self.last_traffic_update < self.update_interval:
             return
-        
-        self.last_traffic_update = current_time
-        current_hour = datetime.datetime.now().hour
-        
-        # Define peak hours
-        is_peak_hour = (8 <= current_hour <= 10) or (17 <= current_hour <= 19)
-        
-        # Update traffic for each edge
-        for edge_key in self.traffic_conditions:
-            current_multiplier = self.traffic_conditions[edge_key]
-            
-            # Gradually shift traffic conditions
-            if is_peak_hour:
-                # Increase traffic during peak hours
-                target = random.uniform(1.2, 1.8)
-            else:
-                # Decrease traffic during off-peak
-                target = random.uniform(0.8, 1.2)
-            
-            # Smooth transition to new traffic conditions
-            new_multiplier = current_multiplier * 0.7 + target * 0.3
-            
-            # Add some randomness to simulate real-time fluctuations
-            new_multiplier *= random.uniform(0.95, 1.05)
-            
-            self.traffic_conditions[edge_key] = new_multiplier
+        self.refresh_traffic(if_due=True)
+    
+    def refresh_traffic(self, if_due=False):
+        """Advance the simulated traffic and publish it as a new snapshot"""
+        with self._traffic_lock:
+            current_time = time.time()
+            # Another thread may have refreshed while this one waited for the lock
+            if self.realtime_traffic or (if_due and current_time - self.last_traffic_update < self.update_interval):
+                return
+            self.last_traffic_update = current_time
+            self._publish(self.traffic.refresh())
+    
+    def apply_traffic_observations(self, edges, ratios):
+        """Blend observed travel-time ratios for some edges into the traffic model (see RealtimeIngestor)"""
+        with self._traffic_lock:
+            self.realtime_traffic = True
+            self.last_traffic_update = time.time()
+            self._publish(self.traffic.observe(edges, ratios), np.unique(edges))
+    
+    def _publish(self, multipliers, edges=None):
+        """Swap in a snapshot for new multipliers in one assignment (call with _traffic_lock held)
+
+        edges, when given, are the only ones whose multipliers changed; just those entries
+        of the previous snapshot are recomputed.
+        """
+        if edges is None:
+            self.snapshot = build_snapshot(self.compiled, multipliers, self.snapshot.epoch + 1)
+        else:
+            self.snapshot = patch_snapshot(self.compiled, self.snapshot, multipliers, edges, self.snapshot.epoch + 1)
+    
+    def start_traffic_refresher(self, interval=None):
+        """Refresh traffic on a background thread every interval seconds (default update_interval)"""
+        if self._refresher is None:
+            self._refresher = SnapshotRefresher(self, interval or self.update_interval).start()
+        return self._refresher
+    
+    def stop_traffic_refresher(self):
+        if self._refresher is not None:
+            self._refresher.stop()
+            self._refresher = None
+    
+    def _edge_id(self, u, v):
+        """CSR edge ID of the stop-name pair u -> v, or -1 if there is no such edge"""
+        node_index = self.compiled.node_index
+        if u not in node_index or v not in node_index:
+            return -1
+        return self.compiled.edge_id(node_index[u], node_index[v])
     
     def get_real_time_travel_time(self, u, v, base_time):
-        """Get real-time adjusted travel time between two nodes"""
-        edge_key = (u, v)
-        
-        # Update traffic conditions if needed
-        self.update_traffic_conditions()
-        
-        # Get traffic multiplier for this edge
-        multiplier = self.traffic_conditions.get(edge_key, 1.0)
-        
+        """Get real-time adjusted travel time between two nodes (in the query's pinned snapshot)"""
+        e = self._edge_id(u, v)
         # Apply traffic multiplier to base travel time
-        return base_time * multiplier
+        return base_time * (float(self._traffic().multipliers[e]) if e >= 0 else 1.0)
+    
+    def _realtime(self):
+        """Current RealtimeSnapshot of the attached feed, or None; read once per query"""
+        state = self.realtime
+        return state.snapshot if state is not None else None
+    
+    def _traffic_weights(self):
+        """Base edge times scaled by the current traffic multipliers, one value per CSR edge"""
+        self.update_traffic_conditions()
+        return self._traffic().weights
+    
+    def travel_time_matrix(self, origins, destinations, consider_traffic=True, processes=None):
+        """Travel times in minutes between every origin and destination as a NumPy array
+        
+        Only search times are returned (no transfer penalty, steps or coordinates); pairs
+        without a route are inf.
+        """
+        node_index = self.compiled.node_index
+        unknown = [name for name in list(origins) + list(destinations) if name not in node_index]
+        if unknown:
+            raise KeyError(f"Unknown stops: {unknown}")
+        
+        weights = self._traffic_weights() if consider_traffic else None
+        return travel_time_matrix(self.compiled,
+                                  [node_index[name] for name in origins],
+                                  [node_index[name] for name in destinations],
+                                  weights, processes)
+    
+    def isochrone(self, origin, max_time_minutes=60, consider_traffic=True):
+        """Stop IDs (into compiled.nodes) reachable from origin within the budget and their times, as arrays
+        
+        One search that stops at the budget; the origin comes first, the rest by increasing time.
+        """
+        origin = self._resolve_stop(origin)
+        if origin not in self.compiled.node_index:
+            raise KeyError(f"Unknown stop: {origin}")
+        weights = self._traffic_weights() if consider_traffic else None
+        return isochrone(self.compiled, self.compiled.node_index[origin], max_time_minutes, weights)
+    
+    def analyze_accessibility(self, origin, max_time_minutes=60, consider_traffic=True):
+        """Stations reachable from origin within max_time_minutes, nearest first"""
+        stops, times = self.isochrone(origin, max_time_minutes, consider_traffic)
+        nodes = self.compiled.nodes
+        return [{
+            'station': nodes[stop],
+            'time': minutes,
+            'coordinates': self.station_coords.get(nodes[stop], BENGALURU_CENTER),
+        } for stop, minutes in zip(stops.tolist()[1:], times.tolist()[1:])]
+    
+    def accessibility(self, origins=None, max_time_minutes=60, consider_traffic=True, processes=None,
+                      previous=None):
+        """Isochrones of many origins (default: every stop) packed into one Accessibility of arrays
+        
+        Pass the result of an earlier call as previous to bring it up to date with the
+        current traffic (origins and max_time_minutes are then taken from it): only the
+        origins a changed edge can affect are searched again.
+        """
+        weights = self._traffic_weights() if consider_traffic else None
+        if previous is not None:
+            return update_accessibility(self.compiled, previous, weights, processes)
+        
+        node_index = self.compiled.node_index
+        if origins is None:
+            ids = range(self.compiled.num_nodes)
+        else:
+            unknown = [name for name in origins if name not in node_index]
+            if unknown:
+                raise KeyError(f"Unknown stops: {unknown}")
+            ids = [node_index[name] for name in origins]
+        return accessibility(self.compiled, ids, max_time_minutes, weights, processes)
+    
+    def accessibility_raster(self, stop_ids, values, cell_km=0.5, how='mean'):
+        """Grid one value per stop ID (e.g. reachable_counts of an Accessibility, or isochrone times)
+        
+        Stops without coordinates are left out rather than placed at the city centre.
+        """
+        nodes = self.compiled.nodes
+        coords = np.array([self.station_coords.get(nodes[stop], (np.nan, np.nan))
+                           for stop in np.asarray(stop_ids).tolist()], dtype=np.float64).reshape(-1, 2)
+        return rasterize(coords[:, 0], coords[:, 1], values, cell_km, how)
     
     def haversine_distance(self, lat1, lon1, lat2, lon2):
         """Calculate the great circle distance between two points in kilometers"""
@@ -112,167 +324,434 @@ class EnhancedTransitPlanner:
         
         return distance
         
-    def calculate_path(self, origin, destination, consider_traffic=True):
+    def calculate_path(self, origin, destination, consider_traffic=True, departure_time=None):
         """Find the optimal path between origin and destination"""
+        # With a departure time, answer from the timetable instead of the static graph
+        if departure_time is not None:
+            return self._calculate_timetable_path(origin, destination, departure_time)
+        
+        # Bring traffic up to date first so the cache key carries the current epoch
+        self.update_traffic_conditions()
+        origin = self._resolve_stop(origin)
+        destination = self._resolve_stop(destination)
+        
+        # The whole query, cache key included, sees one traffic snapshot. Static results
+        # don't change with traffic, so they keep one key across epochs.
+        with self.pinned_snapshot() as snapshot:
+            key = (origin, destination, consider_traffic, snapshot.epoch if consider_traffic else None)
+            result = self.route_cache.get(key)
+            if result is MISS:
+                # Cached results are shared between callers, so store a read-only copy
+                result = freeze(self._calculate_path_uncached(origin, destination, consider_traffic))
+                self.route_cache.put(key, result)
+        return result
+    
+    def alternative_routes(self, origin, destination, consider_traffic=True, max_overlap=0.7, max_candidates=100):
+        """Generate the best route, then clearly different ones in order of travel time
+        
+        Candidates come from KShortestPaths one at a time, so the first alternative is
+        ready before later ones are searched. A candidate sharing more than max_overlap
+        of its stops with a route already yielded is skipped; at most max_candidates
+        are examined. The whole generator answers from one traffic snapshot.
+        """
+        snapshot = self._traffic()
+        with self.pinned_snapshot(snapshot):
+            primary = self.calculate_path(origin, destination, consider_traffic)
+        if not primary:
+            return
+        yield primary
+        
+        node_index = self.compiled.node_index
+        origin, destination = primary['path'][0], primary['path'][-1]
+        if origin not in node_index or destination not in node_index:
+            return
+        weights, rev_weights = (snapshot.weights, snapshot.rev_weights) if consider_traffic else (None, None)
+        candidates = KShortestPaths(self.compiled, node_index[origin], node_index[destination],
+                                    weights, rev_weights)
+        yielded = [list(primary['path'])]
+        for stop_ids, _ in islice(candidates, max_candidates):
+            path = [self.compiled.nodes[i] for i in stop_ids]
+            if all(self._path_similarity(path, other) <= max_overlap for other in yielded):
+                yielded.append(path)
+                with self.pinned_snapshot(snapshot):
+                    result = self._process_path(path, consider_traffic)
+                yield result
+    
+    def suggest_alternatives(self, origin, destination, max_alternatives=3, consider_traffic=True):
+        """The best route plus up to max_alternatives - 1 clearly different ones (see alternative_routes)"""
+        return list(islice(self.alternative_routes(origin, destination, consider_traffic), max_alternatives))
+    
+    @staticmethod
+    def _path_similarity(a, b):
+        """Share of stops two paths have in common (Jaccard index of their stop sets)"""
+        a, b = set(a), set(b)
+        return len(a & b) / len(a | b)
+    
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the route cache"""
+        return self.route_cache.stats()
+    
+    def _resolve_stop(self, name):
+        """Map a user-supplied station name onto a graph node (unchanged if nothing matches)"""
+        if name in self.compiled.node_index:
+            return name
+        return self._find_closest_node(name) or name
+    
+    def _calculate_path_uncached(self, origin, destination, consider_traffic=True):
+        """Static-graph search behind calculate_path's cache"""
+        # Reject pairs the connectivity index proves unreachable before any search
+        if origin in self.compiled.node_index and destination in self.compiled.node_index:
+            rejection = self.connectivity.check(origin, destination)
+            if rejection is not None:
+                return rejection
+        
         # First try direct path
         try:
             return self._calculate_direct_path(origin, destination, consider_traffic)
-        except (nx.NetworkXNoPath, nx.NetworkXError, KeyError, ValueError, IndexError):
+        except nx.NetworkXNoPath as error:
+            # The transfer-aware search is exhaustive, so the hub fallbacks cannot do better
+            if self.transfer_search is not None:
+                return NoRoute(origin, destination, NO_PATH_FOUND, str(error))
+            return self._calculate_path_with_transfers(origin, destination, consider_traffic)
+        except (nx.NodeNotFound, nx.NetworkXError, KeyError, ValueError, IndexError):
             # If direct path fails, try to find a path with transfers
             return self._calculate_path_with_transfers(origin, destination, consider_traffic)
     
+    def _compute_edge_distances(self):
+        """Great-circle length (km) of every CSR edge, computed once with vectorised haversine"""
+        coords = np.array([self.station_coords.get(node, BENGALURU_CENTER) for node in self.compiled.nodes],
+                          dtype=np.float64).reshape(-1, 2)
+        sources, targets = self.compiled.sources, self.compiled.targets
+        return haversine_km(coords[sources, 0], coords[sources, 1], coords[targets, 0], coords[targets, 1])
+    
+    def nearest_stops(self, lat, lon, k=5):
+        """The k stops closest to a point as [(stop, distance_km)]"""
+        return self.spatial_index.nearest(lat, lon, k)
+    
+    def stops_within(self, lat, lon, radius_km):
+        """Every stop within radius_km of a point as [(stop, distance_km)], nearest first"""
+        return self.spatial_index.within(lat, lon, radius_km)
+    
+    def calculate_path_from_coordinates(self, origin_lat, origin_lon, destination_lat, destination_lon,
+                                        consider_traffic=True, candidates=5, max_walk_km=1.5):
+        """Plan between two points (e.g. GPS fixes) by walking to and from nearby stops
+        
+        Up to `candidates` stops within max_walk_km of each point (or the single nearest
+        one if none is that close) are tried at once: one multi-source search starts at
+        every boarding stop offset by its walking time and ends at the alighting stop with
+        the lowest ride + walk total.
+        """
+        walk_minutes = 60 / self.walking_speed
+        
+        def nearby(lat, lon):
+            stops = self.spatial_index.nearest(lat, lon, candidates)
+            return [stop for stop in stops if stop[1] <= max_walk_km] or stops[:1]
+        
+        boarding = nearby(origin_lat, origin_lon)
+        alighting = nearby(destination_lat, destination_lon)
+        origin = (origin_lat, origin_lon)
+        destination = (destination_lat, destination_lon)
+        if not boarding or not alighting:
+            return NoRoute(origin, destination, NO_PATH_FOUND, "No stops with coordinates near these points")
+        
+        self.update_traffic_conditions()
+        node_index = self.compiled.node_index
+        with self.pinned_snapshot() as snapshot:
+            weights = snapshot.weights if consider_traffic else None
+            found = self.compiled.multi_source_path({node_index[stop]: km * walk_minutes for stop, km in boarding},
+                                                    {node_index[stop]: km * walk_minutes for stop, km in alighting},
+                                                    weights)
+            if found is None:
+                return NoRoute(origin, destination, NO_PATH_FOUND,
+                               f"No route between stops near {origin} and near {destination}")
+            
+            path = [self.compiled.nodes[i] for i in found[0]]
+            result = self._process_path(path, consider_traffic)
+        access_km = dict(boarding)[path[0]]
+        egress_km = dict(alighting)[path[-1]]
+        return result.replace(
+            walk_to_stop={'stop': path[0], 'distance': access_km, 'time': access_km * walk_minutes},
+            walk_from_stop={'stop': path[-1], 'distance': egress_km, 'time': egress_km * walk_minutes},
+            time=result['time'] + (access_km + egress_km) * walk_minutes,
+            distance=result['distance'] + access_km + egress_km,
+            lazy={'steps': lambda: ([f"Walk {access_km:.2f} km to {path[0]}"] + list(result['steps'])
+                                    + [f"Walk {egress_km:.2f} km from {path[-1]} to your destination"])})
+    
     def _calculate_direct_path(self, origin, destination, consider_traffic=True):
         """Calculate a direct path between origin and destination"""
-        path = nx.shortest_path(self.G, origin, destination, weight='time')
+        if self.transfer_search is not None:
+            multipliers = self._traffic().multiplier_list if consider_traffic else None
+            path, hops = self.transfer_search.shortest_path(origin, destination, multipliers, self.transfer_cap)
+            return self._process_path(path, consider_traffic, hops)
+        
+        # Static times never change between reloads, so the precomputed hierarchy answers those
+        if not consider_traffic and self.contraction_hierarchy is not None:
+            path = self.contraction_hierarchy.shortest_path(origin, destination)
+        else:
+            path = self._shortest_path(origin, destination, consider_traffic)
         return self._process_path(path, consider_traffic)
     
+    def calculate_profile(self, origin, destination, window_start, window_end):
+        """Find every Pareto-optimal journey (departure vs arrival) leaving within a time window"""
+        if self.connection_scan is None:
+            raise ValueError("profile queries need a timetable (pass timetable= to the planner)")
+        
+        sources = self.timetable.stops_for_name(origin)
+        targets = self.timetable.stops_for_name(destination)
+        if not sources or not targets:
+            return []
+        
+        start = parse_time(window_start)
+        end = parse_time(window_end)
+        route_types = dict(zip(self.compiled.route_ids, self.compiled.route_types))
+        journeys = self.connection_scan.profile(sources, targets, start, end)
+        return [self.timetable.journey_to_result(legs, legs[0]['departure'], self.calculate_fare, route_types)
+                for legs in journeys]
+    
+    def next_departures(self, stop_names, departure_time, n=5):
+        """Next n departures at each named station (over all of its GTFS stops), soonest first
+
+        Answers a whole set of departure screens with one batch lookup. Returns
+        {name: [{'route_id', 'trip_id', 'stop_id', 'departure_time', 'delay'}, ...]}; times of
+        trips running past midnight are given as GTFS times beyond 24:00. With a realtime
+        feed attached, times include the reported delay (seconds) and cancelled trips are left out.
+        """
+        if self.departure_board is None:
+            raise ValueError("departure boards need a timetable (pass timetable= to the planner)")
+        
+        after = parse_time(departure_time)
+        groups = [self.timetable.stops_for_name(name) for name in stop_names]
+        boards = iter(self.departure_board.next_departures_batch([stop for stops in groups for stop in stops],
+                                                                 after, n, self._realtime()))
+        result = {}
+        for name, stops in zip(stop_names, groups):
+            # A station's bays each have their own board; interleave them by time
+            merged = heapq.merge(*[next(boards) for _ in stops])
+            result[name] = [{
+                'route_id': departure.route_id,
+                'trip_id': departure.trip_id,
+                'stop_id': self.timetable.stop_ids[departure.stop],
+                'departure_time': format_time(departure.time),
+                'delay': departure.delay,
+            } for departure in islice(merged, n)]
+        return result
+    
+    def vehicle_positions(self, when=None, consider_traffic=True):
+        """Estimated positions of every running trip as a FleetSnapshot of parallel arrays
+
+        when is "HH:MM[:SS]", a datetime/time or seconds (default: now). With
+        consider_traffic, hops run slower or faster by the current traffic multipliers.
+        With a realtime feed attached, reported delays shift the schedule and cancelled
+        trips are left out.
+        """
+        if self.vehicle_tracker is None:
+            raise ValueError("vehicle positions need a timetable (pass timetable= to the planner)")
+        
+        now = parse_time(datetime.datetime.now() if when is None else when)
+        return self.vehicle_tracker.snapshot(now, self._traffic().multipliers if consider_traffic else None,
+                                             self._realtime())
+    
+    def _calculate_timetable_path(self, origin, destination, departure_time):
+        """Earliest-arrival journey from the timetable using RAPTOR (with any attached realtime feed)"""
+        if self.raptor is None:
+            raise ValueError("departure_time queries need a timetable (pass timetable= to the planner)")
+        
+        sources = self.timetable.stops_for_name(origin)
+        targets = self.timetable.stops_for_name(destination)
+        if not sources:
+            return NoRoute(origin, destination, UNKNOWN_ORIGIN, f"Origin {origin} has no timetable stops")
+        if not targets:
+            return NoRoute(origin, destination, UNKNOWN_DESTINATION, f"Destination {destination} has no timetable stops")
+        
+        departure = parse_time(departure_time)
+        legs = self.raptor.earliest_arrival(sources, targets, departure, self.max_transfers, self._realtime())
+        if not legs:
+            return NoRoute(origin, destination, NO_JOURNEY,
+                           f"No journey from {origin} to {destination} departing at {departure_time} "
+                           f"with at most {self.max_transfers} transfers")
+        
+        route_types = dict(zip(self.compiled.route_ids, self.compiled.route_types))
+        return self.timetable.journey_to_result(legs, departure, self.calculate_fare, route_types)
+    
     def _calculate_path_with_transfers(self, origin, destination, consider_traffic=True):
         """Find a path that may require transfers between different routes"""
-        # Try to find intermediate points that can connect origin and destination
-        all_nodes = list(self.G.nodes())
-        
         # First check if origin and destination are in the graph
-        if origin not in all_nodes or destination not in all_nodes:
+        node_index = self.compiled.node_index
+        if origin not in node_index or destination not in node_index:
             # Try to find closest nodes by name similarity
-            if origin not in all_nodes:
-                closest = self._find_closest_node(origin, all_nodes)
+            if origin not in node_index:
+                closest = self._find_closest_node(origin)
                 if closest:
                     origin = closest
-            if destination not in all_nodes:
-                closest = self._find_closest_node(destination, all_nodes)
+            if destination not in node_index:
+                closest = self._find_closest_node(destination)
                 if closest:
                     destination = closest
         
-        # If we still don't have valid nodes, return None
-        if origin not in all_nodes or destination not in all_nodes:
-            return None
+        # Unknown names and provably unreachable pairs end here without any search
+        rejection = self.connectivity.check(origin, destination)
+        if rejection is not None:
+            return rejection
+        
+        # One shortest-path tree from the origin and one reverse tree into the destination
+        # score every intermediate candidate without running a search per candidate
+        forward = self._shortest_path_tree(origin, consider_traffic=consider_traffic)
+        backward = self._shortest_path_tree(destination, reverse=True, consider_traffic=consider_traffic)
         
-        # Find all possible paths through major hubs
-        possible_paths = []
+        # Collect candidate paths through major hubs; only the winner is turned into a full result
+        candidates = []
         
         # Try paths through major hubs
         for hub, _ in self.major_hubs:
-            if hub != origin and hub != destination:
-                try:
-                    # Check if there's a path from origin to hub
-                    path1 = nx.shortest_path(self.G, origin, hub, weight='time')
-                    # Check if there's a path from hub to destination
-                    path2 = nx.shortest_path(self.G, hub, destination, weight='time')
-                    
-                    # Combine the paths (remove duplicate hub node)
-                    combined_path = path1 + path2[1:]
-                    path_info = self._process_path(combined_path, consider_traffic)
-                    possible_paths.append(path_info)
-                except (nx.NetworkXNoPath, nx.NetworkXError, KeyError, ValueError, IndexError):
-                    continue
+            if hub != origin and hub != destination and hub in forward and hub in backward:
+                # Combine the paths (remove duplicate hub node)
+                candidates.append(forward[hub] + backward[hub][1:])
         
         # Try two-hub transfers if no paths found yet
-        if not possible_paths:
+        if not candidates:
             for hub1, _ in self.major_hubs[:10]:  # Limit to top 10 hubs for performance
-                if hub1 != origin and hub1 != destination:
+                if hub1 != origin and hub1 != destination and hub1 in forward:
+                    hub_tree = self._hub_tree(hub1, consider_traffic)
                     for hub2, _ in self.major_hubs[:10]:  # Limit to top 10 hubs for performance
-                        if hub2 != origin and hub2 != destination and hub2 != hub1:
-                            try:
-                                # Check paths between all segments
-                                path1 = nx.shortest_path(self.G, origin, hub1, weight='time')
-                                path2 = nx.shortest_path(self.G, hub1, hub2, weight='time')
-                                path3 = nx.shortest_path(self.G, hub2, destination, weight='time')
-                                
-                                # Combine the paths (remove duplicate hub nodes)
-                                combined_path = path1 + path2[1:] + path3[1:]
-                                path_info = self._process_path(combined_path, consider_traffic)
-                                possible_paths.append(path_info)
-                            except (nx.NetworkXNoPath, nx.NetworkXError, KeyError, ValueError, IndexError):
-                                continue
+                        if (hub2 != origin and hub2 != destination and hub2 != hub1
+                                and hub2 in hub_tree and hub2 in backward):
+                            # Combine the paths (remove duplicate hub nodes)
+                            candidates.append(forward[hub1] + hub_tree[hub2][1:] + backward[hub2][1:])
         
         # If we found any paths, return the one with the shortest time
-        if possible_paths:
-            return min(possible_paths, key=lambda x: x['time'])
+        if candidates:
+            return self._process_path(self._best_paths(candidates, consider_traffic)[0], consider_traffic)
         
         # If all else fails, try a more exhaustive search with random intermediate nodes
-        random_nodes = random.sample(all_nodes, min(30, len(all_nodes)))
+        # Only nodes on some origin -> node -> destination route can help
+        via = self.connectivity.via_candidates(origin, destination)
+        random_nodes = random.sample(via, min(30, len(via)))
         
         for node in random_nodes:
-            if node != origin and node != destination:
-                try:
-                    path1 = nx.shortest_path(self.G, origin, node, weight='time')
-                    path2 = nx.shortest_path(self.G, node, destination, weight='time')
-                    combined_path = path1 + path2[1:]
-                    path_info = self._process_path(combined_path, consider_traffic)
-                    possible_paths.append(path_info)
-                except (nx.NetworkXNoPath, nx.NetworkXError, KeyError, ValueError, IndexError):
-                    continue
-        
-        if possible_paths:
-            return min(possible_paths, key=lambda x: x['time'])
+            if node != origin and node != destination and node in forward and node in backward:
+                candidates.append(forward[node] + backward[node][1:])
+        
+        if candidates:
+            return self._process_path(self._best_paths(candidates, consider_traffic)[0], consider_traffic)
             
-        # If we still can't find a path, return None
-        return None
+        # If we still can't find a path, report why
+        return NoRoute(origin, destination, NO_PATH_FOUND, f"No path found between {origin} and {destination}")
     
-    def _process_path(self, path, consider_traffic=True):
-        """Process a path to extract steps, time, and transfers"""
-        edges = list(zip(path[:-1], path[1:]))
+    def _edge_facts(self, path, hops=None):
+        """Per-edge (edge ID, route ID, route type, base time) for a stop-name path
+        
+        Edge ID is -1 (and the rest None) where the graph has no such edge. hops
+        optionally gives the transfer-aware search's route edge ridden on each edge;
+        otherwise the fastest route is used.
+        """
+        if hops is not None:
+            return [self.transfer_search.hop(j) for j in hops]
+        compiled = self.compiled
+        node_index = compiled.node_index
+        facts = []
+        for u, v in zip(path[:-1], path[1:]):
+            e = compiled.edge_index.get((node_index.get(u, -1), node_index.get(v, -1)), -1)
+            if e < 0:
+                facts.append((-1, None, None, None))
+            else:
+                r = compiled._edge_routes[e]
+                facts.append((e, compiled.route_ids[r], compiled.route_types[r], compiled._weights[e]))
+        return facts
+    
+    def _unknown_edge_distance(self, u, v):
+        """Straight-line length used for hops the graph has no edge for"""
+        u_coords = self.station_coords.get(u, BENGALURU_CENTER)
+        v_coords = self.station_coords.get(v, BENGALURU_CENTER)
+        return self.haversine_distance(u_coords[0], u_coords[1], v_coords[0], v_coords[1])
+    
+    def _score_path(self, path, consider_traffic=True):
+        """Cheap numeric (time, transfers) of a candidate path, equal to what _process_path reports"""
+        compiled = self.compiled
+        node_index = compiled.node_index
+        edge_index = compiled.edge_index
+        # Live weights hold exactly base time x multiplier, as _process_path computes it
+        weights = self._traffic().weights if consider_traffic else compiled._weights
+        total_time = 0
+        transfers = 0
+        current_route = None
+        for u, v in zip(path[:-1], path[1:]):
+            e = edge_index.get((node_index.get(u, -1), node_index.get(v, -1)), -1)
+            if e < 0:
+                route_id = "Unknown"
+                edge_time = (self._unknown_edge_distance(u, v) / 20) * 60
+            else:
+                route_id = compiled.route_ids[compiled._edge_routes[e]]
+                edge_time = weights[e]
+            if current_route is not None and (e < 0 or route_id != current_route):
+                total_time += self.transfer_penalty
+                transfers += 1
+            current_route = route_id
+            total_time += edge_time
+        return total_time, transfers
+    
+    def _best_paths(self, paths, consider_traffic=True, k=1):
+        """The k candidate paths with the lowest time (ties keep candidate order), scored numerically"""
+        scored = [(self._score_path(path, consider_traffic)[0], i) for i, path in enumerate(paths)]
+        return [paths[i] for _, i in sorted(scored)[:k]]
+    
+    def _process_path(self, path, consider_traffic=True, hops=None):
+        """Process a path to extract time, distance, fare and transfers
+        
+        hops optionally gives the route edge ridden on each edge (from the transfer-aware
+        search); otherwise the fastest route on each edge is assumed. Steps, route
+        segments and coordinates are formatted only when the result is read.
+        """
+        traffic = self._traffic().multiplier_list
         
         total_time = 0
         total_distance = 0
         total_fare = 0
-        steps = []
+        multipliers = []
+        # One leg per boarding: (route_id or None for an unknown hop, start, end, type, time at transfer)
+        legs = []
         current_route = None
-        route_segments = []
         route_type = None
         segment_distance = 0
         
-        for (u, v) in edges:
-            try:
-                edge_data = self.G.get_edge_data(u, v)
-                if edge_data:
-                    min_time = min([d['time'] for d in edge_data.values()])
-                    route_options = [d for d in edge_data.values() if d['time'] == min_time]
-                    route_data = route_options[0]
-                    route_id = route_data['route_id']
-                    
-                    # Get coordinates for distance calculation
-                    u_coords = self.station_coords.get(u, (12.9716, 77.5946))  # Default to Bengaluru center
-                    v_coords = self.station_coords.get(v, (12.9716, 77.5946))
-                    
-                    # Calculate segment distance
-                    segment_dist = self.haversine_distance(u_coords[0], u_coords[1], v_coords[0], v_coords[1])
-                    total_distance += segment_dist
-                    
-                    # Apply real-time traffic adjustment if requested
-                    if consider_traffic:
-                        adjusted_time = self.get_real_time_travel_time(u, v, min_time)
-                    else:
-                        adjusted_time = min_time
-                    
-                    if route_id != current_route:
-                        # If we're changing routes, calculate fare for the previous segment
-                        if current_route is not None:
-                            steps.append(f"Transfer at {u} (Time: {total_time:.1f} mins)")
-                            total_time += self.transfer_penalty  # Add transfer penalty
-                            
-                            # Calculate fare for the completed segment
-                            segment_fare = self.calculate_fare(segment_distance, route_type)
-                            total_fare += segment_fare
-                            
-                            # Reset segment distance for new route
-                            segment_distance = 0
+        for (u, v), (e, route_id, edge_route_type, min_time) in zip(zip(path[:-1], path[1:]),
+                                                                     self._edge_facts(path, hops)):
+            if e >= 0:
+                # Per-edge length and traffic multiplier are gathers from the edge arrays
+                segment_dist = self._edge_distances[e]
+                # Static results don't depend on traffic, so they stay valid across epochs
+                multiplier = float(traffic[e]) if consider_traffic else 1.0
+                multipliers.append(multiplier)
+                total_distance += segment_dist
+                
+                # Apply real-time traffic adjustment if requested
+                adjusted_time = min_time * multiplier
+                
+                if route_id != current_route:
+                    # If we're changing routes, calculate fare for the previous segment
+                    transfer_time = None
+                    if current_route is not None:
+                        transfer_time = total_time
+                        total_time += self.transfer_penalty  # Add transfer penalty
                         
-                        current_route = route_id
-                        route_type = route_data.get('type', '3')  # Default to regular bus if type not specified
-                        steps.append(f"Take Route {route_id} from {u}")
-                        route_segments.append({
-                            'route_id': route_id,
-                            'start': u,
-                            'type': route_type
-                        })
+                        # Calculate fare for the completed segment
+                        segment_fare = self.calculate_fare(segment_distance, route_type)
+                        total_fare += segment_fare
+                        
+                        # Reset segment distance for new route
+                        segment_distance = 0
                     
-                    segment_distance += segment_dist
-                    total_time += adjusted_time
-            except (TypeError, KeyError, IndexError, ValueError):
-                # If there's an issue with this edge, add a generic step
+                    current_route = route_id
+                    route_type = edge_route_type
+                    legs.append((route_id, u, v, route_type, transfer_time))
+                
+                segment_distance += segment_dist
+                total_time += adjusted_time
+            else:
+                # If there's no such edge, add a generic step
+                multipliers.append(1.0)
+                transfer_time = None
                 if current_route is not None:
-                    steps.append(f"Transfer at {u} (Time: {total_time:.1f} mins)")
+                    transfer_time = total_time
                     total_time += self.transfer_penalty
                     
                     # Calculate fare for the completed segment
@@ -282,12 +761,10 @@ class EnhancedTransitPlanner:
                 
                 current_route = "Unknown"
                 route_type = '3'  # Default to regular bus
-                steps.append(f"Travel from {u} to {v}")
+                legs.append((None, u, v, route_type, transfer_time))
                 
                 # Estimate distance for unknown segments
-                u_coords = self.station_coords.get(u, (12.9716, 77.5946))
-                v_coords = self.station_coords.get(v, (12.9716, 77.5946))
-                segment_dist = self.haversine_distance(u_coords[0], u_coords[1], v_coords[0], v_coords[1])
+                segment_dist = self._unknown_edge_distance(u, v)
                 total_distance += segment_dist
                 segment_distance += segment_dist
                 
@@ -300,45 +777,36 @@ class EnhancedTransitPlanner:
             segment_fare = self.calculate_fare(segment_distance, route_type)
             total_fare += segment_fare
         
-        # Add coordinates for each station in the path
-        path_coords = [self.station_coords.get(station, (12.9716, 77.5946)) for station in path]
+        def steps():
+            lines = []
+            for route_id, start, end, _, transfer_time in legs:
+                if transfer_time is not None:
+                    lines.append(f"Transfer at {start} (Time: {transfer_time:.1f} mins)")
+                lines.append(f"Take Route {route_id} from {start}" if route_id is not None
+                             else f"Travel from {start} to {end}")
+            return lines
+        
+        def route_segments():
+            return [{'route_id': route_id, 'start': start, 'type': leg_type}
+                    for route_id, start, _, leg_type, _ in legs if route_id is not None]
         
-        return {
+        def coordinates():
+            # Coordinates for each station in the path
+            return [self.station_coords.get(station, BENGALURU_CENTER) for station in path]
+        
+        return RouteResult({
             'path': path,
-            'coordinates': path_coords,
             'time': total_time,
             'distance': total_distance,
             'fare': total_fare,
-            'steps': steps,
-            'transfers': len([s for s in steps if 'Transfer' in s]),
-            'route_segments': route_segments,
-            'traffic_conditions': [self.traffic_conditions.get((path[i], path[i+1]), 1.0) 
-                                 for i in range(len(path)-1)]
-        }
-    
-    def _find_closest_node(self, query, nodes):
+            'transfers': max(len(legs) - 1, 0),
+            'traffic_conditions': multipliers
+        }, {'coordinates': coordinates, 'steps': steps, 'route_segments': route_segments})
+    
+    def _find_closest_node(self, query):
         """Find the closest node by name similarity"""
-        # Simple string similarity - return the node that contains the query string
-        matches = [node for node in nodes if query.lower() in node.lower()]
-        if matches:
-            return matches[0]
-        
-        # If no direct substring match, try to find nodes that share words
-        query_words = set(query.lower().split())
-        best_match = None
-        best_score = 0
-        
-        for node in nodes:
-            node_words = set(node.lower().split())
-            common_words = query_words.intersection(node_words)
-            score = len(common_words)
-            
-            if score > best_score:
-                best_score = score
-                best_match = node
-        
-        # Return the best match if we found one with at least one common word
-        if best_score > 0:
-            return best_match
-            
-        return None
\ No newline at end of file
+        return self.name_index.resolve(query)
+    
+    def suggest_stops(self, query, k=5):
+        """Ranked stop names matching a (possibly misspelt) user query"""
+        return [name for name, _, _ in self.name_index.suggest(query, k)]
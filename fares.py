@@ -0,0 +1,9 @@
+def calculate_fare(distance_km, route_type):
+    """Fare in rupees for distance_km on a route of the given GTFS route_type (same rule as test_planner.py)"""
+    if route_type == '3':  # Regular bus
+        base_fare, rate_per_km = 5, 1.5
+    elif route_type == '700':  # Express
+        base_fare, rate_per_km = 10, 2.0
+    else:  # Premium or other
+        base_fare, rate_per_km = 15, 2.5
+    return round(base_fare + max(0, distance_km - 2) * rate_per_km)
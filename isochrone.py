@@ -0,0 +1,195 @@
+import heapq
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from spatial_index import KM_PER_DEGREE
+from travel_time_matrix import graph_pool, pool_processes, worker_graph
+
+# Stops reachable from each origin stop ID within budget minutes, stored CSR style:
+# origins[i] reaches stops[offsets[i]:offsets[i + 1]] after times[...] minutes, in order
+# of increasing time. weights are the edge times the searches ran on.
+Accessibility = namedtuple('Accessibility', ['origins', 'budget', 'weights', 'offsets', 'stops', 'times'])
+
+# Values gridded into cells of about cell_km: grid[row, col] covers latitudes from
+# lat0 + row * lat_step and longitudes from lon0 + col * lon_step; NaN where no stop falls
+Raster = namedtuple('Raster', ['grid', 'lat0', 'lon0', 'lat_step', 'lon_step'])
+
+def _bounded_search(offsets, targets, weights, source, budget):
+    """Dijkstra from source that stops at the time budget; returns (stops, times) lists in settle order"""
+    dist = [float('inf')] * (len(offsets) - 1)
+    dist[source] = 0.0
+    stops = []
+    times = []
+    fringe = [(0.0, source)]
+    while fringe:
+        d, v = heapq.heappop(fringe)
+        if d > budget:
+            break
+        # Entries are only pushed on strict improvement, so a larger d is a stale one
+        if d > dist[v]:
+            continue
+        stops.append(v)
+        times.append(d)
+        for e in range(offsets[v], offsets[v + 1]):
+            u = targets[e]
+            nd = d + weights[e]
+            if nd < dist[u] and nd <= budget:
+                dist[u] = nd
+                heapq.heappush(fringe, (nd, u))
+    return stops, times
+
+
+def _worker_searches(task):
+    """Bounded searches for a chunk of origins, run against the worker's shared graph"""
+    sources, budget = task
+    offsets, targets, weights = worker_graph()
+    return [_bounded_search(offsets, targets, weights, s, budget) for s in sources]
+
+
+def isochrone(graph, source, budget, weights=None):
+    """Stop IDs reachable from stop ID source within budget minutes and their times, as arrays"""
+    weights = graph._weights if weights is None else weights
+    stops, times = _bounded_search(graph._offsets, graph._targets, weights, source, budget)
+    return np.array(stops, dtype=np.int32), np.array(times, dtype=np.float64)
+
+
+def _searches(graph, origins, budget, weights, processes, chunk_size):
+    """(stops, times) per origin, spread over a process pool like travel_time_matrix"""
+    processes = pool_processes(processes, len(origins))
+    if processes == 1:
+        return [_bounded_search(graph._offsets, graph._targets, weights, s, budget) for s in origins]
+    chunks = [origins[i:i + chunk_size] for i in range(0, len(origins), chunk_size)]
+    with graph_pool(graph, weights, processes) as pool:
+        return [row for rows in pool.map(_worker_searches, [(chunk, budget) for chunk in chunks]) for row in rows]
+
+
+def _pack(origins, budget, weights, rows):
+    counts = [len(stops) for stops, _ in rows]
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    stops = np.fromiter((v for row, _ in rows for v in row), dtype=np.int32, count=int(offsets[-1]))
+    times = np.fromiter((t for _, row in rows for t in row), dtype=np.float64, count=int(offsets[-1]))
+    return Accessibility(np.asarray(origins, dtype=np.int32), budget, weights, offsets, stops, times)
+
+
+def accessibility(graph, origins, budget, weights=None, processes=None, chunk_size=64):
+    """Bounded searches from every origin stop ID, packed into one Accessibility
+
+    processes=1, a single usable CPU or fewer than POOL_MIN_ORIGINS origins (see
+    travel_time_matrix) runs everything in this process; otherwise chunks of origins go
+    to a pool whose workers each receive the CSR arrays once.
+    """
+    weights = graph._weights if weights is None else list(weights)
+    origins = [int(s) for s in origins]
+    return _pack(origins, budget, weights, _searches(graph, origins, budget, weights, processes, chunk_size))
+
+
+def _affected(graph, previous, changed, old, new, block=256):
+    """Indices of previous.origins whose bounded result can differ under the new edge weights
+
+    A slower edge only matters where it was on a shortest path (tail time + old weight
+    reaches the head's time); a faster one only where tail time + new weight beats the
+    head's time within the budget. Times are expanded densely a block of origins at a time.
+    """
+    tails = graph.sources[changed]
+    heads = graph.targets[changed]
+    slower = new > old
+    budget = previous.budget
+    affected = []
+    for first in range(0, len(previous.origins), block):
+        last = min(first + block, len(previous.origins))
+        start, end = previous.offsets[first], previous.offsets[last]
+        times = np.full((last - first, graph.num_nodes), np.inf)
+        rows = np.repeat(np.arange(last - first), np.diff(previous.offsets[first:last + 1]))
+        times[rows, previous.stops[start:end]] = previous.times[start:end]
+        tail_time = times[:, tails]
+        head_time = times[:, heads]
+        with np.errstate(invalid='ignore'):
+            # Small tolerance: a path tied to within rounding counts as shortest
+            tight = tail_time + old <= head_time + 1e-9
+            better = (tail_time + new < head_time) & (tail_time + new <= budget)
+        hit = np.where(slower, tight, better) & np.isfinite(tail_time)
+        affected.extend((first + np.flatnonzero(hit.any(axis=1))).tolist())
+    return affected
+
+
+def update_accessibility(graph, previous, weights=None, processes=None, chunk_size=64):
+    """previous recomputed for new edge weights, searching again only from origins the change affects
+
+    Every other origin keeps exactly its previous stops and times, so after a local
+    traffic update (a realtime feed batch) most of the city is copied, not searched.
+    """
+    weights = graph._weights if weights is None else list(weights)
+    old = np.asarray(previous.weights, dtype=np.float64)
+    new = np.asarray(weights, dtype=np.float64)
+    changed = np.flatnonzero(old != new)
+    if not len(changed):
+        return previous._replace(weights=weights)
+
+    affected = _affected(graph, previous, changed, old[changed], new[changed])
+    origins = previous.origins.tolist()
+    fresh = dict(zip(affected, _searches(graph, [origins[i] for i in affected], previous.budget,
+                                         weights, processes, chunk_size)))
+    offsets = previous.offsets.tolist()
+    stops, times, counts = [], [], []
+    for i in range(len(origins)):
+        if i in fresh:
+            row_stops = np.array(fresh[i][0], dtype=np.int32)
+            row_times = np.array(fresh[i][1], dtype=np.float64)
+        else:
+            row_stops = previous.stops[offsets[i]:offsets[i + 1]]
+            row_times = previous.times[offsets[i]:offsets[i + 1]]
+        stops.append(row_stops)
+        times.append(row_times)
+        counts.append(len(row_stops))
+    new_offsets = np.zeros(len(origins) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+    return Accessibility(previous.origins, previous.budget, weights, new_offsets,
+                         np.concatenate(stops) if stops else previous.stops[:0],
+                         np.concatenate(times) if times else previous.times[:0])
+
+
+def reachable_counts(result):
+    """Number of stops each origin reaches within the budget (itself included)"""
+    return np.diff(result.offsets)
+
+
+def rasterize(lats, lons, values, cell_km=0.5, how='mean'):
+    """Grid per-stop values (mean, min or max per cell) for heatmaps; stops without coordinates are skipped"""
+    lats, lons, values = (np.asarray(x, dtype=np.float64) for x in (lats, lons, values))
+    keep = ~(np.isnan(lats) | np.isnan(lons))
+    lats, lons, values = lats[keep], lons[keep], values[keep]
+    if not len(values):
+        return Raster(np.full((0, 0), np.nan), 0.0, 0.0, 0.0, 0.0)
+
+    # Same cell geometry as SpatialIndex
+    lat_step = cell_km / KM_PER_DEGREE
+    lon_step = cell_km / (KM_PER_DEGREE * max(math.cos(math.radians(float(lats.mean()))), 1e-6))
+    lat0 = math.floor(lats.min() / lat_step) * lat_step
+    lon0 = math.floor(lons.min() / lon_step) * lon_step
+    rows = np.floor((lats - lat0) / lat_step).astype(np.int64)
+    cols = np.floor((lons - lon0) / lon_step).astype(np.int64)
+    shape = (int(rows.max()) + 1, int(cols.max()) + 1)
+    cells = rows * shape[1] + cols
+
+    size = shape[0] * shape[1]
+    counts = np.bincount(cells, minlength=size)
+    if how == 'mean':
+        grid = np.bincount(cells, weights=values, minlength=size) / np.maximum(counts, 1)
+    elif how in ('min', 'max'):
+        grid = np.full(size, np.inf if how == 'min' else -np.inf)
+        (np.minimum if how == 'min' else np.maximum).at(grid, cells, values)
+    else:
+        raise ValueError(f"unknown aggregation {how!r} (use 'mean', 'min' or 'max')")
+    grid[counts == 0] = np.nan
+    return Raster(grid.reshape(shape), lat0, lon0, lat_step, lon_step)
+
+
+def raster_points(raster):
+    """[[lat, lon, value], ...] at the centre of every non-empty cell, the heatmap charts' point format"""
+    rows, cols = np.nonzero(~np.isnan(raster.grid))
+    lat = raster.lat0 + (rows + 0.5) * raster.lat_step
+    lon = raster.lon0 + (cols + 0.5) * raster.lon_step
+    return np.column_stack([lat, lon, raster.grid[rows, cols]]).tolist()
@@ -0,0 +1,154 @@
+import heapq
+from itertools import count
+
+
+class KShortestPaths:
+    """Yen's k shortest simple paths between two stop IDs of a CompiledGraph, generated lazily
+
+    One reverse Dijkstra tree towards the target is shared by every spur search. Its
+    distances are exact remaining times on the unrestricted graph, so they stay an
+    admissible, consistent A* bound when root stops and edges are blocked; and as soon
+    as the search reaches a stop whose tree path avoids everything blocked, that tree
+    path finishes the spur without further expansion. Each path is only spurred from its
+    deviation point onwards (Lawler), so no spur problem is solved twice, and spurs that
+    turn out to be cut off from the target are detected early and remembered (see
+    _spur_path).
+    """
+
+    def __init__(self, graph, source, target, weights=None, rev_weights=None):
+        self.graph = graph
+        self.source = source
+        self.target = target
+        self.weights = graph._weights if weights is None else weights
+        # remaining[v] = time from v to target, next_stop[v] = the stop after v on that path
+        self.remaining, self.next_stop = graph.dijkstra(target, reverse=True, weights=weights,
+                                                        rev_weights=rev_weights)
+        self.spur_searches = 0
+        self.settled = 0
+
+    def __iter__(self):
+        """Yield (stop-ID path, travel time) in order of increasing time"""
+        if self.remaining[self.source] == float('inf'):
+            return
+        first = self._tree_path(self.source)
+        accepted = []
+        candidates = []
+        seen = {tuple(first)}
+        c = count()
+        path, cost, deviation = first, self.remaining[self.source], 0
+        while True:
+            yield path, cost
+            accepted.append(path)
+            prefix = self._prefix_times(path)
+            dead = set()
+            for i in range(deviation, len(path) - 1):
+                root = path[:i + 1]
+                # Edges out of the spur stop already taken by accepted paths with this root
+                blocked_next = {p[i + 1] for p in accepted if len(p) > i + 1 and p[:i + 1] == root}
+                spur = self._spur_path(path[i], set(root[:-1]), blocked_next, dead)
+                if spur is None:
+                    continue
+                candidate = root[:-1] + spur[0]
+                key = tuple(candidate)
+                if key not in seen:
+                    seen.add(key)
+                    heapq.heappush(candidates, (prefix[i] + spur[1], next(c), i, candidate))
+            if not candidates:
+                return
+            cost, _, deviation, path = heapq.heappop(candidates)
+
+    def _prefix_times(self, path):
+        """Time from the first stop of path to each of its stops"""
+        weights = self.weights
+        edge_index = self.graph.edge_index
+        times = [0.0]
+        for u, v in zip(path, path[1:]):
+            times.append(times[-1] + weights[edge_index[(u, v)]])
+        return times
+
+    def _tree_path(self, v, avoid=(), first_blocked=()):
+        """Tree path v -> target, or None when it enters a stop in avoid or starts with a blocked hop"""
+        next_stop = self.next_stop
+        if v != self.target and next_stop[v] in first_blocked:
+            return None
+        path = [v]
+        while v != self.target:
+            v = next_stop[v]
+            if v in avoid:
+                return None
+            path.append(v)
+        return path
+
+    def _spur_path(self, spur, blocked_nodes, blocked_next, dead):
+        """Fastest (path, time) from spur to target avoiding blocked_nodes and the first hops in blocked_next
+
+        dead holds stops known to be cut off from the target by blocked_nodes. A failed
+        search adds every stop it reached but the spur: none of them can get to the target
+        without passing a blocked stop or the spur, which later spurs along the same path
+        block too.
+        """
+        if spur in dead:
+            return None
+        self.spur_searches += 1
+        graph = self.graph
+        offsets = graph._offsets
+        targets = graph._targets
+        rev_offsets = graph._rev_offsets
+        rev_sources = graph._rev_sources
+        weights = self.weights
+        h = self.remaining
+        inf = float('inf')
+
+        # One step of a reverse sweep from the target per forward step. If the sweep runs
+        # dry before an allowed hop out of the spur, the target is cut off; when blocking
+        # leaves few ways in, that proves it long before the forward search would.
+        backward = [self.target]
+        reached = {self.target}
+        connected = False
+
+        seen = {spur: 0.0}
+        pred = {spur: -1}
+        settled = set()
+        c = count()
+        fringe = [(h[spur], next(c), spur, 0.0)]
+        while fringe:
+            if not connected:
+                if not backward:
+                    break
+                x = backward.pop()
+                for e in range(rev_offsets[x], rev_offsets[x + 1]):
+                    y = rev_sources[e]
+                    if y == spur:
+                        connected = connected or x not in blocked_next
+                    elif y not in reached and y not in blocked_nodes and y not in dead:
+                        reached.add(y)
+                        backward.append(y)
+
+            _, _, v, d = heapq.heappop(fringe)
+            if v in settled:
+                continue
+            settled.add(v)
+            self.settled += 1
+
+            # v is the cheapest open stop, so a free tree path from it is optimal
+            on_path = [v]
+            while pred[on_path[-1]] >= 0:
+                on_path.append(pred[on_path[-1]])
+            rest = self._tree_path(v, blocked_nodes.union(on_path[1:]), blocked_next if v == spur else ())
+            if rest is not None:
+                return on_path[:0:-1] + rest, d + h[v]
+
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                if (u in settled or u in blocked_nodes or u in dead or h[u] == inf
+                        or (v == spur and u in blocked_next)):
+                    continue
+                vu_dist = d + weights[e]
+                if vu_dist < seen.get(u, inf):
+                    seen[u] = vu_dist
+                    pred[u] = v
+                    heapq.heappush(fringe, (vu_dist + h[u], next(c), u, vu_dist))
+        # Everything the forward search reached is cut off as well
+        settled.discard(spur)
+        dead.update(settled)
+        return None
@@ -0,0 +1,129 @@
+import heapq
+from itertools import count
+
+import numpy as np
+import networkx as nx
+
+
+class LandmarkIndex:
+    """ALT (A*, Landmarks, Triangle inequality) search over a CompiledGraph"""
+
+    def __init__(self, graph, landmarks):
+        self.graph = graph
+        self.landmarks = [graph.node_index[name] for name in landmarks]
+
+        # to_landmark[k, v] = d(v, L_k) and from_landmark[k, v] = d(L_k, v) on base travel times
+        self.from_landmark = np.array([graph.dijkstra(l)[0] for l in self.landmarks], dtype=np.float64)
+        self.to_landmark = np.array([graph.dijkstra(l, reverse=True)[0] for l in self.landmarks], dtype=np.float64)
+
+    @classmethod
+    def from_hubs(cls, graph, major_hubs, count=8):
+        """Use the top-degree hubs (as returned by _identify_major_hubs) as landmarks"""
+        return cls(graph, [hub for hub, _ in major_hubs[:count]])
+
+    @classmethod
+    def farthest(cls, graph, count=8, start=None):
+        """Farthest-point landmark selection: each new landmark is the stop worst covered by the previous ones"""
+        n = graph.num_nodes
+        first = graph.node_index[start] if start is not None else 0
+        chosen = [first]
+        # Distance in either direction, so landmarks spread over the whole network
+        nearest = np.full(n, np.inf)
+        while len(chosen) < min(count, n):
+            forward = np.array(graph.dijkstra(chosen[-1])[0])
+            backward = np.array(graph.dijkstra(chosen[-1], reverse=True)[0])
+            nearest = np.minimum(nearest, np.minimum(forward, backward))
+            # Stops not connected to any landmark yet are the worst covered of all
+            candidates = np.where(np.isinf(nearest), np.finfo(np.float64).max, nearest)
+            candidates[chosen] = -1
+            chosen.append(int(np.argmax(candidates)))
+        return cls(graph, [graph.nodes[i] for i in chosen])
+
+    def lower_bounds(self, target, scale=1.0):
+        """Triangle-inequality lower bound on the travel time from every stop to target
+
+        scale multiplies the bounds; pass the smallest traffic multiplier so the bounds
+        stay admissible when the search runs on traffic-adjusted times.
+        """
+        with np.errstate(invalid='ignore'):
+            # d(v, t) >= d(v, L) - d(t, L)
+            via_to = self.to_landmark - self.to_landmark[:, target:target + 1]
+            # d(v, t) >= d(L, t) - d(L, v)
+            via_from = self.from_landmark[:, target:target + 1] - self.from_landmark
+        # Landmarks that say nothing about this pair (inf - inf, or L cannot reach t) give 0;
+        # a stop that cannot reach a landmark t reaches stays inf, which prunes it
+        via_to = np.where(np.isnan(via_to), 0.0, via_to)
+        via_from = np.where(np.isnan(via_from) | np.isinf(self.from_landmark[:, target:target + 1]), 0.0, via_from)
+        bounds = np.maximum(np.maximum(via_to, via_from).max(axis=0), 0.0)
+        return (bounds * scale).tolist()
+
+    def astar(self, source, target, heuristic=True, weights=None, scale=1.0):
+        """A* from stop ID source to target; returns (path or None, settled node count)
+
+        With heuristic=False this is plain unidirectional Dijkstra, for comparison.
+        """
+        graph = self.graph
+        offsets = graph._offsets
+        targets = graph._targets
+        weights = graph._weights if weights is None else weights
+        n = graph.num_nodes
+        h = self.lower_bounds(target, scale) if heuristic else [0.0] * n
+
+        inf = float('inf')
+        seen = [inf] * n
+        pred = [-1] * n
+        settled = [False] * n
+        num_settled = 0
+
+        c = count()
+        seen[source] = 0.0
+        fringe = [(h[source], next(c), source, 0.0)]
+        while fringe:
+            _, _, v, g = heapq.heappop(fringe)
+            if settled[v]:
+                continue
+            settled[v] = True
+            num_settled += 1
+            if v == target:
+                return graph.path_to(pred, source, target), num_settled
+            for e in range(offsets[v], offsets[v + 1]):
+                u = targets[e]
+                if settled[u] or h[u] == inf:
+                    continue
+                g_u = g + weights[e]
+                if g_u < seen[u]:
+                    seen[u] = g_u
+                    pred[u] = v
+                    heapq.heappush(fringe, (g_u + h[u], next(c), u, g_u))
+        return None, num_settled
+
+    def shortest_path(self, origin, destination, weights=None, scale=1.0):
+        """Drop-in replacement for nx.shortest_path(G, origin, destination, weight='time') using ALT
+
+        weights/scale are passed to astar for searches on traffic-adjusted times.
+        """
+        node_index = self.graph.node_index
+        if origin not in node_index:
+            raise nx.NodeNotFound(f"Source {origin} is not in G")
+        if destination not in node_index:
+            raise nx.NodeNotFound(f"Target {destination} is not in G")
+
+        path, _ = self.astar(node_index[origin], node_index[destination], weights=weights, scale=scale)
+        if path is None:
+            raise nx.NetworkXNoPath(f"No path between {origin} and {destination}.")
+        return [self.graph.nodes[i] for i in path]
+
+    def compare(self, origin, destination):
+        """Settled-node counts of ALT versus plain Dijkstra for one query"""
+        source = self.graph.node_index[origin]
+        target = self.graph.node_index[destination]
+        alt_path, alt_settled = self.astar(source, target)
+        dijkstra_path, dijkstra_settled = self.astar(source, target, heuristic=False)
+        return {
+            'origin': origin,
+            'destination': destination,
+            'found': alt_path is not None,
+            'alt_settled': alt_settled,
+            'dijkstra_settled': dijkstra_settled,
+            'reduction': dijkstra_settled / alt_settled if alt_settled else 1.0
+        }
@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+import numpy as np
+
+# Share of each request type in the generated mix
+REQUEST_MIX = (('plan', 0.7), ('alternatives', 0.1), ('departures', 0.1), ('stops/nearest', 0.1))
+
+
+def request_paths(stops, station_coords, n_paths=500, hot_pairs=200, seed=0):
+    """A fixed list of API paths following REQUEST_MIX over a hot set of origin/destination pairs
+
+    Real traffic concentrates on popular trips, so plans are drawn from hot_pairs pairs
+    (which is what makes caching and coalescing matter).
+    """
+    rng = random.Random(seed)
+    pairs = [tuple(rng.sample(stops, 2)) for _ in range(hot_pairs)]
+    located = [stop for stop in stops if stop in station_coords]
+    kinds, weights = zip(*REQUEST_MIX)
+    paths = []
+    for kind in rng.choices(kinds, weights, k=n_paths):
+        if kind in ('plan', 'alternatives'):
+            origin, destination = rng.choice(pairs)
+            query = {'origin': origin, 'destination': destination}
+        elif kind == 'departures':
+            query = {'stop': rng.choice(stops), 'time': f"{rng.randrange(5, 23):02d}:{rng.randrange(60):02d}"}
+        else:
+            lat, lon = station_coords[rng.choice(located)]
+            query = {'lat': round(lat + rng.uniform(-0.01, 0.01), 5), 'lon': round(lon + rng.uniform(-0.01, 0.01), 5)}
+        paths.append(f"/api/{kind}?{urlencode(query)}")
+    return paths
+
+
+async def _client(host, port, paths, deadline, latencies, statuses, rng):
+    """One keep-alive connection sending requests back to back until the deadline"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            path = rng.choice(paths)
+            start = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, paths, concurrency=32, duration=10.0, seed=0):
+    """Drive the service from `concurrency` connections for `duration` seconds and summarise it"""
+    latencies = []
+    statuses = Counter()
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, paths, deadline, latencies, statuses, random.Random(seed + i))
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'statuses': dict(statuses),
+    }
+
+
+if __name__ == "__main__":
+    from transit_network import TransitNetwork
+
+    parser = argparse.ArgumentParser(description="Closed-loop load generator for planning_service.py")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, default=32, help="open connections")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    parser.add_argument('--hot-pairs', type=int, default=200)
+    args = parser.parse_args()
+
+    network = TransitNetwork.load_or_build()
+    paths = request_paths(network.names, network.station_coords(), hot_pairs=args.hot_pairs)
+    report = asyncio.run(run_load(args.host, args.port, paths, args.concurrency, args.duration))
+    print(f"{report['requests']} requests, {report['throughput']:.0f} req/s, "
+          f"p50 {report['p50_ms']:.1f} ms, p95 {report['p95_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms, "
+          f"statuses {report['statuses']}")
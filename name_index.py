@@ -0,0 +1,179 @@
+import heapq
+import re
+from collections import Counter
+
+# Match tiers, best first
+EXACT = 0
+SUBSTRING = 1
+FUZZY = 2
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_name(name):
+    """Lower-case a station name and collapse punctuation/whitespace to single spaces"""
+    return _NON_WORD.sub(' ', str(name).lower()).strip()
+
+
+def trigrams(text):
+    """Character trigrams of a normalised name, padded so short names and word edges count"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _boundary(name, text):
+    """How well text sits on word boundaries of the normalised name containing it
+
+    2 when some occurrence covers whole words, 1 when one starts a word, 0 when every
+    occurrence starts inside a word.
+    """
+    best = 0
+    start = name.find(text)
+    while start >= 0 and best < 2:
+        if start == 0 or name[start - 1] == ' ':
+            end = start + len(text)
+            best = max(best, 2 if end == len(name) or name[end] == ' ' else 1)
+        start = name.find(text, start + 1)
+    return best
+
+
+class NameIndex:
+    """Prebuilt lookup from free-text station names to known stop names
+
+    Keeps an exact map of normalised names, an inverted index of name tokens and a
+    character-trigram index, so resolving a query touches only the names sharing tokens
+    or trigrams with it instead of scanning every stop.
+    """
+
+    def __init__(self, names, min_similarity=0.4):
+        self.min_similarity = min_similarity  # trigram Dice score needed for a typo match
+        self.names = []
+        self.normalized = []
+        self.lowered = []  # Names only lower-cased, for containing's plain substring tests
+        self.exact = {}
+        self.token_index = {}
+        self.trigram_index = {}
+        self.trigram_counts = []
+        # Names by the first unpadded trigram of their normalised form; names too short to
+        # have one are kept apart in short_names
+        self.head_index = {}
+        self.short_names = []
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        """Index one more name after the existing ones; returns its ID"""
+        i = len(self.names)
+        text = normalize_name(name)
+        self.names.append(name)
+        self.normalized.append(text)
+        self.lowered.append(str(name).lower())
+        self.exact.setdefault(text, i)
+        for token in set(text.split()):
+            self.token_index.setdefault(token, []).append(i)
+        grams = trigrams(text)
+        self.trigram_counts.append(len(grams))
+        for gram in grams:
+            self.trigram_index.setdefault(gram, []).append(i)
+        if len(text) >= 3:
+            self.head_index.setdefault(text[:3], []).append(i)
+        else:
+            self.short_names.append(i)
+        return i
+
+    def _substring_matches(self, text):
+        """IDs of names containing text; candidates come from the rarest shared trigram"""
+        if len(text) < 3:
+            return [i for i, name in enumerate(self.normalized) if text in name]
+        # Unpadded trigrams of the query occur in every name that contains it
+        grams = [text[i:i + 3] for i in range(len(text) - 2)]
+        postings = [self.trigram_index.get(gram) for gram in grams]
+        if any(posting is None for posting in postings):
+            return []
+        rarest = min(postings, key=len)
+        return [i for i in rarest if text in self.normalized[i]]
+
+    def containing(self, query):
+        """First name that contains query or is contained in it, or None
+
+        The same two-way test as lower-casing both sides and scanning every name with
+        `in`. Lower-case containment implies containment of the normalised forms, so
+        candidates come from the indexes: names containing the query share its trigrams,
+        and a name inside the query starts with one of the query's trigrams.
+        """
+        text = normalize_name(query)
+        lowered = str(query).lower()
+        names = self.lowered
+        if not text:
+            # Nothing left to index on (e.g. an empty query, which every name contains)
+            return next((self.names[i] for i, name in enumerate(names)
+                         if lowered in name or name in lowered), None)
+        matches = [i for i in self._substring_matches(text) if lowered in names[i]]
+        for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+            matches.extend(i for i in self.head_index.get(gram, ()) if names[i] in lowered)
+        matches.extend(i for i in self.short_names if names[i] in lowered)
+        return self.names[min(matches)] if matches else None
+
+    def suggest(self, query, k=5):
+        """Up to k (name, tier, score) suggestions for query, best first
+
+        Tiers are EXACT, SUBSTRING (name contains the query) and FUZZY (names sharing a
+        whole word with the query, or with a trigram Dice similarity of at least
+        min_similarity to tolerate typos). Within a tier, matches at the start of a word
+        come first: for SUBSTRING, whole words before word prefixes before matches inside
+        a word; for FUZZY, names with a word that starts like a query word. Word-start
+        substring matches keep the original name order; the rest are ordered by score, the
+        share of the name the query covers (SUBSTRING) or the trigram similarity (FUZZY).
+        Remaining ties keep the original name order.
+        """
+        text = normalize_name(query)
+        if not text:
+            return []
+
+        ranked = {}  # id -> ((tier, -boundary, -score or 0), score)
+
+        def offer(i, tier, score, boundary=0, by_score=True):
+            key = (tier, -boundary, -score if by_score else 0.0)
+            if i not in ranked or key < ranked[i][0]:
+                ranked[i] = (key, score)
+
+        if text in self.exact:
+            offer(self.exact[text], EXACT, 1.0)
+        for i in self._substring_matches(text):
+            name = self.normalized[i]
+            boundary = _boundary(name, text)
+            offer(i, SUBSTRING, len(text) / max(1, len(name)), boundary, by_score=boundary == 0)
+
+        # Fuzzy matches always rank below substring ones, so skip them once k are found
+        if len(ranked) >= k:
+            return self._top(ranked, k)
+
+        shared_word = set()
+        for token in set(text.split()):
+            shared_word.update(self.token_index.get(token, ()))
+
+        grams = trigrams(text)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self.trigram_index.get(gram, ()))
+        counts = self.trigram_counts
+        heads = {token[:3] for token in text.split()}
+        for i, common in overlap.items():
+            score = 2.0 * common / (len(grams) + counts[i])
+            if score >= self.min_similarity or i in shared_word:
+                starts = any(token[:3] in heads for token in self.normalized[i].split())
+                offer(i, FUZZY, score, int(starts))
+        return self._top(ranked, k)
+
+    def _top(self, ranked, k):
+        """(name, tier, score) for the k best-ranked IDs"""
+        best = heapq.nsmallest(k, ranked.items(), key=lambda item: (item[1][0], item[0]))
+        return [(self.names[i], key[0], score) for i, (key, score) in best]
+
+    def resolve(self, query):
+        """Best matching name for query, or None"""
+        suggestions = self.suggest(query, k=1)
+        return suggestions[0][0] if suggestions else None
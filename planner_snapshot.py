@@ -0,0 +1,66 @@
+import threading
+from collections import namedtuple
+
+# Everything a traffic-aware query reads, frozen at one traffic epoch. The arrays and lists
+# are never modified after publication; a traffic update builds a whole new snapshot.
+# hub_trees caches traffic-aware hub trees and only ever grows with values valid for this
+# epoch, so concurrent queries can fill it without coordination. multiplier_list mirrors
+# multipliers as floats for per-edge lookups in Python loops.
+TrafficSnapshot = namedtuple('TrafficSnapshot', ['epoch', 'multipliers', 'multiplier_list', 'weights',
+                                                 'rev_weights', 'scale', 'hub_trees'])
+
+
+def build_snapshot(compiled, multipliers, epoch):
+    """Snapshot of base time x multiplier for every CompiledGraph edge at the given epoch"""
+    weights = (compiled.weights * multipliers).tolist()
+    # (multipliers as a list, forward weights, reverse-CSR weights, smallest multiplier for the ALT bounds)
+    return TrafficSnapshot(epoch, multipliers, multipliers.tolist(), weights, compiled.reverse_weights(weights),
+                           float(multipliers.min()) if len(weights) else 1.0, {})
+
+
+def patch_snapshot(compiled, previous, multipliers, edges, epoch):
+    """previous with only the given edges recomputed for new multipliers, at the given epoch
+
+    The lists are copied (a flat copy, never modified in place, so queries pinned to
+    previous keep it intact) and only the touched entries of multiplier_list, weights and
+    rev_weights are rewritten, with the same products build_snapshot computes.
+    """
+    multiplier_list = list(previous.multiplier_list)
+    weights = list(previous.weights)
+    rev_weights = list(previous.rev_weights)
+    base = compiled._weights
+    rev_positions = compiled._rev_positions
+    scale = previous.scale
+    rescan = False
+    for e, m in zip(edges, multipliers[edges].tolist()):
+        # Raising the edge that held the minimum may raise the minimum itself
+        rescan = rescan or (multiplier_list[e] == scale and m > scale)
+        scale = min(scale, m)
+        multiplier_list[e] = m
+        weights[e] = rev_weights[rev_positions[e]] = base[e] * m
+    if rescan:
+        scale = float(multipliers.min())
+    return TrafficSnapshot(epoch, multipliers, multiplier_list, weights, rev_weights, scale, {})
+
+
+class SnapshotRefresher:
+    """Daemon thread that publishes a fresh traffic snapshot on the planner every interval seconds"""
+
+    def __init__(self, planner, interval):
+        self.planner = planner
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop refreshing and wait for the thread to finish"""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.planner.refresh_traffic()
@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+from collections import Counter
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from connectivity import NoRoute
+from enhanced_transit_planner import EnhancedTransitPlanner
+from fares import calculate_fare
+from isochrone import raster_points
+from transit_network import TransitNetwork
+
+# The web UI (index.html, css/, js/) is served from the repository root
+STATIC_ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_EXTENSIONS = {'.html', '.css', '.js', '.png', '.jpg', '.svg', '.ico'}
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class BadRequest(ValueError):
+    """Invalid or missing query parameters (answered with 400)"""
+
+
+def build_planner(directory='.', **options):
+    """EnhancedTransitPlanner over the GTFS files in directory, cold-started from the network snapshot"""
+    network = TransitNetwork.load_or_build(directory)
+    return EnhancedTransitPlanner(network.build_graph(), network.station_coords(), calculate_fare,
+                                  timetable=network.timetable, **options)
+
+
+def to_json(value):
+    """Plain JSON-ready copy of planner results (RouteResult, read-only views, NoRoute, NumPy values)"""
+    if isinstance(value, NoRoute):
+        return {'error': value.to_dict()}
+    if isinstance(value, Mapping):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _param(params, name, convert=str, default=None):
+    values = params.get(name)
+    if not values:
+        if default is None:
+            raise BadRequest(f"missing query parameter '{name}'")
+        return default
+    try:
+        return convert(values[0])
+    except ValueError:
+        raise BadRequest(f"invalid value for '{name}': {values[0]!r}") from None
+
+
+def _flag(value):
+    return value.lower() not in ('0', 'false', 'no')
+
+
+def plan(planner, params):
+    """/api/plan?origin=&destination=[&traffic=1][&departure_time=HH:MM]"""
+    result = planner.calculate_path(_param(params, 'origin'), _param(params, 'destination'),
+                                    _param(params, 'traffic', _flag, True),
+                                    params.get('departure_time', [None])[0])
+    return {'route': to_json(result)} if result else to_json(result)
+
+
+def alternatives(planner, params):
+    """/api/alternatives?origin=&destination=[&k=3][&traffic=1]"""
+    routes = planner.suggest_alternatives(_param(params, 'origin'), _param(params, 'destination'),
+                                          _param(params, 'k', int, 3), _param(params, 'traffic', _flag, True))
+    return {'routes': to_json(routes)}
+
+
+def departures(planner, params):
+    """/api/departures?stop=&stop=...&time=HH:MM[:SS][&n=5]"""
+    stops = params.get('stop')
+    if not stops:
+        raise BadRequest("missing query parameter 'stop'")
+    return {'departures': planner.next_departures(stops, _param(params, 'time'), _param(params, 'n', int, 5))}
+
+
+def nearest_stops(planner, params):
+    """/api/stops/nearest?lat=&lon=[&k=5]"""
+    found = planner.nearest_stops(_param(params, 'lat', float), _param(params, 'lon', float),
+                                  _param(params, 'k', int, 5))
+    return {'stops': [{'stop': stop, 'distance': km, 'coordinates': planner.station_coords[stop]}
+                      for stop, km in found]}
+
+
+def isochrone(planner, params):
+    """/api/accessibility?origin=[&minutes=60][&traffic=1][&cell_km=0.5]"""
+    stops, times = planner.isochrone(_param(params, 'origin'), _param(params, 'minutes', float, 60.0),
+                                     _param(params, 'traffic', _flag, True))
+    raster = planner.accessibility_raster(stops, times, _param(params, 'cell_km', float, 0.5), how='min')
+    return {'stops': [planner.compiled.nodes[stop] for stop in stops.tolist()], 'times': times.tolist(),
+            'heatmap': raster_points(raster)}
+
+
+ENDPOINTS = {
+    'plan': plan,
+    'alternatives': alternatives,
+    'departures': departures,
+    'stops/nearest': nearest_stops,
+    'accessibility': isochrone,
+}
+
+
+def execute(planner, endpoint, params):
+    """Run one API call on a planner; the unit of work handed to the worker pool"""
+    return ENDPOINTS[endpoint](planner, params)
+
+
+# Planner of a process-pool worker, built once by _init_worker
+_worker_planner = None
+
+
+def _init_worker(directory, options):
+    global _worker_planner
+    _worker_planner = build_planner(directory, **options)
+
+
+def _execute_in_worker(endpoint, params):
+    return execute(_worker_planner, endpoint, params)
+
+
+class PlanningService:
+    """Asyncio HTTP/1.1 JSON API over EnhancedTransitPlanner
+
+    The event loop only parses requests and writes responses; searches run in a worker
+    pool (threads sharing one planner, or processes that each build their own from the
+    network snapshot). Identical requests arriving while one is being computed share
+    that computation. At most max_pending distinct computations may be queued or
+    running; beyond that requests get 503 straight away instead of piling up, and a
+    request still waiting after timeout seconds gets 504.
+    """
+
+    def __init__(self, planner=None, workers=4, processes=False, directory='.', planner_options=None,
+                 max_pending=64, timeout=5.0, static_root=STATIC_ROOT):
+        planner_options = planner_options or {}
+        if processes:
+            self.planner = None
+            self.executor = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                initargs=(directory, planner_options))
+        else:
+            self.planner = planner if planner is not None else build_planner(directory, **planner_options)
+            self.executor = ThreadPoolExecutor(workers)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.static_root = static_root
+        self.inflight = {}  # request key -> future shared by identical concurrent requests
+        self.stats = Counter()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, endpoint, params):
+        loop = asyncio.get_running_loop()
+        if self.planner is None:
+            return loop.run_in_executor(self.executor, _execute_in_worker, endpoint, params)
+        return loop.run_in_executor(self.executor, execute, self.planner, endpoint, params)
+
+    def _finished(self, key, future):
+        # Leaves the table when the work finishes, even if every waiter timed out
+        self.inflight.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # mark a failure as seen when nobody was left waiting for it
+
+    async def call(self, endpoint, params):
+        """(status, JSON body) for one API call, coalescing it with identical in-flight calls"""
+        if endpoint == 'stats':
+            return 200, dict(self.stats, pending=len(self.inflight))
+        if endpoint not in ENDPOINTS:
+            return 404, {'error': f"unknown endpoint '{endpoint}'"}
+
+        self.stats['requests'] += 1
+        key = (endpoint, tuple(sorted((name, tuple(values)) for name, values in params.items())))
+        future = self.inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+        else:
+            if len(self.inflight) >= self.max_pending:
+                self.stats['rejected'] += 1
+                return 503, {'error': "server busy, retry later"}
+            future = self._submit(endpoint, params)
+            self.inflight[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+
+        try:
+            # shield: one waiter timing out must not cancel the work the others wait for
+            return 200, await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            return 504, {'error': f"no answer within {self.timeout:g} s"}
+        except (BadRequest, KeyError, ValueError) as e:
+            # Bad parameters, unknown stops, or no timetable for a departure-time query
+            return 400, {'error': str(e)}
+        except Exception as e:  # a failed search must not take the server down
+            self.stats['errors'] += 1
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+
+    def _static(self, path):
+        """(status, bytes, content type) of a UI file under static_root"""
+        relative = os.path.normpath(path.lstrip('/') or 'index.html')
+        full = os.path.join(self.static_root, relative)
+        if (relative.startswith('..') or os.path.splitext(relative)[1] not in STATIC_EXTENSIONS
+                or not os.path.isfile(full)):
+            return 404, b'Not Found', 'text/plain'
+        with open(full, 'rb') as f:
+            return 200, f.read(), mimetypes.guess_type(full)[0] or 'application/octet-stream'
+
+    async def respond(self, method, target):
+        """(status, body bytes, content type) for one request"""
+        if method not in ('GET', 'HEAD'):
+            return 405, b'{"error": "only GET is supported"}', 'application/json'
+        url = urlsplit(target)
+        if not url.path.startswith('/api/'):
+            return self._static(url.path)
+        status, body = await self.call(url.path[len('/api/'):].rstrip('/'), parse_qs(url.query))
+        return status, json.dumps(body).encode('utf-8'), 'application/json'
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until it closes (keep-alive by default)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0) or 0):
+                    await reader.readexactly(int(headers['content-length']))
+
+                status, body, content_type = await self.respond(method, target)
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                        f"Content-Type: {content_type}",
+                        f"Content-Length: {len(body)}",
+                        "Connection: " + ('keep-alive' if keep_alive else 'close')]
+                if status == 503:
+                    head.append("Retry-After: 1")
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8000):
+        """Start listening and return the asyncio server (port=0 picks a free port)"""
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the transit planner as a JSON API (and the web UI)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--processes', action='store_true', help="use worker processes instead of threads")
+    parser.add_argument('--max-pending', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=5.0, help="seconds before a request gets 504")
+    args = parser.parse_args()
+
+    service = PlanningService(workers=args.workers, processes=args.processes,
+                              max_pending=args.max_pending, timeout=args.timeout)
+    print(f"Serving on http://{args.host}:{args.port}/ (API under /api/)")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -0,0 +1,235 @@
+from bisect import bisect_left
+
+INF = float('inf')
+
+
+class RaptorRouter:
+    """Round-based public transit routing (RAPTOR) over a Timetable"""
+
+    def __init__(self, timetable, transfer_time=120):
+        self.timetable = timetable
+        self.transfer_time = transfer_time  # seconds to walk between stops sharing a name
+
+        self._build_patterns()
+        self.footpaths = timetable.footpaths(transfer_time)
+
+    def _build_patterns(self):
+        """Group trips that serve the same stop sequence of a route into route patterns"""
+        tt = self.timetable
+        offsets = tt.trip_offsets.tolist()
+        st_stop = tt.st_stop.tolist()
+        st_arrival = tt.st_arrival.tolist()
+        st_departure = tt.st_departure.tolist()
+
+        pattern_lookup = {}
+        pattern_trips = []
+        for trip in range(tt.num_trips):
+            start, end = offsets[trip], offsets[trip + 1]
+            key = (tt.trip_route[trip], tuple(st_stop[start:end]))
+            if key not in pattern_lookup:
+                pattern_lookup[key] = len(pattern_trips)
+                pattern_trips.append([])
+            pattern_trips[pattern_lookup[key]].append(trip)
+
+        self.pattern_route = []      # route_id per pattern
+        self.pattern_stops = []      # stop indices per pattern
+        self.pattern_trip_ids = []   # trip indices per pattern, sorted by departure
+        self.pattern_arrivals = []   # [trip][stop position] arrival seconds
+        self.pattern_departures = [] # [stop position] -> departures of all trips, sorted (bisect column)
+        self.pattern_rows = []       # [trip] -> stop time row of the trip's first stop
+        self.stop_patterns = [[] for _ in range(tt.num_stops)]  # stop -> [(pattern, position)]
+
+        for (route_id, stops), p in sorted(pattern_lookup.items(), key=lambda item: item[1]):
+            # Trips of a pattern are assumed not to overtake each other, so sorting
+            # by first departure keeps every per-stop column sorted as well
+            trips = sorted(pattern_trips[p], key=lambda t: st_departure[offsets[t]])
+            self.pattern_route.append(route_id)
+            self.pattern_stops.append(list(stops))
+            self.pattern_trip_ids.append(trips)
+            self.pattern_rows.append([offsets[t] for t in trips])
+            self.pattern_arrivals.append([st_arrival[offsets[t]:offsets[t + 1]] for t in trips])
+            self.pattern_departures.append([
+                [st_departure[offsets[t] + i] for t in trips] for i in range(len(stops))
+            ])
+            for i, stop in enumerate(stops):
+                self.stop_patterns[stop].append((p, i))
+
+    @property
+    def num_patterns(self):
+        return len(self.pattern_stops)
+
+    def earliest_arrival(self, sources, targets, departure_time, max_transfers=3, realtime=None):
+        """Earliest-arrival query from any source stop to any target stop; returns a list of legs or None
+
+        realtime optionally applies a RealtimeSnapshot: stop times move by their delays and
+        cancelled trips are never boarded.
+        """
+        n = self.timetable.num_stops
+        targets = set(targets)
+        best = [INF] * n          # best arrival over all rounds (local pruning)
+        labels = [[INF] * n]      # labels[k][stop]: earliest arrival with k trips
+        parents = [[None] * n]    # parents[k][stop]: ('ride', pattern, trip_pos, board_pos, alight_pos) or ('walk', from_stop)
+        best_target = INF
+
+        marked = set()
+        for s in sources:
+            labels[0][s] = departure_time
+            best[s] = departure_time
+            marked.add(s)
+        self._relax_footpaths(marked, labels[0], parents[0], best)
+
+        for k in range(1, max_transfers + 2):
+            previous = labels[k - 1]
+            current = list(previous)
+            parent = [None] * n
+
+            # Collect each pattern once, starting from its earliest marked stop
+            queue = {}
+            for stop in marked:
+                for p, i in self.stop_patterns[stop]:
+                    if i < queue.get(p, INF):
+                        queue[p] = i
+            marked = set()
+
+            for p, start in queue.items():
+                if realtime is not None:
+                    best_target = self._scan_realtime(p, start, previous, current, parent, best, marked,
+                                                      targets, best_target, realtime)
+                    continue
+                stops = self.pattern_stops[p]
+                arrivals = self.pattern_arrivals[p]
+                departures = self.pattern_departures[p]
+                trip = -1
+                board = -1
+                for i in range(start, len(stops)):
+                    stop = stops[i]
+                    if trip >= 0:
+                        arrival = arrivals[trip][i]
+                        if arrival < best[stop] and arrival < best_target:
+                            current[stop] = arrival
+                            best[stop] = arrival
+                            parent[stop] = ('ride', p, trip, board, i)
+                            marked.add(stop)
+                            if stop in targets:
+                                best_target = arrival
+                    # Board the earliest trip we can catch here if it beats the current one
+                    ready = previous[stop]
+                    if ready < INF and (trip < 0 or ready <= departures[i][trip]):
+                        t = bisect_left(departures[i], ready)
+                        if t < len(departures[i]) and (trip < 0 or t < trip):
+                            trip = t
+                            board = i
+
+            self._relax_footpaths(marked, current, parent, best)
+            labels.append(current)
+            parents.append(parent)
+            if not marked:
+                break
+
+        # Pick the earliest arrival; among equal arrivals prefer fewer trips
+        best_round, best_stop, arrival = -1, -1, INF
+        for k in range(1, len(labels)):
+            for stop in targets:
+                if labels[k][stop] < arrival:
+                    best_round, best_stop, arrival = k, stop, labels[k][stop]
+        if best_round < 0:
+            return None
+        return self._reconstruct(labels, parents, best_round, best_stop, realtime)
+
+    def _scan_realtime(self, p, start, previous, current, parent, best, marked, targets, best_target,
+                       realtime):
+        """One round's scan of pattern p with realtime delays; returns the updated best_target
+
+        Delays can reorder a pattern's trips, so boarding looks at every trip whose
+        scheduled departure is within the snapshot's delay bounds of the ready time and
+        takes the earliest actual departure that is not cancelled. Where delays make one
+        trip overtake another mid-pattern, the overtaking trip is reached by a transfer in
+        the next round (as on any timetable whose trips overtake).
+        """
+        stops = self.pattern_stops[p]
+        arrivals = self.pattern_arrivals[p]
+        departures = self.pattern_departures[p]
+        rows = self.pattern_rows[p]
+        trip_ids = self.pattern_trip_ids[p]
+        delays = realtime.delays
+        cancelled = realtime.cancelled
+        trip = -1
+        board = -1
+        for i in range(start, len(stops)):
+            stop = stops[i]
+            if trip >= 0:
+                arrival = arrivals[trip][i] + delays[rows[trip] + i]
+                if arrival < best[stop] and arrival < best_target:
+                    current[stop] = arrival
+                    best[stop] = arrival
+                    parent[stop] = ('ride', p, trip, board, i)
+                    marked.add(stop)
+                    if stop in targets:
+                        best_target = arrival
+            ready = previous[stop]
+            column = departures[i]
+            leaving = column[trip] + delays[rows[trip] + i] if trip >= 0 else INF
+            if ready == INF or ready > leaving:
+                continue
+            t = bisect_left(column, ready - realtime.late)
+            # A trip scheduled later than this can't leave before the best one found
+            while t < len(column) and column[t] - realtime.early < leaving:
+                if not cancelled[trip_ids[t]]:
+                    departure = column[t] + delays[rows[t] + i]
+                    if ready <= departure < leaving:
+                        leaving = departure
+                        trip = t
+                        board = i
+                t += 1
+        return best_target
+
+    def _relax_footpaths(self, marked, label, parent, best):
+        """Apply walking transfers from every stop improved in this round"""
+        for stop in list(marked):
+            for other, walk in self.footpaths[stop]:
+                arrival = label[stop] + walk
+                if arrival < best[other]:
+                    label[other] = arrival
+                    best[other] = arrival
+                    parent[other] = ('walk', stop)
+                    marked.add(other)
+
+    def _reconstruct(self, labels, parents, k, stop, realtime=None):
+        """Walk parent pointers back from (round, stop) into a list of legs"""
+        tt = self.timetable
+        legs = []
+        while k > 0:
+            entry = parents[k][stop]
+            if entry is None:
+                # Label inherited unchanged from the previous round
+                k -= 1
+                continue
+            if entry[0] == 'walk':
+                source = entry[1]
+                legs.append({
+                    'route_id': None,
+                    'trip_id': None,
+                    'stops': [source, stop],
+                    'departure': labels[k][source],
+                    'arrival': labels[k][stop],
+                })
+                stop = source
+                continue
+            _, p, trip, board, alight = entry
+            trip_index = self.pattern_trip_ids[p][trip]
+            departure = self.pattern_departures[p][board][trip]
+            arrival = self.pattern_arrivals[p][trip][alight]
+            if realtime is not None:
+                departure += realtime.delays[self.pattern_rows[p][trip] + board]
+                arrival += realtime.delays[self.pattern_rows[p][trip] + alight]
+            legs.append({
+                'route_id': self.pattern_route[p],
+                'trip_id': tt.trip_ids[trip_index],
+                'stops': self.pattern_stops[p][board:alight + 1],
+                'departure': departure,
+                'arrival': arrival,
+            })
+            stop = self.pattern_stops[p][board]
+            k -= 1
+        legs.reverse()
+        return legs
@@ -0,0 +1,297 @@
+import json
+import os
+import socket
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from vehicle_positions import hop_edges
+
+# Observed hop times outside this band (x scheduled) are treated as noise and clipped
+MIN_RATIO = 0.5
+MAX_RATIO = 3.0
+
+# Entries per PagedArray page (a power of two, so a page is found with one shift)
+PAGE_SHIFT = 10
+PAGE_SIZE = 1 << PAGE_SHIFT
+
+# One published version of the realtime state, as PagedArrays. delays is seconds per stop
+# time row (propagated downstream as in GTFS-realtime), cancelled is per trip, and the last
+# vehicle fix per trip is in vehicle_lat/vehicle_lon/vehicle_time (NaN when none was
+# received). No delay is more than early seconds ahead of or late seconds behind schedule.
+RealtimeSnapshot = namedtuple('RealtimeSnapshot', ['version', 'delays', 'cancelled',
+                                                   'vehicle_lat', 'vehicle_lon', 'vehicle_time',
+                                                   'early', 'late'])
+
+
+class PagedArray:
+    """Immutable fixed-length array stored as equal pages, so new versions share most of them
+
+    writer() starts a new version that copies a page only when it first writes to it;
+    everything else is shared with this version. Entries are read one at a time with [i],
+    or gathered with take() and to_numpy() for vectorised readers.
+    """
+
+    def __init__(self, pages, length):
+        self.pages = pages
+        self.length = length
+        self._dense = None
+
+    @classmethod
+    def full(cls, length, value, dtype):
+        # Pages are never written in place, so they can all start as the same one
+        page = np.full(PAGE_SIZE, value, dtype=dtype)
+        return cls([page] * max(1, -(-length // PAGE_SIZE)), length)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        return self.pages[i >> PAGE_SHIFT][i & (PAGE_SIZE - 1)].item()
+
+    def take(self, rows):
+        """Entries at an integer array of positions, as a NumPy array"""
+        rows = np.asarray(rows, dtype=np.int64)
+        result = np.empty(len(rows), dtype=self.pages[0].dtype)
+        page_of = rows >> PAGE_SHIFT
+        order = np.argsort(page_of, kind='stable')
+        starts = np.flatnonzero(np.diff(page_of[order], prepend=-1))
+        for start, end in zip(starts.tolist(), np.append(starts[1:], len(rows)).tolist()):
+            picked = order[start:end]
+            result[picked] = self.pages[int(page_of[picked[0]])][rows[picked] & (PAGE_SIZE - 1)]
+        return result
+
+    def to_numpy(self):
+        """The whole array, concatenated once per version on first use"""
+        if self._dense is None:
+            self._dense = np.concatenate(self.pages)[:self.length]
+        return self._dense
+
+    def writer(self):
+        return PageWriter(self)
+
+
+class PageWriter:
+    """Copy-on-write edits to a PagedArray; freeze() returns the new version"""
+
+    def __init__(self, array):
+        self.length = array.length
+        self.pages = list(array.pages)
+        self.copied = set()
+
+    def _page(self, p):
+        if p not in self.copied:
+            self.pages[p] = self.pages[p].copy()
+            self.copied.add(p)
+        return self.pages[p]
+
+    def __setitem__(self, i, value):
+        self._page(i >> PAGE_SHIFT)[i & (PAGE_SIZE - 1)] = value
+
+    def fill(self, start, end, value):
+        """Set entries start..end-1 to value"""
+        while start < end:
+            p = start >> PAGE_SHIFT
+            stop = min(end, (p + 1) << PAGE_SHIFT)
+            self._page(p)[start & (PAGE_SIZE - 1):stop - (p << PAGE_SHIFT)] = value
+            start = stop
+
+    def freeze(self):
+        return PagedArray(self.pages, self.length)
+
+
+def read_feed(source):
+    """Yield update entities from a stream of JSON lines
+
+    source is a file path, a text file object or a connected socket (standing in for a
+    GTFS-realtime endpoint). Each line is one FeedEntity-like dict, or a FeedMessage-like
+    dict whose "entity" list is unpacked:
+
+        {"id": "1", "trip_update": {"trip": {"trip_id": "100E-1-1"},
+                                    "stop_time_update": [{"stop_sequence": 3, "arrival": {"delay": 120}}]}}
+        {"id": "2", "trip_update": {"trip": {"trip_id": "100E-1-2", "schedule_relationship": "CANCELED"}}}
+        {"id": "3", "vehicle": {"trip": {"trip_id": "100E-1-3"},
+                                "position": {"latitude": 12.97, "longitude": 77.59}, "timestamp": 1700000000}}
+    """
+    if isinstance(source, socket.socket):
+        with source.makefile('r', encoding='utf-8') as stream:
+            yield from read_feed(stream)
+        return
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding='utf-8') as stream:
+            yield from read_feed(stream)
+        return
+    for line in source:
+        line = line.strip()
+        if not line:
+            continue
+        message = json.loads(line)
+        if 'entity' in message:
+            yield from message['entity']
+        else:
+            yield message
+
+
+class RealtimeState:
+    """Live delays, cancellations and vehicle fixes on top of a static Timetable
+
+    apply() takes a batch of entities, writes only the rows of the trips mentioned (copying
+    just the pages they fall in) and publishes the result as a new RealtimeSnapshot in a
+    single assignment. Readers take self.snapshot once per query and never see a
+    half-applied batch.
+    """
+
+    def __init__(self, timetable, compiled=None):
+        self.timetable = timetable
+        self.trip_offsets = np.asarray(timetable.trip_offsets).tolist()
+        self.st_sequence = np.asarray(timetable.st_sequence)
+        self.st_stop = np.asarray(timetable.st_stop)
+        self.scheduled_arrival = np.asarray(timetable.st_arrival, dtype=np.int64)
+        self.scheduled_departure = np.asarray(timetable.st_departure, dtype=np.int64)
+        self.hop_edge = hop_edges(timetable, compiled)
+        num_trips = timetable.num_trips
+        self.snapshot = RealtimeSnapshot(
+            0, PagedArray.full(len(self.st_sequence), 0, np.int32), PagedArray.full(num_trips, False, bool),
+            PagedArray.full(num_trips, np.nan, np.float64), PagedArray.full(num_trips, np.nan, np.float64),
+            PagedArray.full(num_trips, np.nan, np.float64), 0, 0)
+        self.unknown_trips = 0
+        self.unmatched_stops = 0  # stop_time_updates naming no stop of their trip
+        self._lock = threading.Lock()  # one writer at a time; readers never lock
+
+    def apply(self, entities):
+        """Apply a batch of entities and publish a new snapshot
+
+        Returns (edges, ratios): the graph edges whose hop times changed in this batch and
+        the observed / scheduled time of each, ready for TrafficModel.observe.
+        """
+        offsets = self.trip_offsets
+        with self._lock:
+            current = self.snapshot
+            delays = current.delays.writer()
+            cancelled = current.cancelled.writer()
+            vehicle = [current.vehicle_lat.writer(), current.vehicle_lon.writer(), current.vehicle_time.writer()]
+            early, late = current.early, current.late
+            changed = {}  # trip -> first row whose delay changed
+
+            for entity in entities:
+                fix = entity.get('vehicle')
+                if fix is not None:
+                    trip = self._trip(fix)
+                    if trip is not None:
+                        position = fix.get('position', {})
+                        vehicle[0][trip] = position.get('latitude', np.nan)
+                        vehicle[1][trip] = position.get('longitude', np.nan)
+                        vehicle[2][trip] = fix.get('timestamp', np.nan)
+
+                update = entity.get('trip_update')
+                trip = self._trip(update) if update is not None else None
+                if trip is None:
+                    continue
+                cancelled[trip] = update['trip'].get('schedule_relationship') == 'CANCELED'
+                start, end = offsets[trip], offsets[trip + 1]
+                updates = []
+                for stop_update in update.get('stop_time_update', ()):
+                    event = stop_update.get('departure') or stop_update.get('arrival') or {}
+                    if event.get('delay') is None:
+                        continue
+                    row = self._stop_row(start, end, stop_update)
+                    if row is None:
+                        self.unmatched_stops += 1
+                    elif row < end:
+                        updates.append((row, int(event['delay'])))
+                # The delay holds for this stop and every later one until the next update
+                for row, delay in sorted(updates):
+                    delays.fill(row, end, delay)
+                    early, late = max(early, -delay), max(late, delay)
+                    changed[trip] = min(changed.get(trip, row), row)
+
+            delays = delays.freeze()
+            self.snapshot = RealtimeSnapshot(current.version + 1, delays, cancelled.freeze(),
+                                             *(column.freeze() for column in vehicle), early, late)
+        return self._hop_ratios(changed, delays)
+
+    def _trip(self, update):
+        """Trip index named by an update's trip descriptor, or None (counted) when unknown"""
+        trip = self.timetable.trip_index.get(str(update.get('trip', {}).get('trip_id')))
+        if trip is None:
+            self.unknown_trips += 1
+        return trip
+
+    def _stop_row(self, start, end, stop_update):
+        """Stop time row (start..end, one trip) a stop_time_update refers to, or None
+
+        stop_sequence wins when present (a sequence between two stops maps to the later
+        one); otherwise the first visit to stop_id is used.
+        """
+        if stop_update.get('stop_sequence') is not None:
+            return start + int(np.searchsorted(self.st_sequence[start:end], stop_update['stop_sequence']))
+        stop = self.timetable.stop_index.get(str(stop_update.get('stop_id')))
+        if stop is None:
+            return None
+        rows = np.flatnonzero(self.st_stop[start:end] == stop)
+        return start + int(rows[0]) if len(rows) else None
+
+    def _hop_ratios(self, changed, delays):
+        """Observed / scheduled time of the hops into and after each trip's first changed row"""
+        if not changed:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        offsets = self.trip_offsets
+        rows = np.concatenate([np.arange(max(first - 1, offsets[trip]), offsets[trip + 1] - 1)
+                               for trip, first in changed.items()]).astype(np.int64)
+        edges = self.hop_edge[rows]
+        scheduled = self.scheduled_arrival[rows + 1] - self.scheduled_departure[rows]
+        keep = (edges >= 0) & (scheduled > 0)
+        rows, edges, scheduled = rows[keep], edges[keep], scheduled[keep]
+        observed = scheduled + delays.take(rows + 1).astype(np.int64) - delays.take(rows)
+        return edges, np.clip(observed / scheduled, MIN_RATIO, MAX_RATIO)
+
+
+class RealtimeIngestor:
+    """Feeds a realtime stream into a planner in batches, without rebuilding its state
+
+    Each batch updates the RealtimeState and blends the affected edges' observed hop
+    times into the planner's traffic multipliers, which the planner then swaps in as one
+    new traffic snapshot. The state is attached as planner.realtime, so departure boards,
+    vehicle positions and timetable journeys see the delays and cancellations.
+    """
+
+    def __init__(self, planner, batch_size=500):
+        if planner.timetable is None:
+            raise ValueError("realtime updates need a timetable (pass timetable= to the planner)")
+        self.planner = planner
+        self.state = RealtimeState(planner.timetable, planner.compiled)
+        planner.realtime = self.state
+        self.batch_size = batch_size
+        self.processed = 0
+        self._thread = None
+
+    def ingest(self, entities):
+        """Apply entities batch by batch; returns how many were read"""
+        batch = []
+        read = 0
+        for entity in entities:
+            batch.append(entity)
+            if len(batch) >= self.batch_size:
+                read += self._apply(batch)
+                batch = []
+        if batch:
+            read += self._apply(batch)
+        return read
+
+    def _apply(self, batch):
+        edges, ratios = self.state.apply(batch)
+        if len(edges):
+            self.planner.apply_traffic_observations(edges, ratios)
+        self.processed += len(batch)
+        return len(batch)
+
+    def run(self, source):
+        """Ingest a whole feed (see read_feed for the accepted sources)"""
+        return self.ingest(read_feed(source))
+
+    def start(self, source):
+        """Ingest source on a daemon thread while queries keep running; returns the thread"""
+        self._thread = threading.Thread(target=self.run, args=(source,), daemon=True)
+        self._thread.start()
+        return self._thread
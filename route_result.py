@@ -0,0 +1,56 @@
+from collections.abc import Mapping
+
+from route_cache import freeze
+
+# Key order of the result dicts calculate_path has always returned
+RESULT_KEYS = ('path', 'coordinates', 'time', 'distance', 'fare', 'steps', 'transfers',
+               'route_segments', 'traffic_conditions')
+
+
+class RouteResult(Mapping):
+    """Read-only route result whose display fields are built on first access
+
+    Numeric fields are stored up front; fields such as steps, route_segments and
+    coordinates are given as zero-argument callables and only materialised (then
+    kept) when somebody reads them. Behaves like the result dict for indexing,
+    .get(), iteration and dict(result); values come back as read-only containers.
+    """
+
+    def __init__(self, fields, lazy=None):
+        self._fields = {key: freeze(value) for key, value in fields.items()}
+        self._lazy = dict(lazy or {})
+        known = set(self._fields) | set(self._lazy)
+        self._keys = [key for key in RESULT_KEYS if key in known] + \
+                     [key for key in list(self._fields) + list(self._lazy) if key not in RESULT_KEYS]
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            return self._fields[key]
+        build = self._lazy.get(key)
+        if build is None:
+            raise KeyError(key)
+        # Concurrent readers may both build the value; the first one stored wins
+        return self._fields.setdefault(key, freeze(build()))
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        pending = [key for key in self._keys if key not in self._fields]
+        shown = ', '.join(f"{key!r}: {self._fields[key]!r}" for key in self._keys if key in self._fields)
+        return f"RouteResult({{{shown}}}, pending={pending})"
+
+    def is_materialized(self, key):
+        """True once key's value has been built (always true for eager fields)"""
+        return key in self._fields
+
+    def replace(self, lazy=None, **fields):
+        """New result with some fields overridden; lazy maps keys to builders as in __init__"""
+        eager = {key: value for key, value in self._fields.items() if key not in (lazy or {})}
+        eager.update(fields)
+        pending = {key: build for key, build in self._lazy.items() if key not in eager and key not in self._fields}
+        pending.update(lazy or {})
+        return RouteResult(eager, pending)
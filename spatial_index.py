@@ -0,0 +1,129 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 111.32  # length of one degree of latitude
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Vectorised great-circle distance in kilometres (same formula as haversine_distance)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+class SpatialIndex:
+    """Uniform lat/lon grid over stop coordinates for nearest-stop and radius queries
+
+    Stops are bucketed into square cells of roughly cell_km; a query gathers the cells
+    around the point ring by ring and ranks the candidates by exact haversine distance.
+    """
+
+    def __init__(self, coords, cell_km=0.5):
+        """coords maps stop name -> (lat, lon)"""
+        self.names = list(coords)
+        self.lats = np.array([coords[name][0] for name in self.names], dtype=np.float64)
+        self.lons = np.array([coords[name][1] for name in self.names], dtype=np.float64)
+        self.cell_km = cell_km
+
+        mean_lat = float(self.lats.mean()) if len(self.names) else 0.0
+        self.lat_step = cell_km / KM_PER_DEGREE
+        self.lon_step = cell_km / (KM_PER_DEGREE * max(math.cos(math.radians(mean_lat)), 1e-6))
+
+        # Sort stops by cell so every cell is one contiguous slice of self.order
+        rows = np.floor(self.lats / self.lat_step).astype(np.int64)
+        cols = np.floor(self.lons / self.lon_step).astype(np.int64)
+        self.order = np.lexsort((cols, rows))
+        self.cells = {}
+        keys = list(zip(rows[self.order].tolist(), cols[self.order].tolist()))
+        start = 0
+        for i in range(1, len(keys) + 1):
+            if i == len(keys) or keys[i] != keys[start]:
+                self.cells[keys[start]] = (start, i)
+                start = i
+        if self.cells:
+            all_rows = [row for row, _ in self.cells]
+            all_cols = [col for _, col in self.cells]
+            self._extent = (min(all_rows), max(all_rows), min(all_cols), max(all_cols))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.lat_step), math.floor(lon / self.lon_step)
+
+    def _ring(self, row, col, radius):
+        """Stop positions (into self.order) in the cells exactly radius rings from (row, col)"""
+        min_row, max_row, min_col, max_col = self._extent
+        picked = []
+        # Only cells inside the grid's extent can hold stops
+        for r in range(max(row - radius, min_row), min(row + radius, max_row) + 1):
+            if abs(r - row) == radius:
+                columns = range(max(col - radius, min_col), min(col + radius, max_col) + 1)
+            else:
+                columns = [c for c in (col - radius, col + radius) if min_col <= c <= max_col]
+            for c in columns:
+                span = self.cells.get((r, c))
+                if span is not None:
+                    picked.extend(range(*span))
+        return picked
+
+    def _min_ring(self, row, col):
+        """First ring that reaches the grid's extent (0 when the point lies inside it)"""
+        min_row, max_row, min_col, max_col = self._extent
+        return max(0, min_row - row, row - max_row, min_col - col, col - max_col)
+
+    def _max_ring(self, row, col):
+        """Ring count beyond which no cell holds any stop"""
+        min_row, max_row, min_col, max_col = self._extent
+        return max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+
+    def _ranked(self, lat, lon, positions):
+        ids = self.order[np.array(positions, dtype=np.int64)]
+        distances = haversine_km(lat, lon, self.lats[ids], self.lons[ids])
+        ranking = np.argsort(distances, kind='stable')
+        return ids[ranking], distances[ranking]
+
+    def nearest(self, lat, lon, k=5):
+        """The k stops closest to (lat, lon) as [(name, distance_km)], nearest first"""
+        if not self.cells or k <= 0:
+            return []
+        row, col = self._cell(lat, lon)
+        last = self._max_ring(row, col)
+        positions = []
+        kth = float('inf')  # k-th nearest distance so far; only shrinks as rings are added
+        radius = self._min_ring(row, col)
+        while radius <= last:
+            positions.extend(self._ring(row, col, radius))
+            # Anything outside the searched rings is at least radius cells away, so the
+            # answer is final once the k-th candidate is closer than that
+            bound = radius * self.cell_km * 0.99
+            if len(positions) >= k and (kth == float('inf') or kth <= bound):
+                _, distances = self._ranked(lat, lon, positions)
+                kth = distances[k - 1]
+                if kth <= bound:
+                    break
+            radius += 1
+        if not positions:
+            return []
+        ids, distances = self._ranked(lat, lon, positions)
+        return [(self.names[i], float(d)) for i, d in zip(ids[:k].tolist(), distances[:k].tolist())]
+
+    def within(self, lat, lon, radius_km):
+        """All stops within radius_km of (lat, lon) as [(name, distance_km)], nearest first"""
+        if not self.cells:
+            return []
+        row, col = self._cell(lat, lon)
+        rings = min(int(math.ceil(radius_km / (self.cell_km * 0.99))) + 1, self._max_ring(row, col))
+        positions = []
+        for radius in range(self._min_ring(row, col), rings + 1):
+            positions.extend(self._ring(row, col, radius))
+        if not positions:
+            return []
+        ids, distances = self._ranked(lat, lon, positions)
+        keep = distances <= radius_km
+        return [(self.names[i], float(d)) for i, d in zip(ids[keep].tolist(), distances[keep].tolist())]
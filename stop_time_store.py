@@ -0,0 +1,174 @@
+import json
+import operator
+import os
+import shutil
+from collections import namedtuple
+
+import numpy as np
+
+from timetable import Timetable
+from transit_network import csv_signature
+
+STORE_FORMAT_VERSION = 1
+TIMETABLE_FILES = ('stops.csv', 'trips.csv', 'stop_times.csv')
+
+# Parallel column slices returned by the accessors (views into the mapped files where possible)
+StopTimes = namedtuple('StopTimes', ['trip', 'stop', 'arrival', 'departure', 'sequence'])
+
+# Column name -> dtype of every array file in a store
+COLUMNS = {
+    # Stop and trip tables: the interned ID of a stop or trip is its position here
+    'stop_ids': str,
+    'stop_names': str,
+    'stop_lat': np.float64,
+    'stop_lon': np.float64,
+    'trip_ids': str,          # sorted, so a trip ID is found by binary search
+    'trip_route': str,
+    # Stop times grouped by trip: trip_offsets[t]:trip_offsets[t + 1] are trip t's rows
+    'trip_offsets': np.int64,
+    'st_trip': np.int32,
+    'st_stop': np.int32,
+    'st_arrival': np.int32,   # seconds since midnight of the service day
+    'st_departure': np.int32,
+    'st_sequence': np.uint16,
+    # The same rows grouped by stop and sorted by departure: stop_offsets[s]:stop_offsets[s + 1]
+    'stop_id_order': np.int32,
+    'stop_offsets': np.int64,
+    'stop_rows': np.int32,
+    'stop_departure': np.int32,
+}
+
+
+class StopTimeStore:
+    """Read-only columnar stop_times on disk, one memory-mapped .npy file per column
+
+    Every process that opens the same store shares the page cache instead of holding its
+    own copy of the parsed CSV. Stop and trip IDs are interned to int32 indices, times are
+    int32 seconds and rows are grouped by trip, with a second by-stop ordering for
+    departure lookups.
+    """
+
+    def __init__(self, columns, directory=None):
+        self.directory = directory
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def build(cls, timetable, directory, signature=''):
+        """Write timetable's columns to directory (replacing any previous store) and open it"""
+        if len(timetable.st_sequence) and int(timetable.st_sequence.max()) > np.iinfo(np.uint16).max:
+            raise ValueError("stop_sequence values do not fit the store's uint16 column")
+        columns = timetable.to_arrays()
+
+        stop_ids = np.array(timetable.stop_ids, dtype=str)
+        columns['stop_id_order'] = np.argsort(stop_ids, kind='stable')
+
+        # Rows per stop ordered by departure time (then trip), for "departures at S after t"
+        stop_rows = np.lexsort((timetable.st_trip, timetable.st_departure, timetable.st_stop))
+        columns['stop_rows'] = stop_rows
+        columns['stop_departure'] = timetable.st_departure[stop_rows]
+        stop_offsets = np.zeros(timetable.num_stops + 1, dtype=np.int64)
+        np.cumsum(np.bincount(timetable.st_stop, minlength=timetable.num_stops), out=stop_offsets[1:])
+        columns['stop_offsets'] = stop_offsets
+
+        # Write next to the target and rename, so readers never see a half-written store
+        partial = f"{directory}.{os.getpid()}.tmp"
+        os.makedirs(partial)
+        for name, dtype in COLUMNS.items():
+            np.save(os.path.join(partial, f"{name}.npy"), np.asarray(columns[name], dtype=dtype))
+        with open(os.path.join(partial, 'manifest.json'), 'w') as f:
+            json.dump({'version': STORE_FORMAT_VERSION, 'signature': signature,
+                       'stop_times': len(timetable.st_stop)}, f)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(partial, directory)
+        return cls.open(directory)
+
+    @classmethod
+    def open(cls, directory, signature=None):
+        """Map a store read-only; raises ValueError on a format or (when given) signature mismatch"""
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['version'] != STORE_FORMAT_VERSION:
+            raise ValueError(f"{directory}: unsupported stop time store format {manifest['version']}")
+        if signature is not None and manifest['signature'] != signature:
+            raise ValueError(f"{directory}: stop time store was built from different CSV files")
+        columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in COLUMNS}
+        return cls(columns, directory)
+
+    @classmethod
+    def load_or_build(cls, directory='.', path=None):
+        """Open the store at path when it matches the CSVs in directory, otherwise rebuild it from them
+
+        path defaults to gtfs.store inside directory.
+        """
+        path = os.path.join(directory, 'gtfs.store') if path is None else path
+        signature = csv_signature([os.path.join(directory, name) for name in TIMETABLE_FILES])
+        if os.path.isdir(path):
+            try:
+                return cls.open(path, signature)
+            except (ValueError, KeyError, OSError):
+                pass  # stale or unreadable store: rebuild it below
+        timetable = Timetable.from_csv(*(os.path.join(directory, name) for name in TIMETABLE_FILES))
+        return cls.build(timetable, path, signature)
+
+    @property
+    def num_stops(self):
+        return len(self.stop_ids)
+
+    @property
+    def num_trips(self):
+        return len(self.trip_ids)
+
+    @property
+    def num_stop_times(self):
+        return len(self.st_stop)
+
+    def trip_index(self, trip_id):
+        """Interned index of a GTFS trip_id (binary search over the sorted trip table)"""
+        i = int(np.searchsorted(self.trip_ids, trip_id))
+        if i == len(self.trip_ids) or self.trip_ids[i] != trip_id:
+            raise KeyError(trip_id)
+        return i
+
+    def stop_index(self, stop_id):
+        """Interned index of a GTFS stop_id"""
+        order = self.stop_id_order
+        i = int(np.searchsorted(self.stop_ids, str(stop_id), sorter=order))
+        if i == len(order) or self.stop_ids[order[i]] != str(stop_id):
+            raise KeyError(stop_id)
+        return int(order[i])
+
+    def trip_stop_times(self, trip):
+        """Stop times of a trip (interned index) in stop_sequence order, as views"""
+        trip = operator.index(trip)
+        start, end = int(self.trip_offsets[trip]), int(self.trip_offsets[trip + 1])
+        return StopTimes(self.st_trip[start:end], self.st_stop[start:end], self.st_arrival[start:end],
+                         self.st_departure[start:end], self.st_sequence[start:end])
+
+    def trip_stop_times_by_id(self, trip_id):
+        """trip_stop_times for a GTFS trip_id"""
+        return self.trip_stop_times(self.trip_index(trip_id))
+
+    def departures(self, stop, after=0, limit=None):
+        """Stop times leaving a stop (interned index) at or after `after` seconds
+
+        Sorted by departure time; at most limit rows when given. GTFS stop_ids are often
+        numeric too, so they go through departures_by_id rather than being guessed at here.
+        """
+        stop = operator.index(stop)
+        start, end = int(self.stop_offsets[stop]), int(self.stop_offsets[stop + 1])
+        first = start + int(np.searchsorted(self.stop_departure[start:end], after, side='left'))
+        if limit is not None:
+            end = min(end, first + limit)
+        rows = self.stop_rows[first:end]
+        return StopTimes(self.st_trip[rows], self.st_stop[rows], self.st_arrival[rows],
+                         self.st_departure[rows], self.st_sequence[rows])
+
+    def departures_by_id(self, stop_id, after=0, limit=None):
+        """departures for a GTFS stop_id (numeric or not)"""
+        return self.departures(self.stop_index(stop_id), after, limit)
+
+    def timetable(self):
+        """A Timetable whose stop time columns are the mapped arrays (ID tables are loaded into lists)"""
+        return Timetable.from_arrays({name: getattr(self, name) for name in Timetable.ARRAY_FIELDS})
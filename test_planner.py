@@ -1,26 +1,29 @@
-import pandas as pd
-import numpy as np
 import networkx as nx
 import random
 import time
 import datetime
 from math import radians, sin, cos, sqrt, atan2
 
-# Load route data
-routes = pd.read_csv("routes.csv")
-stops = pd.read_csv("stops.csv")
+from compiled_graph import CompiledGraph
+from connection_scan import ConnectionScan
+from connectivity import (ConnectivityIndex, NoRoute, NO_JOURNEY, NO_PATH_FOUND, UNKNOWN_DESTINATION,
+                          UNKNOWN_ORIGIN)
+from landmarks import LandmarkIndex
+from name_index import NameIndex
+from raptor_router import RaptorRouter
+from timetable import parse_time
+from transit_network import TransitNetwork
 
-# Extract start and end points
-routes['start_point'] = routes['route_long_name'].str.split(' - ').str[0]
-routes['end_point'] = routes['route_long_name'].str.split(' - ').str[-1]
+# Load routes, stops and the timetable (stops.csv, trips.csv, stop_times.csv), reusing the
+# binary snapshot of a previous run while the CSVs are unchanged
+network = TransitNetwork.load_or_build()
+timetable = network.timetable
 
-# Create a station coordinates dictionary
-station_coords = {}
+# Create a station coordinates dictionary from stops.csv
+station_coords = network.station_coords()
 
-# Extract coordinates from stops.csv
-for _, row in stops.iterrows():
-    if pd.notna(row['stop_lat']) and pd.notna(row['stop_lon']):
-        station_coords[row['stop_name']] = (float(row['stop_lat']), float(row['stop_lon']))
+# Name index over the known stops, so lookups don't scan every station
+coords_index = NameIndex(station_coords)
 
 # For stations without coordinates, use approximation
 def get_coordinates(station_name):
@@ -29,17 +32,18 @@ def get_coordinates(station_name):
         return station_coords[station_name]
     
     # Try to find a similar station name
-    for known_station in station_coords:
-        if station_name.lower() in known_station.lower() or known_station.lower() in station_name.lower():
-            return station_coords[known_station]
+    known_station = coords_index.containing(station_name)
+    if known_station is not None:
+        return station_coords[known_station]
     
     # If not found, use Bengaluru center coordinates with a small random offset
     bengaluru_center = (12.9716, 77.5946)
     random_offset = (random.uniform(-0.05, 0.05), random.uniform(-0.05, 0.05))
     coords = (bengaluru_center[0] + random_offset[0], bengaluru_center[1] + random_offset[1])
     
-    # Cache the result
+    # Cache the result (and match it in later lookups, like the known stations)
     station_coords[station_name] = coords
+    coords_index.add(station_name)
     return coords
 
 # Calculate distances between stations
@@ -80,148 +84,245 @@ def calculate_fare(distance_km, route_type):
     return round(fare)
 
 # Create directed multi-graph for detailed route analysis
-G_multi = nx.MultiDiGraph()
-route_speeds = {'Standard': 20, 'Express': 30, 'Premium': 25}  # km/h (hypothetical)
-
-for _, row in routes.iterrows():
-    nodes = row['route_long_name'].split(' - ')
-    for i in range(len(nodes)-1):
-        G_multi.add_edge(nodes[i].strip(), nodes[i+1].strip(),
-                  route_id=row['route_id'],
-                  type=row['route_type'],
-                  speed=route_speeds.get(row['route_short_name'][:2], 20),
-                  time=60 * (1/route_speeds.get(row['route_short_name'][:2], 20)))  # Convert to minutes
+G_multi = network.build_graph()
 
 class TransitPlanner:
-    def __init__(self, graph):
+    def __init__(self, graph, backend='compiled', timetable=None):
         self.G = graph
+        self.backend = backend  # 'compiled' (CSR arrays), 'alt' (landmark A*) or 'networkx'
+        self.compiled = CompiledGraph(graph)
+        self.name_index = NameIndex(self.compiled.nodes)  # Fuzzy stop-name lookup
+        self.connectivity = ConnectivityIndex(self.compiled)  # SCC/WCC labels per stop ID
+        self.timetable = timetable
+        self.raptor = RaptorRouter(timetable) if timetable is not None else None
+        self.connection_scan = ConnectionScan(timetable) if timetable is not None else None
+        self.max_transfers = 3
         self.transfer_penalty = 10  # minutes
+        self.edge_distances = self._compute_edge_distances()
         self.major_hubs = self._identify_major_hubs()
+        self._hub_trees = {}
+        # Landmark distance arrays for the ALT backend, using the major hubs as landmarks
+        self.landmarks = LandmarkIndex.from_hubs(self.compiled, self.major_hubs) if backend == 'alt' else None
+        
+    def _compute_edge_distances(self):
+        """Great-circle length (km) of every CSR edge between known stops, None for the rest
         
+        Stops without coordinates are left to get_coordinates at query time, which matches
+        them by name or caches a random stand-in in the order queries reach them.
+        """
+        compiled = self.compiled
+        coords = [station_coords.get(node) for node in compiled.nodes]
+        distances = []
+        for u in range(compiled.num_nodes):
+            for e in range(compiled._offsets[u], compiled._offsets[u + 1]):
+                u_coords, v_coords = coords[u], coords[compiled._targets[e]]
+                distances.append(None if u_coords is None or v_coords is None else
+                                 haversine_distance(u_coords[0], u_coords[1], v_coords[0], v_coords[1]))
+        return distances
+    
     def _identify_major_hubs(self, top_n=20):
         """Identify the major transit hubs based on degree centrality"""
         # Calculate degree for each node
         degree_dict = dict(self.G.degree())
         # Sort nodes by degree and take top N
         return sorted(degree_dict.items(), key=lambda x: x[1], reverse=True)[:top_n]
+    
+    def _shortest_path(self, source, target):
+        """Shortest path by travel time using the configured search backend"""
+        if self.backend == 'networkx':
+            return nx.shortest_path(self.G, source, target, weight='time')
+        if self.backend == 'alt':
+            return self.landmarks.shortest_path(source, target)
+        return self.compiled.shortest_path(source, target)
+    
+    def _shortest_path_tree(self, root, reverse=False):
+        """Shortest paths from root to every node (or from every node to root with reverse=True)"""
+        if self.backend == 'networkx':
+            if not reverse:
+                return nx.single_source_dijkstra_path(self.G, root, weight='time')
+            paths = nx.single_source_dijkstra_path(self.G.reverse(copy=False), root, weight='time')
+            return {node: path[::-1] for node, path in paths.items()}
+        return self.compiled.shortest_path_tree(root, reverse=reverse)
+    
+    def _hub_tree(self, hub):
+        """Cached shortest-path tree from a major hub, shared by all two-hub queries"""
+        if hub not in self._hub_trees:
+            self._hub_trees[hub] = self._shortest_path_tree(hub)
+        return self._hub_trees[hub]
         
-    def calculate_path(self, origin, destination):
+    def calculate_path(self, origin, destination, departure_time=None):
         """Find the optimal path between origin and destination"""
+        # With a departure time, answer from the timetable instead of the static graph
+        if departure_time is not None:
+            return self._calculate_timetable_path(origin, destination, departure_time)
+        
+        # Reject pairs the connectivity index proves unreachable before any search
+        if origin in self.compiled.node_index and destination in self.compiled.node_index:
+            rejection = self.connectivity.check(origin, destination)
+            if rejection is not None:
+                return rejection
+        
         # First try direct path
         try:
             return self._calculate_direct_path(origin, destination)
-        except (nx.NetworkXNoPath, nx.NetworkXError, KeyError, ValueError, IndexError) as e:
+        except (nx.NetworkXNoPath, nx.NodeNotFound, nx.NetworkXError, KeyError, ValueError, IndexError) as e:
             print(f"Direct path failed: {e}")
             # If direct path fails, try to find a path with transfers
             return self._calculate_path_with_transfers(origin, destination)
     
     def _calculate_direct_path(self, origin, destination):
         """Calculate a direct path between origin and destination"""
-        path = nx.shortest_path(self.G, origin, destination, weight='time')
+        path = self._shortest_path(origin, destination)
         return self._process_path(path)
     
+    def calculate_profile(self, origin, destination, window_start, window_end):
+        """Find every Pareto-optimal journey (departure vs arrival) leaving within a time window"""
+        if self.connection_scan is None:
+            raise ValueError("profile queries need a timetable (pass timetable= to the planner)")
+        
+        sources = self.timetable.stops_for_name(origin)
+        targets = self.timetable.stops_for_name(destination)
+        if not sources or not targets:
+            return []
+        
+        start = parse_time(window_start)
+        end = parse_time(window_end)
+        route_types = dict(zip(self.compiled.route_ids, self.compiled.route_types))
+        journeys = self.connection_scan.profile(sources, targets, start, end)
+        return [self.timetable.journey_to_result(legs, legs[0]['departure'], calculate_fare, route_types)
+                for legs in journeys]
+    
+    def _calculate_timetable_path(self, origin, destination, departure_time):
+        """Earliest-arrival journey from the timetable using RAPTOR"""
+        if self.raptor is None:
+            raise ValueError("departure_time queries need a timetable (pass timetable= to the planner)")
+        
+        sources = self.timetable.stops_for_name(origin)
+        targets = self.timetable.stops_for_name(destination)
+        if not sources:
+            return NoRoute(origin, destination, UNKNOWN_ORIGIN, f"Origin {origin} has no timetable stops")
+        if not targets:
+            return NoRoute(origin, destination, UNKNOWN_DESTINATION, f"Destination {destination} has no timetable stops")
+        
+        departure = parse_time(departure_time)
+        legs = self.raptor.earliest_arrival(sources, targets, departure, self.max_transfers)
+        if not legs:
+            return NoRoute(origin, destination, NO_JOURNEY,
+                           f"No journey from {origin} to {destination} departing at {departure_time} "
+                           f"with at most {self.max_transfers} transfers")
+        
+        route_types = dict(zip(self.compiled.route_ids, self.compiled.route_types))
+        return self.timetable.journey_to_result(legs, departure, calculate_fare, route_types)
+    
     def _calculate_path_with_transfers(self, origin, destination):
         """Find a path that may require transfers between different routes"""
-        # Try to find intermediate points that can connect origin and destination
-        all_nodes = list(self.G.nodes())
-        
         # First check if origin and destination are in the graph
-        if origin not in all_nodes or destination not in all_nodes:
-            print(f"Origin or destination not in graph. Origin: {origin in all_nodes}, Destination: {destination in all_nodes}")
+        node_index = self.compiled.node_index
+        if origin not in node_index or destination not in node_index:
+            print(f"Origin or destination not in graph. Origin: {origin in node_index}, Destination: {destination in node_index}")
             # Try to find closest nodes by name similarity
-            if origin not in all_nodes:
-                closest = self._find_closest_node(origin, all_nodes)
+            if origin not in node_index:
+                closest = self._find_closest_node(origin)
                 if closest:
                     print(f"Found closest match for origin: {closest}")
                     origin = closest
                 else:
                     print(f"No close match found for origin: {origin}")
-            if destination not in all_nodes:
-                closest = self._find_closest_node(destination, all_nodes)
+            if destination not in node_index:
+                closest = self._find_closest_node(destination)
                 if closest:
                     print(f"Found closest match for destination: {closest}")
                     destination = closest
                 else:
                     print(f"No close match found for destination: {destination}")
         
-        # If we still don't have valid nodes, return None
-        if origin not in all_nodes or destination not in all_nodes:
-            print("Still no valid nodes after trying to find closest matches")
-            return None
+        # Unknown names and provably unreachable pairs end here without any search
+        rejection = self.connectivity.check(origin, destination)
+        if rejection is not None:
+            return rejection
+        
+        # One shortest-path tree from the origin and one reverse tree into the destination
+        # score every intermediate candidate without running a search per candidate
+        forward = self._shortest_path_tree(origin)
+        backward = self._shortest_path_tree(destination, reverse=True)
         
-        # Find all possible paths through major hubs
+        # Collect candidate paths through major hubs; only the winner is turned into a full result
         possible_paths = []
         
         # Try paths through major hubs
         for hub, _ in self.major_hubs:
             if hub != origin and hub != destination:
-                try:
-                    # Check if there's a path from origin to hub
-                    path1 = nx.shortest_path(self.G, origin, hub, weight='time')
-                    # Check if there's a path from hub to destination
-                    path2 = nx.shortest_path(self.G, hub, destination, weight='time')
-                    
-                    # Combine the paths (remove duplicate hub node)
-                    combined_path = path1 + path2[1:]
-                    path_info = self._process_path(combined_path)
-                    possible_paths.append(path_info)
-                    print(f"Found path through hub {hub}")
-                except (nx.NetworkXNoPath, nx.NetworkXError, KeyError, ValueError, IndexError) as e:
-                    print(f"Path through hub {hub} failed: {e}")
+                if hub not in forward or hub not in backward:
+                    print(f"Path through hub {hub} failed: No path between {origin} and {destination} via {hub}.")
                     continue
+                # Combine the paths (remove duplicate hub node)
+                possible_paths.append(forward[hub] + backward[hub][1:])
+                print(f"Found path through hub {hub}")
         
         # Try two-hub transfers if no paths found yet
         if not possible_paths:
             print("No single-hub paths found, trying two-hub paths")
             for hub1, _ in self.major_hubs[:10]:  # Limit to top 10 hubs for performance
-                if hub1 != origin and hub1 != destination:
+                if hub1 != origin and hub1 != destination and hub1 in forward:
+                    hub_tree = self._hub_tree(hub1)
                     for hub2, _ in self.major_hubs[:10]:  # Limit to top 10 hubs for performance
-                        if hub2 != origin and hub2 != destination and hub2 != hub1:
-                            try:
-                                # Check paths between all segments
-                                path1 = nx.shortest_path(self.G, origin, hub1, weight='time')
-                                path2 = nx.shortest_path(self.G, hub1, hub2, weight='time')
-                                path3 = nx.shortest_path(self.G, hub2, destination, weight='time')
-                                
-                                # Combine the paths (remove duplicate hub nodes)
-                                combined_path = path1 + path2[1:] + path3[1:]
-                                path_info = self._process_path(combined_path)
-                                possible_paths.append(path_info)
-                                print(f"Found path through hubs {hub1} and {hub2}")
-                            except (nx.NetworkXNoPath, nx.NetworkXError, KeyError, ValueError, IndexError):
-                                continue
+                        if (hub2 != origin and hub2 != destination and hub2 != hub1
+                                and hub2 in hub_tree and hub2 in backward):
+                            # Combine the paths (remove duplicate hub nodes)
+                            possible_paths.append(forward[hub1] + hub_tree[hub2][1:] + backward[hub2][1:])
+                            print(f"Found path through hubs {hub1} and {hub2}")
         
         # If we found any paths, return the one with the shortest time
         if possible_paths:
             print(f"Found {len(possible_paths)} possible paths")
-            return min(possible_paths, key=lambda x: x['time'])
+            return self._process_path(self._best_path(possible_paths))
         
         # If all else fails, try a more exhaustive search with random intermediate nodes
         print("No hub paths found, trying random intermediate nodes")
-        random_nodes = random.sample(all_nodes, min(30, len(all_nodes)))
+        # Only nodes on some origin -> node -> destination route can help
+        candidates = self.connectivity.via_candidates(origin, destination)
+        random_nodes = random.sample(candidates, min(30, len(candidates)))
         
         for node in random_nodes:
-            if node != origin and node != destination:
-                try:
-                    path1 = nx.shortest_path(self.G, origin, node, weight='time')
-                    path2 = nx.shortest_path(self.G, node, destination, weight='time')
-                    combined_path = path1 + path2[1:]
-                    path_info = self._process_path(combined_path)
-                    possible_paths.append(path_info)
-                    print(f"Found path through random node {node}")
-                except (nx.NetworkXNoPath, nx.NetworkXError, KeyError, ValueError, IndexError):
-                    continue
+            if node != origin and node != destination and node in forward and node in backward:
+                possible_paths.append(forward[node] + backward[node][1:])
+                print(f"Found path through random node {node}")
         
         if possible_paths:
             print(f"Found {len(possible_paths)} possible paths through random nodes")
-            return min(possible_paths, key=lambda x: x['time'])
+            return self._process_path(self._best_path(possible_paths))
             
-        # If we still can't find a path, return None
+        # If we still can't find a path, report why
         print("No paths found at all")
-        return None
+        return NoRoute(origin, destination, NO_PATH_FOUND, f"No path found between {origin} and {destination}")
+    
+    def _score_path(self, path):
+        """Total time _process_path reports for path, from the compiled edge arrays"""
+        compiled = self.compiled
+        node_index = compiled.node_index
+        edge_index = compiled.edge_index
+        total_time = 0
+        current_route = None
+        for u, v in zip(path[:-1], path[1:]):
+            e = edge_index.get((node_index[u], node_index[v]), -1)
+            if e < 0:
+                continue  # _process_path skips hops without edge data too
+            # The compiled edge keeps the first of the fastest parallel routes, as _process_path picks
+            route_id = compiled.route_ids[compiled._edge_routes[e]]
+            if current_route is not None and route_id != current_route:
+                total_time += self.transfer_penalty
+            current_route = route_id
+            total_time += compiled._weights[e]
+        return total_time
+    
+    def _best_path(self, paths):
+        """The candidate path with the lowest time (the first one on ties)"""
+        return min(paths, key=self._score_path)
     
     def _process_path(self, path):
         """Process a path to extract steps, time, and transfers"""
+        compiled = self.compiled
+        node_index = compiled.node_index
         edges = list(zip(path[:-1], path[1:]))
         
         total_time = 0
@@ -235,19 +336,19 @@ class TransitPlanner:
         
         for (u, v) in edges:
             try:
-                edge_data = self.G.get_edge_data(u, v)
-                if edge_data:
-                    min_time = min([d['time'] for d in edge_data.values()])
-                    route_options = [d for d in edge_data.values() if d['time'] == min_time]
-                    route_data = route_options[0]
-                    route_id = route_data['route_id']
-                    
-                    # Get coordinates for distance calculation
-                    u_coords = get_coordinates(u)
-                    v_coords = get_coordinates(v)
+                e = compiled.edge_index.get((node_index.get(u, -1), node_index.get(v, -1)), -1)
+                if e >= 0:
+                    # The compiled edge keeps the first of the fastest parallel routes
+                    r = compiled._edge_routes[e]
+                    min_time = compiled._weights[e]
+                    route_id = compiled.route_ids[r]
                     
-                    # Calculate segment distance
-                    segment_dist = haversine_distance(u_coords[0], u_coords[1], v_coords[0], v_coords[1])
+                    # Precomputed segment distance, unless a stop lacks known coordinates
+                    segment_dist = self.edge_distances[e]
+                    if segment_dist is None:
+                        u_coords = get_coordinates(u)
+                        v_coords = get_coordinates(v)
+                        segment_dist = haversine_distance(u_coords[0], u_coords[1], v_coords[0], v_coords[1])
                     total_distance += segment_dist
                     
                     if route_id != current_route:
@@ -264,7 +365,7 @@ class TransitPlanner:
                             segment_distance = 0
                         
                         current_route = route_id
-                        route_type = route_data.get('type', '3')  # Default to regular bus if type not specified
+                        route_type = compiled.route_types[r]  # Regular bus ('3') if type not specified
                         steps.append(f"Take Route {route_id} from {u}")
                         route_segments.append({
                             'route_id': route_id,
@@ -320,35 +421,12 @@ class TransitPlanner:
             'route_segments': route_segments
         }
     
-    def _find_closest_node(self, query, nodes):
+    def _find_closest_node(self, query):
         """Find the closest node by name similarity"""
-        # Simple string similarity - return the node that contains the query string
-        matches = [node for node in nodes if query.lower() in node.lower()]
-        if matches:
-            return matches[0]
-        
-        # If no direct substring match, try to find nodes that share words
-        query_words = set(query.lower().split())
-        best_match = None
-        best_score = 0
-        
-        for node in nodes:
-            node_words = set(node.lower().split())
-            common_words = query_words.intersection(node_words)
-            score = len(common_words)
-            
-            if score > best_score:
-                best_score = score
-                best_match = node
-        
-        # Return the best match if we found one with at least one common word
-        if best_score > 0:
-            return best_match
-            
-        return None
+        return self.name_index.resolve(query)
 
 # Initialize the planner with the multi-graph that has time information
-planner = TransitPlanner(G_multi)
+planner = TransitPlanner(G_multi, timetable=timetable)
 
 # Print some basic information about the graph
 print(f"Graph has {len(G_multi.nodes())} nodes and {len(G_multi.edges())} edges")
@@ -0,0 +1,110 @@
+import os
+import random
+import sys
+
+import networkx as nx
+import pandas as pd
+
+# The planner modules live at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from timetable import Timetable, format_time  # noqa: E402
+
+INF = float('inf')
+
+
+def synthetic_timetable(seed=0, n_stations=16, n_routes=6, trips_per_route=12):
+    """Small timetable of multi-stop trips; every fourth station has two bays (a footpath)
+
+    Trips of one route share their hop times, so they never overtake each other.
+    """
+    rng = random.Random(seed)
+    stops = []
+    bays = {}
+    for s in range(n_stations):
+        name = f"Station {s}"
+        for bay in range(2 if s % 4 == 0 else 1):
+            stops.append((f"{s}-{bay}", name, 12.9 + 0.01 * s, 77.5 + 0.002 * bay))
+            bays.setdefault(name, []).append(f"{s}-{bay}")
+
+    trips = []
+    stop_times = []
+    for r in range(n_routes):
+        sequence = [rng.choice(bays[f"Station {s}"]) for s in rng.sample(range(n_stations), rng.randint(4, 7))]
+        hops = [rng.randint(2, 9) * 60 for _ in sequence[1:]]
+        first = 6 * 3600 + rng.randrange(0, 1800)
+        headway = rng.choice([600, 900, 1200])
+        for k in range(trips_per_route):
+            trip_id = f"R{r}-{k}"
+            trips.append((trip_id, f"R{r}"))
+            t = first + k * headway
+            for position, stop_id in enumerate(sequence):
+                if position:
+                    t += hops[position - 1]
+                # Half a minute at every stop but the last
+                departure = t + 30 if position < len(sequence) - 1 else t
+                stop_times.append((trip_id, stop_id, position + 1, format_time(t), format_time(departure)))
+                t = departure
+
+    return Timetable(
+        pd.DataFrame(stops, columns=['stop_id', 'stop_name', 'stop_lat', 'stop_lon']),
+        pd.DataFrame(trips, columns=['trip_id', 'route_id']),
+        pd.DataFrame(stop_times, columns=['trip_id', 'stop_id', 'stop_sequence', 'arrival_time', 'departure_time']))
+
+
+def timetable_graph(timetable):
+    """Station-name MultiDiGraph of a timetable's hops and the station coordinates, as the planner takes them"""
+    graph = nx.MultiDiGraph()
+    offsets = timetable.trip_offsets.tolist()
+    seen = set()
+    for trip in range(timetable.num_trips):
+        route_id = timetable.trip_route[trip]
+        for row in range(offsets[trip], offsets[trip + 1] - 1):
+            u = timetable.stop_names[timetable.st_stop[row]]
+            v = timetable.stop_names[timetable.st_stop[row + 1]]
+            if (u, v, route_id) not in seen:
+                seen.add((u, v, route_id))
+                minutes = (int(timetable.st_arrival[row + 1]) - int(timetable.st_departure[row])) / 60
+                graph.add_edge(u, v, route_id=route_id, type='3', time=minutes)
+    coords = {timetable.stop_names[s]: timetable.stop_coords(s) for s in range(timetable.num_stops)}
+    return graph, coords
+
+
+def brute_force_arrival(timetable, sources, targets, departure, transfer_time=120, delays=None, cancelled=None):
+    """Earliest arrival at any target by relaxing every trip and footpath until nothing improves
+
+    delays (seconds per stop time row) and cancelled (per trip) optionally apply realtime
+    changes. No transfer limit.
+    """
+    arrival = timetable.st_arrival.tolist()
+    departures = timetable.st_departure.tolist()
+    if delays is not None:
+        arrival = [a + int(d) for a, d in zip(arrival, delays)]
+        departures = [t + int(d) for t, d in zip(departures, delays)]
+    stops = timetable.st_stop.tolist()
+    offsets = timetable.trip_offsets.tolist()
+    footpaths = timetable.footpaths(transfer_time)
+    best = [INF] * timetable.num_stops
+    for s in sources:
+        best[s] = departure
+
+    changed = True
+    while changed:
+        changed = False
+        for s in range(timetable.num_stops):
+            for other, walk in footpaths[s]:
+                if best[s] + walk < best[other]:
+                    best[other] = best[s] + walk
+                    changed = True
+        for trip in range(timetable.num_trips):
+            if cancelled is not None and cancelled[trip]:
+                continue
+            boarded = False
+            for row in range(offsets[trip], offsets[trip + 1]):
+                stop = stops[row]
+                if boarded and arrival[row] < best[stop]:
+                    best[stop] = arrival[row]
+                    changed = True
+                boarded = boarded or best[stop] <= departures[row]
+    return min(best[t] for t in targets)
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from conftest import ROOT
+from name_index import NameIndex
+from transit_network import TransitNetwork
+
+
+def old_containing(station_name, station_coords):
+    """get_coordinates' original scan over every known station"""
+    for known_station in station_coords:
+        if station_name.lower() in known_station.lower() or known_station.lower() in station_name.lower():
+            return known_station
+    return None
+
+
+@pytest.fixture(scope='module')
+def network():
+    return TransitNetwork.from_csv(ROOT, with_timetable=False)
+
+
+def test_containing_known_name_inside_query(network):
+    index = NameIndex(network.station_coords())
+    assert index.containing('Vidyasagara Bus Stoop') == 'Agara'
+    assert index.containing('') == next(iter(network.station_coords()))
+
+
+def test_containing_matches_old_scan(network):
+    station_coords = network.station_coords()
+    index = NameIndex(station_coords)
+    rng = random.Random(5)
+    names = list(station_coords)
+    missing = [name for name in network.build_graph() if name not in station_coords]
+    queries = missing + ['', ' ', '--', 'a', 'MG', 'Agara.', 'xyzzy']
+    for _ in range(2000):
+        name = rng.choice(names + missing)
+        start = rng.randrange(len(name))
+        query = name[start:start + rng.randint(0, 15)]
+        if rng.random() < 0.3:
+            query = rng.choice(['Old ', 'x', '(', '']) + query + rng.choice([' Bus Stop', '', '.', ' 2'])
+        queries.append(query)
+
+    for query in queries:
+        if query in station_coords:
+            continue
+        expected = old_containing(query, station_coords)
+        assert index.containing(query) == expected, query
+        if expected is None:
+            # get_coordinates caches unknown names, and later lookups match them too
+            station_coords[query] = (0.0, 0.0)
+            index.add(query)
+
+
+def test_resolve_prefers_matches_at_word_starts(network):
+    index = NameIndex(list(network.build_graph()))
+    # Not Vijayanagar, which only contains the query inside a word
+    assert index.resolve('Jayanagar') == 'Jayanagara 9th Block'
+    # Whole-word matches keep the stop order rather than favouring the shortest name
+    assert index.resolve('Kempegowda') == 'Kempegowda Bus Station'
+    suggestions = [name for name, _, _ in index.suggest('Jayanagr', 5)]
+    assert 'Vijayanagar' not in suggestions
+    assert 'Jayanagara 9th Block' in suggestions
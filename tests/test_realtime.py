@@ -0,0 +1,156 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import INF, brute_force_arrival, synthetic_timetable, timetable_graph
+from enhanced_transit_planner import EnhancedTransitPlanner
+from fares import calculate_fare
+from planner_snapshot import build_snapshot
+from realtime_feed import PagedArray, RealtimeIngestor
+from timetable import format_time
+
+
+def trip_update(trip_id, delay=None, stop_sequence=1, cancelled=False):
+    """One GTFS-realtime style trip_update entity"""
+    trip = {'trip_id': trip_id}
+    if cancelled:
+        trip['schedule_relationship'] = 'CANCELED'
+    updates = [] if delay is None else [{'stop_sequence': stop_sequence, 'departure': {'delay': delay}}]
+    return {'trip_update': {'trip': trip, 'stop_time_update': updates}}
+
+
+@pytest.fixture
+def planner():
+    timetable = synthetic_timetable()
+    graph, coords = timetable_graph(timetable)
+    planner = EnhancedTransitPlanner(graph, coords, calculate_fare, timetable=timetable, cache_size=0)
+    planner.max_transfers = 20
+    return planner
+
+
+def test_paged_array_writes_leave_earlier_versions_intact():
+    original = PagedArray.full(5000, 0, np.int32)
+    writer = original.writer()
+    writer.fill(1000, 3000, 7)
+    writer[4999] = -1
+    updated = writer.freeze()
+    assert original.to_numpy().tolist() == [0] * 5000
+    expected = np.zeros(5000, dtype=np.int32)
+    expected[1000:3000] = 7
+    expected[4999] = -1
+    assert updated.to_numpy().tolist() == expected.tolist()
+    assert updated[999] == 0 and updated[1000] == 7
+    assert updated.take(np.array([0, 2999, 4999])).tolist() == [0, 7, -1]
+
+
+def test_journeys_match_brute_force_with_delays_and_cancellations(planner):
+    timetable = planner.timetable
+    ingestor = RealtimeIngestor(planner)
+    rng = random.Random(4)
+    delays = np.zeros(len(timetable.st_stop), dtype=np.int64)
+    cancelled = [False] * timetable.num_trips
+    entities = []
+    for trip, trip_id in enumerate(timetable.trip_ids):
+        if rng.random() < 0.1:
+            cancelled[trip] = True
+            entities.append(trip_update(trip_id, cancelled=True))
+        elif rng.random() < 0.4:
+            # Less than the shortest headway, so trips of a route never overtake each other
+            delay = rng.randrange(0, 540, 30)
+            delays[timetable.trip_offsets[trip]:timetable.trip_offsets[trip + 1]] = delay
+            entities.append(trip_update(trip_id, delay))
+    ingestor.ingest(entities)
+
+    names = sorted(timetable.name_to_stops)
+    reachable = 0
+    for _ in range(100):
+        origin, destination = rng.sample(names, 2)
+        departure = 6 * 3600 + rng.randrange(0, 3 * 3600)
+        expected = brute_force_arrival(timetable, timetable.name_to_stops[origin],
+                                       timetable.name_to_stops[destination], departure,
+                                       delays=delays, cancelled=cancelled)
+        result = planner.calculate_path(origin, destination, departure_time=format_time(departure))
+        if expected == INF:
+            assert not result
+            continue
+        reachable += 1
+        assert result['arrival_time'] == format_time(expected)
+        assert not any(cancelled[timetable.trip_index[segment['trip_id']]] for segment in result['route_segments'])
+    assert reachable > 30
+
+
+def test_cancelled_trip_is_replaced_in_journeys(planner):
+    timetable = planner.timetable
+    ingestor = RealtimeIngestor(planner)
+    origin, destination = timetable.stop_names[timetable.st_stop[0]], timetable.stop_names[timetable.st_stop[1]]
+    departure = format_time(int(timetable.st_departure[0]) - 60)
+    before = planner.calculate_path(origin, destination, departure_time=departure)
+    used = before['route_segments'][0]['trip_id']
+
+    ingestor.ingest([trip_update(used, cancelled=True)])
+    after = planner.calculate_path(origin, destination, departure_time=departure)
+    assert used not in [segment['trip_id'] for segment in after['route_segments']]
+    assert after['arrival_time'] > before['arrival_time']
+
+
+def test_departure_board_shows_delays_and_drops_cancellations(planner):
+    timetable = planner.timetable
+    ingestor = RealtimeIngestor(planner)
+    station = timetable.stop_names[timetable.st_stop[0]]
+    after = format_time(int(timetable.st_departure[0]) - 60)
+    board = planner.next_departures([station], after, n=3)[station]
+    first, second = board[0], board[1]
+    assert first['delay'] == 0
+
+    ingestor.ingest([trip_update(first['trip_id'], 240), trip_update(second['trip_id'], cancelled=True)])
+    board = planner.next_departures([station], after, n=3)[station]
+    delayed = next(departure for departure in board if departure['trip_id'] == first['trip_id'])
+    assert delayed['delay'] == 240
+    assert delayed['departure_time'] == format_time(int(timetable.st_departure[0]) + 240)
+    assert second['trip_id'] not in [departure['trip_id'] for departure in board]
+
+
+def test_vehicle_positions_drop_cancelled_trips(planner):
+    timetable = planner.timetable
+    ingestor = RealtimeIngestor(planner)
+    when = int(timetable.st_departure[0]) + 60
+    running = planner.vehicle_positions(when, consider_traffic=False).trips.tolist()
+    assert 0 in running
+
+    ingestor.ingest([trip_update(timetable.trip_ids[0], cancelled=True)])
+    assert 0 not in planner.vehicle_positions(when, consider_traffic=False).trips.tolist()
+
+
+def test_mid_trip_delay_updates_traffic_snapshot(planner):
+    timetable = planner.timetable
+    ingestor = RealtimeIngestor(planner)
+    epoch = planner.snapshot.epoch
+    before = planner.traffic.multipliers.copy()
+    ingestor.ingest([trip_update(timetable.trip_ids[0], 300, stop_sequence=3)])
+    assert planner.snapshot.epoch == epoch + 1
+
+    # Only hops of the delayed trip change, and the patched snapshot equals one built from scratch
+    hops = ingestor.state.hop_edge[timetable.trip_offsets[0]:timetable.trip_offsets[1] - 1]
+    changed = np.flatnonzero(planner.traffic.multipliers != before)
+    assert len(changed) and set(changed.tolist()) <= set(hops.tolist())
+    rebuilt = build_snapshot(planner.compiled, planner.traffic.multipliers, planner.snapshot.epoch)
+    assert planner.snapshot.multiplier_list == rebuilt.multiplier_list
+    assert planner.snapshot.weights == rebuilt.weights
+    assert planner.snapshot.rev_weights == rebuilt.rev_weights
+    assert planner.snapshot.scale == rebuilt.scale
+
+
+def test_stop_time_updates_resolve_stop_ids(planner):
+    timetable = planner.timetable
+    ingestor = RealtimeIngestor(planner)
+    start, end = timetable.trip_offsets[0], timetable.trip_offsets[1]
+    third = timetable.stop_ids[timetable.st_stop[start + 2]]
+    ingestor.ingest([{'trip_update': {'trip': {'trip_id': timetable.trip_ids[0]}, 'stop_time_update': [
+        {'stop_id': third, 'departure': {'delay': 120}},
+        {'departure': {'delay': 600}},
+        {'stop_id': 'nowhere', 'arrival': {'delay': 600}},
+    ]}}])
+    delays = ingestor.state.snapshot.delays.to_numpy()[start:end].tolist()
+    assert delays == [0, 0] + [120] * (end - start - 2)
+    assert ingestor.state.unmatched_stops == 2
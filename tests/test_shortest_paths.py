@@ -0,0 +1,130 @@
+import random
+from itertools import islice
+
+import networkx as nx
+import pytest
+
+from compiled_graph import CompiledGraph
+from contraction_hierarchy import ContractionHierarchy
+from k_shortest_paths import KShortestPaths
+from landmarks import LandmarkIndex
+
+
+def random_network(seed=0, n=60, m=200):
+    """Random MultiDiGraph of named stops with parallel edges on different routes"""
+    rng = random.Random(seed)
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from(f"Stop {i}" for i in range(n))
+    for _ in range(m):
+        u, v = rng.sample(range(n), 2)
+        for _ in range(rng.choice([1, 1, 2])):
+            graph.add_edge(f"Stop {u}", f"Stop {v}", route_id=f"R{rng.randrange(12)}", type='3',
+                           time=rng.uniform(1.0, 20.0))
+    return graph
+
+
+def simple_graph(graph):
+    """DiGraph keeping the fastest of each set of parallel edges"""
+    simple = nx.DiGraph()
+    simple.add_nodes_from(graph)
+    for u, v, time in graph.edges(data='time'):
+        if not simple.has_edge(u, v) or time < simple[u][v]['time']:
+            simple.add_edge(u, v, time=time)
+    return simple
+
+
+def path_time(compiled, path):
+    return sum(compiled._weights[compiled.edge_id(u, v)] for u, v in zip(path, path[1:]))
+
+
+@pytest.fixture(scope='module')
+def network():
+    graph = random_network()
+    return graph, simple_graph(graph), CompiledGraph(graph)
+
+
+def pairs(compiled, count=150, seed=1):
+    rng = random.Random(seed)
+    return [tuple(rng.sample(range(compiled.num_nodes), 2)) for _ in range(count)]
+
+
+def expected_time(simple, compiled, s, t):
+    try:
+        return nx.dijkstra_path_length(simple, compiled.nodes[s], compiled.nodes[t], weight='time')
+    except nx.NetworkXNoPath:
+        return None
+
+
+def test_compiled_graph_matches_networkx(network):
+    graph, simple, compiled = network
+    for s, t in pairs(compiled):
+        expected = expected_time(simple, compiled, s, t)
+        dist, _ = compiled.dijkstra(s)
+        backward, _ = compiled.dijkstra(t, reverse=True)
+        if expected is None:
+            assert dist[t] == float('inf') and backward[s] == float('inf')
+            with pytest.raises(nx.NetworkXNoPath):
+                compiled.shortest_path(compiled.nodes[s], compiled.nodes[t])
+            continue
+        assert dist[t] == pytest.approx(expected)
+        assert backward[s] == pytest.approx(expected)
+        path = [compiled.node_index[name] for name in compiled.shortest_path(compiled.nodes[s], compiled.nodes[t])]
+        assert path[0] == s and path[-1] == t
+        assert path_time(compiled, path) == pytest.approx(expected)
+
+
+def test_landmark_astar_matches_networkx(network):
+    graph, simple, compiled = network
+    landmarks = LandmarkIndex.farthest(compiled, count=4)
+    for s, t in pairs(compiled):
+        expected = expected_time(simple, compiled, s, t)
+        path, settled = landmarks.astar(s, t)
+        if expected is None:
+            assert path is None
+            continue
+        assert path[0] == s and path[-1] == t
+        assert path_time(compiled, path) == pytest.approx(expected)
+        assert settled <= landmarks.astar(s, t, heuristic=False)[1]
+
+
+def test_contraction_hierarchy_matches_networkx(network):
+    graph, simple, compiled = network
+    hierarchy = ContractionHierarchy.build(compiled)
+    for s, t in pairs(compiled):
+        expected = expected_time(simple, compiled, s, t)
+        path = hierarchy.query(s, t)
+        if expected is None:
+            assert path is None
+            continue
+        assert path[0] == s and path[-1] == t
+        assert path_time(compiled, path) == pytest.approx(expected)
+
+
+def test_saved_contraction_hierarchy_is_reused(network, tmp_path, monkeypatch):
+    graph, simple, compiled = network
+    path = str(tmp_path / 'network.ch')
+    first = ContractionHierarchy.load_or_build(compiled, path)
+    assert (tmp_path / 'network.ch.npz').exists()
+
+    def rebuild(cls, graph, witness_limit=60):
+        raise AssertionError("a saved hierarchy was rebuilt")
+
+    monkeypatch.setattr(ContractionHierarchy, 'build', classmethod(rebuild))
+    second = ContractionHierarchy.load_or_build(compiled, path)
+    assert second.rank.tolist() == first.rank.tolist()
+    assert second.num_shortcuts == first.num_shortcuts
+
+
+def test_k_shortest_paths_match_networkx(network):
+    graph, simple, compiled = network
+    for s, t in pairs(compiled, count=25, seed=2):
+        try:
+            expected = [nx.path_weight(simple, path, 'time') for path in
+                        islice(nx.shortest_simple_paths(simple, compiled.nodes[s], compiled.nodes[t], weight='time'), 8)]
+        except nx.NetworkXNoPath:
+            expected = []
+        found = list(islice(KShortestPaths(compiled, s, t), 8))
+        assert [cost for _, cost in found] == pytest.approx(expected)
+        for path, cost in found:
+            assert len(set(path)) == len(path)
+            assert path_time(compiled, path) == pytest.approx(cost)
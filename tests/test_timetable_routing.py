@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from conftest import INF, brute_force_arrival, synthetic_timetable
+from connection_scan import ConnectionScan
+from raptor_router import RaptorRouter
+
+
+@pytest.fixture(scope='module')
+def timetable():
+    return synthetic_timetable()
+
+
+def station_queries(timetable, count, seed):
+    """(sources, targets) pairs of distinct stations, each given as all of its stops"""
+    rng = random.Random(seed)
+    names = sorted(timetable.name_to_stops)
+    for _ in range(count):
+        origin, destination = rng.sample(names, 2)
+        yield timetable.name_to_stops[origin], timetable.name_to_stops[destination]
+
+
+def test_synthetic_timetable_has_multi_stop_trips(timetable):
+    assert (timetable.trip_offsets[1:] - timetable.trip_offsets[:-1] >= 4).all()
+    assert ConnectionScan(timetable).num_connections > timetable.num_trips
+    assert any(len(stops) > 1 for stops in timetable.name_to_stops.values())
+
+
+def test_raptor_matches_brute_force(timetable):
+    router = RaptorRouter(timetable)
+    rng = random.Random(1)
+    reachable = 0
+    for sources, targets in station_queries(timetable, 150, seed=2):
+        departure = 6 * 3600 + rng.randrange(0, 3 * 3600)
+        expected = brute_force_arrival(timetable, sources, targets, departure)
+        legs = router.earliest_arrival(sources, targets, departure, max_transfers=20)
+        if expected == INF:
+            assert not legs
+            continue
+        reachable += 1
+        assert legs[-1]['arrival'] == expected
+        assert legs[0]['stops'][0] in sources and legs[-1]['stops'][-1] in targets
+        assert all(leg['departure'] >= departure for leg in legs)
+    assert reachable > 50
+
+
+def test_connection_scan_profile_matches_brute_force(timetable):
+    scan = ConnectionScan(timetable)
+    for sources, targets in station_queries(timetable, 40, seed=3):
+        journeys = scan.profile(sources, targets, 0, 2 * 86400)
+        for journey in journeys:
+            assert journey[0]['stops'][0] in sources and journey[-1]['stops'][-1] in targets
+        # Earliest arrival for a given departure time is the best journey leaving no earlier
+        for departure in range(5 * 3600, 10 * 3600, 600):
+            best = min((legs[-1]['arrival'] for legs in journeys if legs[0]['departure'] >= departure), default=INF)
+            assert best == brute_force_arrival(timetable, sources, targets, departure)
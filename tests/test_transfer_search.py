@@ -0,0 +1,20 @@
+import networkx as nx
+
+from enhanced_transit_planner import EnhancedTransitPlanner
+from fares import calculate_fare
+
+
+def test_results_report_the_parallel_edge_the_search_rode():
+    graph = nx.MultiDiGraph()
+    graph.add_edge('A', 'B', route_id='R1', type='3', time=10.0)
+    graph.add_edge('A', 'B', route_id='R1', type='1', time=4.0)
+    graph.add_edge('B', 'C', route_id='R1', type='1', time=3.0)
+    graph.add_edge('B', 'C', route_id='R2', type='3', time=2.0)
+    coords = {'A': (12.90, 77.50), 'B': (12.91, 77.50), 'C': (12.92, 77.50)}
+    planner = EnhancedTransitPlanner(graph, coords, calculate_fare, cache_size=0, transfer_aware=True)
+
+    result = planner.calculate_path('A', 'C', consider_traffic=False)
+    # Staying on the fast R1 edge beats transferring to R2 for the last hop
+    assert result['time'] == 7.0
+    assert result['transfers'] == 0
+    assert [(segment['route_id'], segment['type']) for segment in result['route_segments']] == [('R1', '1')]
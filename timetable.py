@@ -0,0 +1,222 @@
+import datetime
+from math import radians, sin, cos, sqrt, atan2
+
+import numpy as np
+import pandas as pd
+
+
+def parse_time(value):
+    """Convert a GTFS time ("HH:MM[:SS]", may exceed 24:00), datetime/time or seconds to seconds since midnight"""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (datetime.datetime, datetime.time)):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    parts = [int(p) for p in str(value).strip().split(':')]
+    while len(parts) < 3:
+        parts.append(0)
+    return parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+
+def format_time(seconds):
+    """Format seconds since midnight as a GTFS-style HH:MM:SS string"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_time_column(column):
+    """Vectorised parse_time for a pandas Series of HH:MM:SS strings"""
+    parts = column.astype(str).str.split(':', expand=True).astype(np.int32)
+    return (parts[0] * 3600 + parts[1] * 60 + parts[2]).to_numpy(dtype=np.int32)
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Calculate the great circle distance between two points in kilometers"""
+    R = 6371  # Earth radius in kilometers
+
+    # Convert latitude and longitude from degrees to radians
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+
+    # Haversine formula
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    return R * c
+
+
+class Timetable:
+    """Interned, array-based view of stops.csv, trips.csv and stop_times.csv"""
+
+    # Attributes that fully describe a timetable; the ID tables are Python lists
+    ID_TABLES = ('stop_ids', 'stop_names', 'trip_ids', 'trip_route')
+    ARRAY_FIELDS = ID_TABLES + ('stop_lat', 'stop_lon', 'trip_offsets', 'st_trip', 'st_stop',
+                                'st_arrival', 'st_departure', 'st_sequence')
+
+    def __init__(self, stops, trips, stop_times):
+        # Stops: GTFS stop_id -> integer index
+        self.stop_ids = stops['stop_id'].astype(str).tolist()
+        self.stop_names = stops['stop_name'].astype(str).tolist()
+        self.stop_lat = stops['stop_lat'].to_numpy(dtype=np.float64)
+        self.stop_lon = stops['stop_lon'].to_numpy(dtype=np.float64)
+
+        # Stops referenced by stop_times but missing from stops.csv get a placeholder entry
+        missing = pd.Index(stop_times['stop_id'].astype(str).unique()).difference(pd.Index(self.stop_ids))
+        if len(missing):
+            self.stop_ids.extend(missing.tolist())
+            self.stop_names.extend(missing.tolist())
+            self.stop_lat = np.concatenate([self.stop_lat, np.full(len(missing), np.nan)])
+            self.stop_lon = np.concatenate([self.stop_lon, np.full(len(missing), np.nan)])
+        self.stop_index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+
+        # Trips: only those that actually have stop times
+        trip_routes = dict(zip(trips['trip_id'].astype(str), trips['route_id'].astype(str)))
+        stop_times = stop_times.assign(
+            trip_id=stop_times['trip_id'].astype(str),
+            stop_id=stop_times['stop_id'].astype(str),
+        ).sort_values(['trip_id', 'stop_sequence'], kind='stable')
+        trip_codes, self.trip_ids = pd.factorize(stop_times['trip_id'], sort=True)
+        self.trip_ids = self.trip_ids.tolist()
+        self.trip_route = [trip_routes.get(trip_id, '') for trip_id in self.trip_ids]
+
+        # Stop times grouped by trip (CSR: trip_offsets[t]..trip_offsets[t+1])
+        self.st_trip = trip_codes.astype(np.int32)
+        self.st_stop = stop_times['stop_id'].map(self.stop_index).to_numpy(dtype=np.int32)
+        self.st_arrival = parse_time_column(stop_times['arrival_time'])
+        self.st_departure = parse_time_column(stop_times['departure_time'])
+        self.st_sequence = stop_times['stop_sequence'].to_numpy(dtype=np.int32)
+        self.trip_offsets = np.zeros(len(self.trip_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.st_trip, minlength=len(self.trip_ids)), out=self.trip_offsets[1:])
+        self._build_lookups()
+
+    def _build_lookups(self):
+        """Dictionaries derived from the interned ID tables"""
+        self.stop_index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+        self.trip_index = {trip_id: i for i, trip_id in enumerate(self.trip_ids)}
+
+        # Several GTFS stops can share a name (e.g. bays of one bus station)
+        self.name_to_stops = {}
+        for i, name in enumerate(self.stop_names):
+            self.name_to_stops.setdefault(name, []).append(i)
+
+    @classmethod
+    def from_csv(cls, stops_path="stops.csv", trips_path="trips.csv", stop_times_path="stop_times.csv"):
+        """Load the timetable from GTFS CSV files, reading only the columns it uses"""
+        # stops.csv rows carry a trailing comma, so don't let pandas use the first column as index
+        stops = pd.read_csv(stops_path, index_col=False, usecols=['stop_id', 'stop_name', 'stop_lat', 'stop_lon'],
+                            dtype={'stop_id': str, 'stop_name': str})
+        trips = pd.read_csv(trips_path, usecols=['trip_id', 'route_id'], dtype={'trip_id': str, 'route_id': str})
+        stop_times = pd.read_csv(stop_times_path,
+                                 usecols=['trip_id', 'stop_id', 'stop_sequence', 'arrival_time', 'departure_time'],
+                                 dtype={'trip_id': str, 'stop_id': str, 'stop_sequence': np.int32,
+                                        'arrival_time': str, 'departure_time': str})
+        return cls(stops, trips, stop_times)
+
+    def to_arrays(self):
+        """The timetable as a dict of NumPy arrays (ID tables as unicode arrays), e.g. for np.savez"""
+        return {key: np.array(getattr(self, key), dtype=str) if key in self.ID_TABLES else getattr(self, key)
+                for key in self.ARRAY_FIELDS}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuild a timetable from the dict produced by to_arrays without touching the CSVs
+
+        Numeric arrays are used as given, so memory-mapped columns stay mapped.
+        """
+        timetable = cls.__new__(cls)
+        for key in cls.ARRAY_FIELDS:
+            value = np.asarray(arrays[key])
+            setattr(timetable, key, value.tolist() if key in cls.ID_TABLES else value)
+        timetable._build_lookups()
+        return timetable
+
+    @property
+    def num_stops(self):
+        return len(self.stop_ids)
+
+    @property
+    def num_trips(self):
+        return len(self.trip_ids)
+
+    def stops_for_name(self, name):
+        """Return the stop indices for a station name (exact match, then case-insensitive)"""
+        if name in self.name_to_stops:
+            return self.name_to_stops[name]
+        lowered = name.lower()
+        return [i for i, stop_name in enumerate(self.stop_names) if stop_name.lower() == lowered]
+
+    def footpaths(self, transfer_time):
+        """Walking transfers (other_stop, seconds) between stops that share a station name, per stop"""
+        footpaths = [[] for _ in range(self.num_stops)]
+        for stops in self.name_to_stops.values():
+            if len(stops) > 1:
+                for a in stops:
+                    footpaths[a].extend((b, transfer_time) for b in stops if b != a)
+        return footpaths
+
+    def stop_coords(self, stop):
+        """Return (lat, lon) for a stop index, or the Bengaluru center when unknown"""
+        lat, lon = self.stop_lat[stop], self.stop_lon[stop]
+        if np.isnan(lat) or np.isnan(lon):
+            return (12.9716, 77.5946)
+        return (float(lat), float(lon))
+
+    def journey_to_result(self, legs, departure_time, calculate_fare, route_types=None):
+        """Turn a list of timetable legs into the result dict returned by calculate_path"""
+        route_types = route_types or {}
+        path_stops = []
+        steps = []
+        route_segments = []
+        total_distance = 0
+        total_fare = 0
+
+        for leg in legs:
+            stops = leg['stops']
+            # Consecutive legs share their transfer stop
+            if path_stops and path_stops[-1] == stops[0]:
+                path_stops.extend(stops[1:])
+            else:
+                path_stops.extend(stops)
+
+            leg_distance = 0
+            for u, v in zip(stops[:-1], stops[1:]):
+                u_coords = self.stop_coords(u)
+                v_coords = self.stop_coords(v)
+                leg_distance += haversine_distance(u_coords[0], u_coords[1], v_coords[0], v_coords[1])
+            total_distance += leg_distance
+
+            start = self.stop_names[stops[0]]
+            if leg['route_id'] is None:
+                steps.append(f"Walk from {start} to {self.stop_names[stops[-1]]}")
+                continue
+
+            if route_segments:
+                minutes = (leg['departure'] - departure_time) / 60
+                steps.append(f"Transfer at {start} (Time: {minutes:.1f} mins)")
+            route_type = route_types.get(leg['route_id'], '3')
+            steps.append(f"Take Route {leg['route_id']} from {start} at {format_time(leg['departure'])}")
+            route_segments.append({
+                'route_id': leg['route_id'],
+                'trip_id': leg['trip_id'],
+                'start': start,
+                'end': self.stop_names[stops[-1]],
+                'departure_time': format_time(leg['departure']),
+                'arrival_time': format_time(leg['arrival']),
+                'type': route_type
+            })
+            total_fare += calculate_fare(leg_distance, route_type)
+
+        arrival_time = legs[-1]['arrival']
+        return {
+            'path': [self.stop_names[s] for s in path_stops],
+            'coordinates': [self.stop_coords(s) for s in path_stops],
+            'time': (arrival_time - departure_time) / 60,
+            'distance': total_distance,
+            'fare': total_fare,
+            'steps': steps,
+            'transfers': len([s for s in steps if 'Transfer' in s]),
+            'route_segments': route_segments,
+            'departure_time': format_time(departure_time),
+            'arrival_time': format_time(arrival_time)
+        }
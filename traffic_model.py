@@ -0,0 +1,65 @@
+import datetime
+
+import numpy as np
+
+# Multiplier ranges (1.0 = normal traffic) drawn for peak and off-peak hours
+PEAK_RANGE = (1.2, 1.8)
+OFF_PEAK_RANGE = (0.8, 1.2)
+
+
+def is_peak_hour(hour):
+    """Peak hours are 8-10 AM and 5-7 PM"""
+    return (8 <= hour <= 10) or (17 <= hour <= 19)
+
+
+class TrafficModel:
+    """Simulated traffic multipliers as a float32 array indexed by CompiledGraph edge ID"""
+
+    def __init__(self, num_edges, seed=None, hour=None):
+        self.num_edges = num_edges
+        self.rng = np.random.default_rng(seed)
+        hour = datetime.datetime.now().hour if hour is None else hour
+
+        # Time-of-day base level with some randomness for each edge
+        base = self._sample_targets(hour)
+        self.multipliers = (base * self.rng.uniform(0.9, 1.1, num_edges)).astype(np.float32)
+
+    def _sample_targets(self, hour):
+        low, high = PEAK_RANGE if is_peak_hour(hour) else OFF_PEAK_RANGE
+        return self.rng.uniform(low, high, self.num_edges)
+
+    def refresh(self, hour=None):
+        """Drift every multiplier towards a fresh time-of-day target in one vectorised step
+
+        A new array is built and then swapped in, so readers holding the old one keep a
+        consistent snapshot.
+        """
+        hour = datetime.datetime.now().hour if hour is None else hour
+        targets = self._sample_targets(hour)
+
+        # Smooth transition to new traffic conditions, plus real-time fluctuations
+        updated = self.multipliers * 0.7 + targets * 0.3
+        updated *= self.rng.uniform(0.95, 1.05, self.num_edges)
+        self.multipliers = updated.astype(np.float32)
+        return self.multipliers
+
+    def observe(self, edges, ratios):
+        """Blend observed travel-time ratios (observed / scheduled) into the given edges
+
+        Several observations of one edge are averaged first; each edge then moves with
+        the same 0.7/0.3 smoothing as refresh(). Only the touched entries change, but the
+        result is again a new array swapped in whole.
+        """
+        edges = np.asarray(edges, dtype=np.int64)
+        if not len(edges):
+            return self.multipliers
+        touched, slot = np.unique(edges, return_inverse=True)
+        mean = np.bincount(slot, weights=ratios) / np.bincount(slot)
+        updated = self.multipliers.copy()
+        updated[touched] = updated[touched] * 0.7 + mean * 0.3
+        self.multipliers = updated
+        return self.multipliers
+
+    def multiplier(self, edge):
+        """Multiplier of CSR edge ID edge (1.0 for -1, i.e. no such edge)"""
+        return float(self.multipliers[edge]) if edge >= 0 else 1.0
@@ -0,0 +1,184 @@
+import heapq
+from itertools import count
+
+import numpy as np
+import networkx as nx
+
+
+class TransferSearch:
+    """Dijkstra over (stop, route) states so transfer penalties shape the route choice
+
+    The route-expanded graph is never materialised. Every CompiledGraph edge keeps the
+    routes that run along it (all parallel edges, not just the fastest one), plus, per
+    route edge, the route edges that continue the same route from its head stop. States
+    are created lazily while searching: riding (stop, route) continues along the route at
+    the edge time or alights for free onto the stop state (stop, -1), and boarding from a
+    stop state costs transfer_penalty (except the first boarding at the origin). Each
+    stop therefore costs in-edges + out-edges to expand, not their product.
+    """
+
+    def __init__(self, graph, compiled, transfer_penalty=10, weight='time'):
+        self.compiled = compiled
+        self.transfer_penalty = transfer_penalty
+
+        # Route table for every route in the network (CompiledGraph only keeps the winners)
+        self.route_ids = []
+        self.route_types = []
+        route_lookup = {}
+
+        # route_offsets[e]:route_offsets[e + 1] are the route edges running along CSR edge e
+        route_offsets = [0]
+        routes = []
+        times = []
+        edges = []
+        departures = {}  # (stop, route) -> route edges leaving stop on route
+        nodes = compiled.nodes
+        for u in range(compiled.num_nodes):
+            succ = graph.succ[nodes[u]]
+            for e in range(compiled._offsets[u], compiled._offsets[u + 1]):
+                for data in succ[nodes[compiled._targets[e]]].values():
+                    route_key = (data['route_id'], data.get('type', '3'))
+                    if route_key not in route_lookup:
+                        route_lookup[route_key] = len(self.route_ids)
+                        self.route_ids.append(route_key[0])
+                        self.route_types.append(route_key[1])
+                    departures.setdefault((u, route_lookup[route_key]), []).append(len(routes))
+                    routes.append(route_lookup[route_key])
+                    times.append(float(data[weight]))
+                    edges.append(e)
+                route_offsets.append(len(routes))
+
+        # next_offsets[j]:next_offsets[j + 1] are the route edges that stay on route j's
+        # route from its head stop
+        next_offsets = [0]
+        next_edges = []
+        for j, e in enumerate(edges):
+            next_edges.extend(departures.get((compiled._targets[e], routes[j]), ()))
+            next_offsets.append(len(next_edges))
+
+        self.route_offsets = np.array(route_offsets, dtype=np.int64)
+        self.routes = np.array(routes, dtype=np.int32)
+        self.times = np.array(times, dtype=np.float64)
+        self.edges = np.array(edges, dtype=np.int32)
+        self.next_offsets = np.array(next_offsets, dtype=np.int64)
+        self.next_edges = np.array(next_edges, dtype=np.int32)
+
+        # Plain-list mirrors for the search loop
+        self._route_offsets = route_offsets
+        self._routes = routes
+        self._times = times
+        self._edges = edges
+        self._next_offsets = next_offsets
+        self._next_edges = next_edges
+
+    @property
+    def num_route_edges(self):
+        return len(self._routes)
+
+    def search(self, source, target, multipliers=None, max_transfers=None):
+        """Cheapest journey between stop IDs counting transfer penalties
+
+        multipliers (one per CSR edge) scale the route times, e.g. for traffic. With
+        max_transfers set, journeys needing more transfers are not considered. Returns
+        (stop-ID path, route edge ridden on each hop, cost) or None when nothing qualifies;
+        see hop for reading a route edge.
+        """
+        if source == target:
+            return [source], [], 0.0
+
+        offsets = self.compiled._offsets
+        targets = self.compiled._targets
+        route_offsets = self._route_offsets
+        routes = self._routes
+        times = self._times
+        edges = self._edges
+        next_offsets = self._next_offsets
+        next_edges = self._next_edges
+        penalty = self.transfer_penalty
+        capped = max_transfers is not None
+        inf = float('inf')
+
+        # State key: (stop, route or -1 when standing at the stop, transfers); transfers
+        # stays 0 in the key when uncapped. Boardings so far are carried alongside
+        # (-1 before the first one).
+        start = (source, -1, 0)
+        seen = {start: 0.0}
+        pred = {start: None}  # key -> (previous key, route edge ridden or -1 for alighting)
+        # Fewest transfers settled per (stop, route): a later label with as many is dominated
+        # (uncapped, any later label is dominated since it cannot be cheaper)
+        settled = {}
+
+        c = count()
+        fringe = [(0.0, next(c), start, -1, -1)]
+
+        def relax(d, key, transfers, previous, j):
+            best = settled.get(key[:2])
+            if best is not None and (not capped or best <= transfers):
+                return
+            if d < seen.get(key, inf):
+                seen[key] = d
+                pred[key] = (previous, j)
+                heapq.heappush(fringe, (d, next(c), key, transfers, j))
+
+        while fringe:
+            d, _, state, transfers, j = heapq.heappop(fringe)
+            v, r, _ = state
+            best = settled.get((v, r))
+            if best is not None and (not capped or best <= transfers):
+                continue
+            settled[(v, r)] = transfers
+            if v == target:
+                return self._unwind(pred, state, d)
+
+            if r < 0:
+                # Board any route leaving v
+                nt = transfers + 1
+                if capped and nt > max_transfers:
+                    continue
+                boarding = penalty if transfers >= 0 else 0.0
+                for e in range(offsets[v], offsets[v + 1]):
+                    m = 1.0 if multipliers is None else multipliers[e]
+                    for k in range(route_offsets[e], route_offsets[e + 1]):
+                        relax(d + boarding + times[k] * m, (targets[e], routes[k], nt if capped else 0),
+                              nt, state, k)
+            else:
+                # Stay seated along the same route, or alight here
+                for n in range(next_offsets[j], next_offsets[j + 1]):
+                    k = next_edges[n]
+                    e = edges[k]
+                    m = 1.0 if multipliers is None else multipliers[e]
+                    relax(d + times[k] * m, (targets[e], r, state[2]), transfers, state, k)
+                relax(d, (v, -1, state[2]), transfers, state, -1)
+        return None
+
+    def _unwind(self, pred, state, cost):
+        path = [state[0]]
+        hops = []
+        while pred[state] is not None:
+            state, j = pred[state]
+            if j >= 0:
+                path.append(state[0])
+                hops.append(j)
+        path.reverse()
+        hops.reverse()
+        return path, hops, cost
+
+    def hop(self, j):
+        """(CSR edge, route ID, route type, base time) of route edge j, the parallel edge a search rode"""
+        r = self._routes[j]
+        return self._edges[j], self.route_ids[r], self.route_types[r], self._times[j]
+
+    def shortest_path(self, origin, destination, multipliers=None, max_transfers=None):
+        """Stop-name path and the route edge ridden on each hop (see hop), optimising time plus transfer penalties"""
+        node_index = self.compiled.node_index
+        if origin not in node_index:
+            raise nx.NodeNotFound(f"Source {origin} is not in G")
+        if destination not in node_index:
+            raise nx.NodeNotFound(f"Target {destination} is not in G")
+
+        found = self.search(node_index[origin], node_index[destination], multipliers, max_transfers)
+        if found is None:
+            raise nx.NetworkXNoPath(f"No path between {origin} and {destination}"
+                                    + (f" within {max_transfers} transfers." if max_transfers is not None else "."))
+        path, hops, _ = found
+        return [self.compiled.nodes[i] for i in path], hops
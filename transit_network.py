@@ -0,0 +1,177 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from timetable import Timetable
+
+SNAPSHOT_FORMAT_VERSION = 1
+GTFS_FILES = ('routes.csv', 'stops.csv', 'trips.csv', 'stop_times.csv')
+
+ROUTE_SPEEDS = {'Standard': 20, 'Express': 30, 'Premium': 25}  # km/h (hypothetical)
+DEFAULT_SPEED = 20
+
+
+def csv_signature(paths):
+    """Hash of the GTFS input files' names and contents, used to validate saved snapshots"""
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TransitNetwork:
+    """Interned, array-based form of the route network built from routes.csv and stops.csv
+
+    Stop names live once in a name table and edges are (source, target, route) index
+    arrays, so the whole network (plus the timetable) round-trips through a single .npz
+    snapshot. build_graph() turns it back into the MultiDiGraph the planners use, with
+    nodes and edges in the same order as adding them row by row from routes.csv.
+    """
+
+    def __init__(self, names, coord_names, coord_lat, coord_lon, route_ids, route_types, route_speeds,
+                 edge_source, edge_target, edge_route, timetable=None):
+        self.names = names                # stop name per node ID, in graph insertion order
+        self.coord_names = coord_names    # stops.csv names with coordinates
+        self.coord_lat = coord_lat
+        self.coord_lon = coord_lon
+        self.route_ids = route_ids        # one entry per routes.csv row
+        self.route_types = route_types
+        self.route_speeds = route_speeds
+        self.edge_source = edge_source    # node IDs, one entry per consecutive stop pair of a route
+        self.edge_target = edge_target
+        self.edge_route = edge_route      # routes.csv row of each edge
+        self.timetable = timetable
+
+    @classmethod
+    def from_csv(cls, directory='.', with_timetable=True):
+        """Parse the GTFS CSVs in directory with typed columns and vectorised string operations"""
+        routes = pd.read_csv(os.path.join(directory, 'routes.csv'),
+                             usecols=['route_id', 'route_long_name', 'route_short_name', 'route_type'],
+                             dtype={'route_id': str, 'route_long_name': str, 'route_short_name': str,
+                                    'route_type': np.int64})
+        # stops.csv rows carry a trailing comma, so don't let pandas use the first column as index
+        stops = pd.read_csv(os.path.join(directory, 'stops.csv'), index_col=False,
+                            usecols=['stop_name', 'stop_lat', 'stop_lon'], dtype={'stop_name': str})
+
+        located = stops.dropna(subset=['stop_lat', 'stop_lon'])
+
+        # "A - B - C" becomes one row per stop; consecutive rows of the same route are its edges
+        sequence = routes['route_long_name'].str.split(' - ').explode()
+        row = sequence.index.to_numpy()
+        sequence = sequence.str.strip().to_numpy(dtype=object)
+        pair = np.flatnonzero(row[1:] == row[:-1])
+
+        # Intern stops in the order add_edge would first see them: source, then target, edge by edge
+        endpoints = np.empty(2 * len(pair), dtype=object)
+        endpoints[0::2] = sequence[pair]
+        endpoints[1::2] = sequence[pair + 1]
+        codes, names = pd.factorize(endpoints)
+
+        speeds = (routes['route_short_name'].str[:2].map(ROUTE_SPEEDS)
+                  .fillna(DEFAULT_SPEED).to_numpy(dtype=np.int64))
+        timetable = Timetable.from_csv(*(os.path.join(directory, name) for name in GTFS_FILES[1:])) \
+            if with_timetable else None
+        return cls(names=list(names),
+                   coord_names=located['stop_name'].tolist(),
+                   coord_lat=located['stop_lat'].to_numpy(dtype=np.float64),
+                   coord_lon=located['stop_lon'].to_numpy(dtype=np.float64),
+                   route_ids=routes['route_id'].tolist(),
+                   route_types=routes['route_type'].to_numpy(dtype=np.int64),
+                   route_speeds=speeds,
+                   edge_source=codes[0::2].astype(np.int32),
+                   edge_target=codes[1::2].astype(np.int32),
+                   edge_route=row[pair].astype(np.int32),
+                   timetable=timetable)
+
+    @property
+    def num_edges(self):
+        return len(self.edge_route)
+
+    def station_coords(self):
+        """Stop name -> (lat, lon) for every stops.csv row with coordinates (later rows win)"""
+        return dict(zip(self.coord_names, zip(self.coord_lat.tolist(), self.coord_lon.tolist())))
+
+    def build_graph(self):
+        """The route network as a MultiDiGraph with route_id, type, speed and time (minutes) per edge"""
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(self.names)
+        route_ids = self.route_ids
+        route_types = self.route_types.tolist()
+        route_speeds = self.route_speeds.tolist()
+        names = self.names
+        graph.add_edges_from(
+            (names[u], names[v], {'route_id': route_ids[r], 'type': route_types[r],
+                                  'speed': route_speeds[r], 'time': 60 * (1 / route_speeds[r])})
+            for u, v, r in zip(self.edge_source.tolist(), self.edge_target.tolist(), self.edge_route.tolist()))
+        return graph
+
+    def save(self, path, signature):
+        """Write the network (and timetable, if loaded) to an uncompressed .npz snapshot"""
+        arrays = {
+            'version': np.array(SNAPSHOT_FORMAT_VERSION),
+            'signature': np.array(signature),
+            'names': np.array(self.names, dtype=str),
+            'coord_names': np.array(self.coord_names, dtype=str),
+            'coord_lat': self.coord_lat,
+            'coord_lon': self.coord_lon,
+            'route_ids': np.array(self.route_ids, dtype=str),
+            'route_types': self.route_types,
+            'route_speeds': self.route_speeds,
+            'edge_source': self.edge_source,
+            'edge_target': self.edge_target,
+            'edge_route': self.edge_route,
+        }
+        if self.timetable is not None:
+            arrays.update({f'timetable_{key}': value for key, value in self.timetable.to_arrays().items()})
+        # Write then rename, so concurrent workers never read a half-written snapshot
+        partial = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(partial, **arrays)
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path, signature=None):
+        """Load a snapshot; raises ValueError on a format or (when given) signature mismatch"""
+        with np.load(path) as data:
+            if int(data['version']) != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported network snapshot format {int(data['version'])}")
+            if signature is not None and str(data['signature']) != signature:
+                raise ValueError(f"{path}: network snapshot was built from different CSV files")
+            prefix = 'timetable_'
+            timetable_arrays = {key[len(prefix):]: data[key] for key in data.files if key.startswith(prefix)}
+            return cls(names=data['names'].tolist(),
+                       coord_names=data['coord_names'].tolist(),
+                       coord_lat=data['coord_lat'],
+                       coord_lon=data['coord_lon'],
+                       route_ids=data['route_ids'].tolist(),
+                       route_types=data['route_types'],
+                       route_speeds=data['route_speeds'],
+                       edge_source=data['edge_source'],
+                       edge_target=data['edge_target'],
+                       edge_route=data['edge_route'],
+                       timetable=Timetable.from_arrays(timetable_arrays) if timetable_arrays else None)
+
+    @classmethod
+    def load_or_build(cls, directory='.', path=None):
+        """Reuse the snapshot at path when it matches the CSVs in directory, otherwise parse them and save one
+
+        path defaults to gtfs.snapshot.npz inside directory.
+        """
+        path = os.path.join(directory, 'gtfs.snapshot.npz') if path is None else path
+        signature = csv_signature([os.path.join(directory, name) for name in GTFS_FILES])
+        if os.path.exists(path):
+            try:
+                return cls.load(path, signature)
+            except (ValueError, KeyError, OSError):
+                pass  # stale or unreadable snapshot: rebuild it below
+        network = cls.from_csv(directory)
+        try:
+            network.save(path, signature)
+        except OSError:
+            pass  # read-only checkout: keep working without a snapshot
+        return network
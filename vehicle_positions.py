@@ -0,0 +1,120 @@
+from collections import namedtuple
+
+import numpy as np
+
+from departure_board import SECONDS_PER_DAY
+
+# Parallel arrays, one entry per active trip. The vehicle has covered `progress` (0..1) of
+# the hop from from_stop to to_stop (equal while it waits at a stop).
+FleetSnapshot = namedtuple('FleetSnapshot', ['time', 'trips', 'lat', 'lon', 'from_stop', 'to_stop', 'progress'])
+
+
+def hop_edges(timetable, compiled=None):
+    """CompiledGraph edge of the hop leaving each stop time row, matched by stop name
+
+    -1 for a trip's last row, for stops the graph doesn't know, or when compiled is None.
+    """
+    stops = np.asarray(timetable.st_stop)
+    edges = np.full(len(stops), -1, dtype=np.int64)
+    if compiled is not None:
+        node_of_stop = [compiled.node_index.get(name, -1) for name in timetable.stop_names]
+        st_trip = np.asarray(timetable.st_trip)
+        for row in np.flatnonzero(st_trip[:-1] == st_trip[1:]).tolist():
+            u, v = node_of_stop[stops[row]], node_of_stop[stops[row + 1]]
+            edges[row] = compiled.edge_index.get((u, v), -1)
+    return edges
+
+
+class VehicleTracker:
+    """Estimated position of every running trip, interpolated along its scheduled stop times
+
+    Trip start/end times and a sorted (trip, departure) key per stop time are prepared
+    once, so a snapshot is one mask over the trips plus one vectorised searchsorted for
+    the running ones. Given a CompiledGraph, each hop is also mapped to the graph edge
+    between the two stop names, so per-edge traffic multipliers can slow vehicles down.
+    Realtime delays and cancellations are applied to the same arrays, rebuilt once per
+    RealtimeSnapshot version.
+    """
+
+    def __init__(self, timetable, compiled=None):
+        self.timetable = timetable
+        offsets = np.asarray(timetable.trip_offsets)
+        arrival = np.asarray(timetable.st_arrival, dtype=np.int64)
+        departure = np.asarray(timetable.st_departure, dtype=np.int64)
+        self.has_stops = offsets[1:] > offsets[:-1]
+        self.first_row = offsets[:-1]
+        self.last_row = np.maximum(offsets[1:] - 1, 0)
+        self.st_trip = np.asarray(timetable.st_trip, dtype=np.int64)
+        self.schedule = self._timing(arrival, departure, ~self.has_stops)
+        self._live = (None, None)  # (RealtimeSnapshot, its timing), the last one asked for
+        self.stops = np.asarray(timetable.st_stop, dtype=np.int64)
+
+        # Fall back to the other end of a hop when one stop has no coordinates
+        self.stop_lat = np.asarray(timetable.stop_lat, dtype=np.float64)
+        self.stop_lon = np.asarray(timetable.stop_lon, dtype=np.float64)
+
+        self.hop_edge = hop_edges(timetable, compiled)
+
+    def _timing(self, arrival, departure, idle):
+        """(trip_start, trip_end, keys, arrival, departure) for the given stop times; idle trips never run"""
+        trip_start = np.where(idle, np.iinfo(np.int64).max, departure[self.first_row])
+        trip_end = np.where(idle, np.iinfo(np.int64).min, arrival[self.last_row])
+        # Rows are grouped by trip, so these keys are sorted wherever times never decrease
+        # along a trip; the running maximum keeps them sorted when a delay shrinks downstream
+        keys = np.maximum.accumulate((self.st_trip << 32) + departure)
+        return trip_start, trip_end, keys, arrival, departure
+
+    def _realtime_timing(self, realtime):
+        """Timing arrays shifted by a RealtimeSnapshot's delays, without its cancelled trips"""
+        live, timing = self._live
+        if live is not realtime:
+            delays = realtime.delays.to_numpy().astype(np.int64)
+            arrival, departure = self.schedule[3] + delays, self.schedule[4] + delays
+            timing = self._timing(arrival, departure, ~self.has_stops | realtime.cancelled.to_numpy())
+            self._live = (realtime, timing)
+        return timing
+
+    def _running(self, now, timing, multipliers=None):
+        """(trip, row, next row, progress) arrays for trips of one service day running at `now` seconds"""
+        trip_start, trip_end, keys, arrival, departure = timing
+        trips = np.flatnonzero((trip_start <= now) & (now <= trip_end))
+        # Last stop time of each running trip that has departed by now
+        rows = np.searchsorted(keys, (trips << 32) + now, side='right') - 1
+        rows = np.maximum(rows, self.first_row[trips])
+        last = rows >= self.last_row[trips]
+        following = np.where(last, rows, rows + 1)
+
+        duration = (arrival[following] - departure[rows]).astype(np.float64)
+        if multipliers is not None:
+            edges = self.hop_edge[rows]
+            scale = np.where(edges >= 0, np.asarray(multipliers, dtype=np.float64)[np.maximum(edges, 0)], 1.0)
+            duration *= scale
+        elapsed = now - departure[rows]
+        # Behind schedule (traffic) the vehicle stays on the hop until it reaches the next stop
+        progress = np.where(last | (duration <= 0), 0.0,
+                            np.clip(elapsed / np.where(duration > 0, duration, 1.0), 0.0, 1.0))
+        return trips, rows, following, progress
+
+    def snapshot(self, now, multipliers=None, realtime=None):
+        """Positions of all trips running at `now` seconds after midnight
+
+        Trips whose GTFS times run past 24:00 are matched against the previous service day
+        too. multipliers, one per CompiledGraph edge (e.g. TrafficModel.multipliers),
+        stretch each hop's scheduled duration. realtime, a RealtimeSnapshot, shifts each
+        stop time by its delay and drops cancelled trips.
+        """
+        now = int(now) % SECONDS_PER_DAY
+        timing = self.schedule if realtime is None else self._realtime_timing(realtime)
+        parts = [self._running(now, timing, multipliers), self._running(now + SECONDS_PER_DAY, timing, multipliers)]
+        trips, rows, following, progress = (np.concatenate(column) for column in zip(*parts))
+
+        from_stop = self.stops[rows]
+        to_stop = self.stops[following]
+        from_lat, from_lon = self.stop_lat[from_stop], self.stop_lon[from_stop]
+        to_lat, to_lon = self.stop_lat[to_stop], self.stop_lon[to_stop]
+        from_lat, to_lat = np.where(np.isnan(from_lat), to_lat, from_lat), np.where(np.isnan(to_lat), from_lat, to_lat)
+        from_lon, to_lon = np.where(np.isnan(from_lon), to_lon, from_lon), np.where(np.isnan(to_lon), from_lon, to_lon)
+        return FleetSnapshot(now, trips.astype(np.int32),
+                             from_lat + (to_lat - from_lat) * progress,
+                             from_lon + (to_lon - from_lon) * progress,
+                             from_stop.astype(np.int32), to_stop.astype(np.int32), progress)